@@ -1,4 +1,4 @@
-from qgis.PyQt.QtCore import QCoreApplication, QEventLoop
+from qgis.PyQt.QtCore import QCoreApplication
 from qgis.core import (
     QgsProcessing,
     QgsFeatureSink,
@@ -11,19 +11,28 @@ from qgis.core import (
     QgsFields,
     QgsField,
     QgsGeometry,
-    QgsPointXY,
     QgsCoordinateTransform,
     QgsCoordinateReferenceSystem,
     QgsProcessingParameterField,
     QgsProcessingParameterEnum,
     QgsWkbTypes,
     QgsProcessingParameterBoolean,
-    QgsProcessingParameterDefinition
+    QgsProcessingParameterDefinition,
+    QgsProcessingParameterFileDestination,
+    QgsSpatialIndex,
+    QgsRectangle,
+    QgsLineString
 )
-from qgis.PyQt.QtNetwork import QNetworkAccessManager, QNetworkRequest, QNetworkReply
-from PyQt5.QtCore import QVariant, QUrl
+from PyQt5.QtCore import QVariant
+import hashlib
 import json
-import time  
+import threading
+
+from ..routing_common.api_options import api_parameters, read_api_parameters, open_client, open_cache
+from ..routing_common.concurrency import ordered_map
+from ..routing_common.checkpoint import RunCheckpoint
+from ..routing_common.polyline import decode_polyline
+from ..routing_common.road_graph import RoadGraph
 
 class ItineraireParLaRouteAlgorithm(QgsProcessingAlgorithm):
     """
@@ -40,8 +49,22 @@ class ItineraireParLaRouteAlgorithm(QgsProcessingAlgorithm):
     CKB_OPTI = 'CKB_OPTI'
     COMMON_FIELD1 = 'COMMON_FIELD1'
     COMMON_FIELD2 = 'COMMON_FIELD2'
+    TOP_K = 'TOP_K'
+    OD_TABLE = 'OD_TABLE'
+    CHECKPOINT_FILE = 'CHECKPOINT_FILE'
+    SIMPLIFY_TOLERANCE = 'SIMPLIFY_TOLERANCE'
+    POLYLINE = 'POLYLINE'
+    BACKEND = 'BACKEND'
+    NETWORK = 'NETWORK'
+    SPEED_FIELD = 'SPEED_FIELD'
+    DIRECTION_FIELD = 'DIRECTION_FIELD'
     OUTPUT = 'OUTPUT'
 
+    RESOURCE = 'bdtopo-pgr'
+    # Marge appliquée à la distance à vol d'oiseau (Lambert 93) pour qu'elle reste un
+    # minorant de la distance routière malgré l'altération linéaire de la projection.
+    CROW_FLY_MARGIN = 0.99
+
     def initAlgorithm(self, config):
         """
         Définit les entrées et sorties de l'algorithme.
@@ -98,6 +121,14 @@ class ItineraireParLaRouteAlgorithm(QgsProcessingAlgorithm):
             parentLayerParameterName=self.INPUT2,
             optional=True
         )
+        # Fichier de reprise : un calcul annulé ou interrompu repart de là où il s'est arrêté
+        advanced_param_checkpoint = QgsProcessingParameterFileDestination(
+            self.CHECKPOINT_FILE,
+            self.tr('Fichier de reprise (optionnel)'),
+            fileFilter='JSON Lines (*.jsonl)',
+            optional=True,
+            createByDefault=False
+        )
 
         self.addParameter(
             QgsProcessingParameterBoolean(
@@ -126,6 +157,73 @@ class ItineraireParLaRouteAlgorithm(QgsProcessingAlgorithm):
                 defaultValue= 1    
             )
         )
+        # Moteur de calcul : API IGN ou graphe local construit à partir d'une couche de tronçons
+        self.addParameter(
+            QgsProcessingParameterEnum(
+                self.BACKEND,
+                self.tr("Moteur de calcul"),
+                options=["API IGN (geopf)", "Graphe local (couche de tronçons routiers)"],
+                allowMultiple=False,
+                defaultValue=0
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterFeatureSource(
+                self.NETWORK,
+                self.tr('Couche de tronçons routiers (graphe local, ex. BD TOPO troncon_de_route)'),
+                [QgsProcessing.TypeVectorLine],
+                optional=True
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterField(
+                self.SPEED_FIELD,
+                self.tr('Champ vitesse en km/h (graphe local, optionnel)'),
+                parentLayerParameterName=self.NETWORK,
+                type=QgsProcessingParameterField.Numeric,
+                optional=True
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterField(
+                self.DIRECTION_FIELD,
+                self.tr('Champ sens de circulation (graphe local, optionnel)'),
+                parentLayerParameterName=self.NETWORK,
+                optional=True
+            )
+        )
+        # Mode « k plus proches » : seules les k destinations les plus proches à vol d'oiseau sont routées
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.TOP_K,
+                self.tr('Nombre de destinations les plus proches à router par point de départ (0 = toutes)'),
+                type=QgsProcessingParameterNumber.Integer,
+                defaultValue=0,
+                minValue=0
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                self.OD_TABLE,
+                self.tr('Sortie sans géométrie (table origine-destination)'),
+                defaultValue=False
+            )
+        )
+        # Options de géométrie de sortie
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.SIMPLIFY_TOLERANCE,
+                self.tr('Tolérance de simplification des itinéraires (en mètre, 0 = aucune)'),
+                type=QgsProcessingParameterNumber.Double,
+                defaultValue=0,
+                minValue=0
+            )
+        )
+        advanced_param_polyline = QgsProcessingParameterBoolean(
+            self.POLYLINE,
+            self.tr('Demander les géométries au format polyline encodée (réponses plus légères, précision ~1 m)'),
+            defaultValue=False
+        )
         # Couche de sortie
         self.addParameter(
             QgsProcessingParameterFeatureSink(
@@ -141,6 +239,12 @@ class ItineraireParLaRouteAlgorithm(QgsProcessingAlgorithm):
         self.addParameter(advanced_param_buffer)
         self.addParameter(advanced_param_communfield_1)
         self.addParameter(advanced_param_communfield_2)
+        # Exécution concurrente et cache persistant des itinéraires déjà calculés
+        for param in api_parameters(self, self.tr('Utiliser le cache des itinéraires')):
+            self.addParameter(param)
+        for param in (advanced_param_checkpoint, advanced_param_polyline):
+            param.setFlags(param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+            self.addParameter(param)
 
     def processAlgorithm(self, parameters, context, feedback):
         """
@@ -157,9 +261,21 @@ class ItineraireParLaRouteAlgorithm(QgsProcessingAlgorithm):
         common_field1 = self.parameterAsString(parameters, self.COMMON_FIELD1, context)
         common_field2 = self.parameterAsString(parameters, self.COMMON_FIELD2, context)
         filter_min_distance = self.parameterAsBoolean(parameters, 'FILTER_MIN_DISTANCE', context)
+        api = read_api_parameters(self, parameters, context)
+        top_k = self.parameterAsInt(parameters, self.TOP_K, context)
+        od_table = self.parameterAsBoolean(parameters, self.OD_TABLE, context)
+        checkpoint_file = self.parameterAsFileOutput(parameters, self.CHECKPOINT_FILE, context)
+        simplify_tolerance = self.parameterAsDouble(parameters, self.SIMPLIFY_TOLERANCE, context)
+        use_polyline = self.parameterAsBoolean(parameters, self.POLYLINE, context)
+        use_graph = self.parameterAsEnum(parameters, self.BACKEND, context) == 1
+        network = self.parameterAsSource(parameters, self.NETWORK, context)
+        speed_field = self.parameterAsString(parameters, self.SPEED_FIELD, context)
+        direction_field = self.parameterAsString(parameters, self.DIRECTION_FIELD, context)
 
         if source1 is None or source2 is None:
             raise QgsProcessingException(self.invalidSourceError(parameters, self.INPUT1 or self.INPUT2))
+        if use_graph and network is None:
+            raise QgsProcessingException("Le graphe local nécessite une couche de tronçons routiers.")
 
         # Définir les systèmes de coordonnées
         crs_projected = QgsCoordinateReferenceSystem("EPSG:2154")  # Lambert 93
@@ -179,28 +295,43 @@ class ItineraireParLaRouteAlgorithm(QgsProcessingAlgorithm):
             features2 = [feature for feature in features2 if feature[common_field2] is not None]
         feedback.pushInfo(f"Avant association : {len(features1)} points de départ et {len(features2)} points d’arrivée.")
 
-        # Calcul du nombre total d'itérations en fonction du filtrage par champ commun
-        if common_field1 and common_field2:
-            total_iterations = 0
-            for f1 in features1:
-                # Pour chaque point de départ, on ne garde que les points d’arrivée ayant le même id
-                matches = [f for f in features2 if f[common_field2] == f1[common_field1]]
-                # Si un buffer est défini, on applique en plus le test spatial
-                if buffer_size > 0:
-                    buffer_geom = f1.geometry().buffer(buffer_size, 10)
-                    matches = [f for f in matches if buffer_geom.intersects(f.geometry())]
-                total_iterations += len(matches)
-        else:
-            total_iterations = sum(
-                len(features2) if buffer_size == 0 else len(
-                    [f for f in features2 if feature.geometry().buffer(buffer_size, 10).intersects(f.geometry())]
+        # Points d’arrivée candidats de chaque point de départ, calculés une seule fois
+        # et réutilisés pour le décompte des itérations et pour la boucle principale
+        candidates = self.candidateFeatures(features1, features2, buffer_size, common_field1, common_field2)
+
+        # Mode « k plus proches » : candidats classés par distance à vol d'oiseau projetée.
+        # Avec le filtre de distance minimale, l'extension est adaptative : on route par lots
+        # de k tant que le minimum routé n'est pas prouvé (la distance routière est toujours
+        # supérieure à la distance à vol d'oiseau).
+        adaptive = top_k > 0 and filter_min_distance
+        if top_k > 0:
+            ranked = []
+            for feature1, matches in zip(features1, candidates):
+                origin = feature1.geometry().asPoint()
+                matches = sorted(
+                    ((f, origin.distance(f.geometry().asPoint())) for f in matches),
+                    key=lambda item: item[1]
                 )
-                for feature in features1
-            )
+                ranked.append(matches if adaptive else matches[:top_k])
+            candidates = [[f for f, _ in matches] for matches in ranked]
+
+        # Avec le graphe local, les itinéraires sont regroupés par point de départ :
+        # un seul arbre des plus courts chemins sert toutes ses destinations.
+        per_origin = adaptive or use_graph
+        # Une unité par point de départ ayant au moins un point d'arrivée candidat
+        if adaptive:
+            total_iterations = sum(1 for matches in candidates if matches)
+            feedback.pushInfo(f"Le calcul démarre pour {total_iterations} points de départ "
+                              f"({top_k} plus proches, extension jusqu'au minimum garanti).")
+        elif per_origin:
+            total_iterations = sum(1 for matches in candidates if matches)
+            feedback.pushInfo(f"Le calcul démarre pour {sum(len(matches) for matches in candidates)} itinéraires "
+                              f"depuis {total_iterations} points de départ.")
+        else:
+            total_iterations = sum(len(matches) for matches in candidates)
+            feedback.pushInfo(f"Le calcul démarre pour {total_iterations} itinéraires.")
         current_iteration = 0
 
-        feedback.pushInfo(f"Le calcul démarre pour {total_iterations} itinéraires.")
-
         # Définir les champs de sortie
         fields = QgsFields()
         fields.append(QgsField('id_input1', QVariant.String))
@@ -209,109 +340,330 @@ class ItineraireParLaRouteAlgorithm(QgsProcessingAlgorithm):
         fields.append(QgsField('duration', QVariant.Double))
 
         # Créer la couche de sortie
-        sink, dest_id = self.parameterAsSink(parameters, self.OUTPUT, context, fields, QgsWkbTypes.LineString)
+        geometry_type = QgsWkbTypes.NoGeometry if od_table else QgsWkbTypes.LineString
+        sink, dest_id = self.parameterAsSink(parameters, self.OUTPUT, context, fields, geometry_type)
 
-        output_features = []  # Liste temporaire pour stocker les entités
         mode = 'car' if mode == '1' else 'pedestrian'
         opti = 'shortest' if opti == '1' else 'fastest'
 
-        last_progress = 0 
-        # Boucle principale
-        for i, feature1 in enumerate(features1):
-            id1 = feature1[id_field1]
-            # Détermination des points d’arrivée à traiter pour ce point de départ
-            if common_field1 and common_field2:
-                # Sélectionner uniquement les points d’arrivée avec le même id
-                matches = [f for f in features2 if f[common_field2] == feature1[common_field1]]
-                if buffer_size > 0:
-                    buffer_geom = feature1.geometry().buffer(buffer_size, 10)
-                    matches = [f for f in matches if buffer_geom.intersects(f.geometry())]
-                intersecting_features2 = matches
+        # Graphe local : construit une fois puis relu depuis le cache disque
+        graph = None
+        if use_graph:
+            transform_network = QgsCoordinateTransform(network.sourceCrs(), crs_projected, context.transformContext())
+            graph = RoadGraph.cached(network, transform_network, mode, speed_field, direction_field, feedback)
+            if feedback.isCanceled():
+                return {self.OUTPUT: dest_id}
+            if graph.arc_count == 0:
+                raise QgsProcessingException("La couche de tronçons routiers ne fournit aucun tronçon exploitable.")
+            feedback.pushInfo(f"Graphe local : {graph.node_count} nœuds, {graph.arc_count} arcs.")
+        weight = 'length' if opti == 'shortest' else 'duration'
+        nodes2 = {}
+
+        # Reprise : les unités déjà terminées lors d'une exécution précédente sont relues
+        # depuis le fichier de reprise au lieu d'être recalculées.
+        checkpoint = None
+        if checkpoint_file:
+            signature = self.runSignature(parameters, features1, features2, graph)
+            checkpoint = RunCheckpoint(checkpoint_file, signature)
+            if checkpoint.resumed:
+                feedback.pushInfo(f"Reprise : {len(checkpoint.done)} unité(s) déjà calculée(s) dans {checkpoint_file}.")
+
+        # Les entités sont écrites dans le sink au fil de l'eau. Avec le filtre de distance
+        # minimale, seule la meilleure entité de chaque id_input1 est conservée en mémoire.
+        best_by_origin = {}
+
+        def emit(id1, id2, distance, duration, coordinates):
+            new_feature = QgsFeature()
+            if not od_table:
+                line_geometry = QgsGeometry(QgsLineString([c[0] for c in coordinates], [c[1] for c in coordinates]))
+                if simplify_tolerance > 0:
+                    # Simplification (Douglas-Peucker) en Lambert 93 pour une tolérance en mètres
+                    line_geometry.transform(transform_to_wgs84, QgsCoordinateTransform.ReverseTransform)
+                    line_geometry = line_geometry.simplify(simplify_tolerance)
+                    line_geometry.transform(transform_to_wgs84)
+                new_feature.setGeometry(line_geometry)
+            new_feature.setAttributes([id1, id2, distance, duration / 60])
+            if filter_min_distance:
+                best = best_by_origin.get(id1)
+                if best is None or distance < best[2]:
+                    best_by_origin[id1] = new_feature
             else:
-                # Si pas de champ commun, appliquer éventuellement le filtre spatial
-                if buffer_size > 0:
-                    buffer_geom = feature1.geometry().buffer(buffer_size, 10)
-                    intersecting_features2 = [f for f in features2 if buffer_geom.intersects(f.geometry())]
-                else:
-                    intersecting_features2 = features2
+                sink.addFeature(new_feature, QgsFeatureSink.FastInsert)
 
-            # Pour chaque correspondance trouvée, calculer l'itinéraire
-            for j, feature2 in enumerate(intersecting_features2):
-                if feedback.isCanceled():
-                    break
-                time.sleep(0.222)
-                id2 = feature2[id_field2]
-                # Transformation des coordonnées pour l'API
-                point1 = transform_to_wgs84.transform(feature1.geometry().asPoint())
-                point2 = transform_to_wgs84.transform(feature2.geometry().asPoint())
-             
-                url = QUrl(f"https://data.geopf.fr/navigation/itineraire?resource=bdtopo-pgr&profile={mode}&start={point1.x()},{point1.y()}&end={point2.x()},{point2.y()}&optimization={opti}")
-                request = QNetworkRequest(url)
-
-                try:
-                    response = self.makeRequest(request)
-                    route_info = json.loads(response)
-                    coordinates = route_info.get("geometry", {}).get("coordinates", [])
-                    if coordinates:
-                        route_points = [QgsPointXY(coord[0], coord[1]) for coord in coordinates]
-                        line_geometry = QgsGeometry.fromPolylineXY(route_points)
-                    else:
-                        feedback.reportError(f"Aucune géométrie valide pour l'itinéraire entre {id1} et {id2}")
-                        continue
-                except Exception as e:
-                    feedback.reportError(f"Échec de la récupération de l'itinéraire entre {id1} et {id2} : {e}")
-                    continue
-
-                new_feature = QgsFeature()
-                new_feature.setGeometry(line_geometry)
-                new_feature.setAttributes([
-                    id1,
-                    id2,
-                    route_info.get("distance", 0),
-                    route_info.get("duration", 0) / 60
-                ])
-                output_features.append(new_feature)
-
-                # Mettre à jour la progression
+        if checkpoint is not None:
+            for results in checkpoint.done.values():
+                for record in results:
+                    emit(record['id1'], record['id2'], record['distance'], record['duration'], record['coordinates'])
                 current_iteration += 1
-                progress = int((current_iteration / total_iterations) * 100)
-                if progress > last_progress:
-                    feedback.setProgress(progress)
-                    feedback.pushInfo(f"Progression : {progress}% - {current_iteration}/{total_iterations} itérations effectuées")
-                    last_progress = progress
 
-        # Optionnel : filtrer pour ne garder que l'itinéraire de distance minimale par point de départ
+        def iter_requests():
+            """Génère les unités de travail (identifiant, contenu) dans l'ordre du parcours :
+            une tâche (id1, id2, requête) par couple, la liste des tâches d'un point de départ
+            avec le graphe local, ou en mode adaptatif la liste des couples (tâche, distance
+            à vol d'oiseau) d'un point de départ. Les unités
+            présentes dans le fichier de reprise sont sautées. La requête est le couple
+            (url, clé de cache) pour l'API, ou le couple de nœuds pour le graphe local."""
+            for i, (feature1, intersecting_features2) in enumerate(zip(features1, candidates)):
+                id1 = feature1[id_field1]
+                # Transformation des coordonnées pour l'API (dans le thread principal :
+                # les QgsCoordinateTransform ne sont pas partagés avec les workers)
+                if graph is not None:
+                    origin = feature1.geometry().asPoint()
+                    node1 = graph.nearest_node(origin.x(), origin.y())
+                else:
+                    point1 = transform_to_wgs84.transform(feature1.geometry().asPoint())
+                tasks = []
+                for feature2 in intersecting_features2:
+                    id2 = feature2[id_field2]
+                    if graph is not None:
+                        # Rattachement au graphe, mémorisé pour chaque point d'arrivée
+                        if feature2.id() not in nodes2:
+                            destination = feature2.geometry().asPoint()
+                            nodes2[feature2.id()] = graph.nearest_node(destination.x(), destination.y())
+                        request = (node1, nodes2[feature2.id()])
+                    else:
+                        point2 = transform_to_wgs84.transform(feature2.geometry().asPoint())
+                        url = f"https://data.geopf.fr/navigation/itineraire?resource={self.RESOURCE}&profile={mode}&start={point1.x()},{point1.y()}&end={point2.x()},{point2.y()}&optimization={opti}"
+                        if use_polyline:
+                            url += "&geometryFormat=polyline"
+                        request = (url, self.cacheKey(point1, point2, mode, opti, api.cache_precision))
+                    if per_origin:
+                        tasks.append((id1, id2, request))
+                    else:
+                        unit = f"{feature1.id()}:{feature2.id()}"
+                        if checkpoint is None or unit not in checkpoint.done:
+                            yield unit, (id1, id2, request)
+                if per_origin and tasks:
+                    unit = str(feature1.id())
+                    if checkpoint is None or unit not in checkpoint.done:
+                        yield unit, list(zip(tasks, (crow for _, crow in ranked[i]))) if adaptive else tasks
+
+        # Le débit est régulé par un seau de jetons partagé entre les workers
+        # (remplace l'ancienne pause fixe de 0,222 s entre deux requêtes).
+        cancel = threading.Event()
+        client = open_client(api, cancel)
+        cache = open_cache(api, 'itineraires.sqlite', 'des itinéraires', feedback) if graph is None else None
+
+        def fetch_route(task):
+            """Exécuté dans un worker : lecture du cache, sinon requête HTTP et décodage JSON."""
+            url, key = task[2]
+            if cache is not None:
+                cached = cache.get(key)
+                if cached is not None:
+                    return cached, None
+            try:
+                content = client.get(url)
+                if content is None:
+                    return None, None
+                route_info = json.loads(content)
+            except Exception as e:
+                return None, e
+            # Seuls la géométrie, la distance et la durée sont conservés
+            geometry = route_info.get("geometry", {})
+            if isinstance(geometry, str):
+                coordinates = decode_polyline(geometry)
+            else:
+                coordinates = geometry.get("coordinates", [])
+            route_info = {
+                "geometry": {"coordinates": coordinates},
+                "distance": route_info.get("distance", 0),
+                "duration": route_info.get("duration", 0),
+            }
+            if cache is not None and route_info["geometry"]["coordinates"]:
+                cache.put(key, route_info)
+            return route_info, None
+
+        def fetch_batch(tasks):
+            """Itinéraires d'un même point de départ, sous la forme [(route_info, erreur), ...].
+            L'API IGN n'offre pas de matrice de distances : une requête par couple. Avec le
+            graphe local, une seule destination est cherchée par A* ; pour plusieurs, un seul
+            Dijkstra depuis le départ, arrêté dès que toutes les destinations sont atteintes,
+            puis extraction de chaque chemin (Lambert 93)."""
+            if graph is None:
+                return [fetch_route(task) for task in tasks]
+            source = tasks[0][2][0]
+            if len(tasks) == 1:
+                paths = [graph.route(source, tasks[0][2][1], weight)]
+            else:
+                _, pred = graph.shortest_path_tree(source, {task[2][1] for task in tasks}, weight, cancel)
+                if cancel.is_set():
+                    return [(None, None)] * len(tasks)
+                paths = [graph.path(pred, source, task[2][1]) for task in tasks]
+            fetched = []
+            for path in paths:
+                if path is None:
+                    fetched.append((None, Exception("aucun chemin dans le graphe local")))
+                    continue
+                fetched.append(({
+                    "geometry": {"coordinates": path["coordinates"]},
+                    "distance": path["distance"],
+                    "duration": path["duration"],
+                    "projected": True,
+                }, None))
+            return fetched
+
+        def route(unit_task):
+            unit, task = unit_task
+            return unit, [(task, *fetch_route(task))]
+
+        def route_origin(unit_task):
+            unit, tasks = unit_task
+            return unit, [(task, *fetched) for task, fetched in zip(tasks, fetch_batch(tasks))]
+
+        def route_nearest(unit_task):
+            """Route les candidats d'un point de départ par lots de top_k, par distance à vol
+            d'oiseau croissante, jusqu'à ce que le lot suivant ne puisse plus faire mieux."""
+            unit, ranked_tasks = unit_task
+            results = []
+            best = None
+            for start in range(0, len(ranked_tasks), top_k):
+                if best is not None and best <= ranked_tasks[start][1] * self.CROW_FLY_MARGIN:
+                    break
+                batch = [task for task, _ in ranked_tasks[start:start + top_k]]
+                for task, (route_info, error) in zip(batch, fetch_batch(batch)):
+                    results.append((task, route_info, error))
+                    if route_info and route_info["geometry"]["coordinates"]:
+                        distance = route_info.get("distance", 0)
+                        best = distance if best is None else min(best, distance)
+                if cancel.is_set():
+                    break
+            return unit, results
+
+        if graph is None:
+            feedback.pushInfo(f"{api.max_workers} requête(s) simultanée(s), débit maximal : {api.rate_limit or 'illimité'} requêtes/s.")
+
+        last_progress = 0
+        # Boucle principale : les résultats arrivent dans l'ordre du parcours
+        worker = route_nearest if adaptive else route_origin if per_origin else route
+        for unit, results in ordered_map(worker, iter_requests(), api.max_workers, feedback, cancel):
+            current_iteration += 1
+            progress = int((current_iteration / total_iterations) * 100)
+            if progress > last_progress:
+                feedback.setProgress(progress)
+                feedback.pushInfo(f"Progression : {progress}% - {current_iteration}/{total_iterations} itérations effectuées")
+                last_progress = progress
+
+            # Une unité n'est inscrite au fichier de reprise que si tous ses itinéraires ont abouti
+            completed = []
+            for (id1, id2, request), route_info, error in results:
+                if error is not None:
+                    feedback.reportError(f"Échec de la récupération de l'itinéraire entre {id1} et {id2} : {error}")
+                    completed = None
+                    continue
+                if route_info is None:
+                    completed = None
+                    continue
+                coordinates = route_info.get("geometry", {}).get("coordinates", [])
+                if not coordinates:
+                    feedback.reportError(f"Aucune géométrie valide pour l'itinéraire entre {id1} et {id2}")
+                    continue
+                if route_info.get("projected"):
+                    coordinates = self.projectedToWgs84(coordinates, transform_to_wgs84)
+                distance = route_info.get("distance", 0)
+                duration = route_info.get("duration", 0)
+                emit(id1, id2, distance, duration, coordinates)
+                if completed is not None:
+                    # Table origine-destination : la géométrie n'est pas conservée
+                    completed.append({'id1': id1, 'id2': id2, 'distance': distance,
+                                      'duration': duration, 'coordinates': [] if od_table else coordinates})
+            if checkpoint is not None and completed is not None:
+                checkpoint.record(unit, completed)
+
+        if graph is None:
+            feedback.pushInfo(f"API : {client.stats.summary()}.")
+        if cache is not None:
+            feedback.pushInfo(f"Cache : {cache.hits} itinéraire(s) réutilisé(s), {cache.misses} requête(s) à l'API.")
+            cache.close()
+        if checkpoint is not None:
+            checkpoint.close()
+
+        # Optionnel : seul l'itinéraire de distance minimale par point de départ est écrit
         if filter_min_distance:
-            feedback.pushInfo("Filtrage des résultats pour conserver uniquement les distances minimales par id_input1...")
-            min_distance_map = {}
-            for feature in output_features:
-                id1 = feature[0]
-                distance = feature[2]
-                if id1 not in min_distance_map or distance < min_distance_map[id1]['distance']:
-                    min_distance_map[id1] = {'feature': feature, 'distance': distance}
-            output_features = [data['feature'] for data in min_distance_map.values()]
-
-        # Écrire les entités dans le sink
-        for feature in output_features:
-            sink.addFeature(feature, QgsFeatureSink.FastInsert)
+            feedback.pushInfo("Écriture des itinéraires de distance minimale par id_input1...")
+            for feature in best_by_origin.values():
+                sink.addFeature(feature, QgsFeatureSink.FastInsert)
 
         feedback.pushInfo("Traitement terminé.")
         return {self.OUTPUT: dest_id}
 
-    def makeRequest(self, request):
+    def candidateFeatures(self, features1, features2, buffer_size, common_field1, common_field2):
         """
-        Fonction pour effectuer des requêtes HTTP synchrones.
+        Renvoie, pour chaque point de départ, la liste des points d’arrivée à traiter.
+
+        Le filtre par champ commun passe par un index (dictionnaire) sur COMMON_FIELD2,
+        le filtre spatial par une requête de rayon dans un QgsSpatialIndex des points
+        d’arrivée projetés. L'ordre de features2 est conservé dans chaque liste.
         """
-        manager = QNetworkAccessManager()
-        reply = manager.get(request)
-        loop = QEventLoop()
-        reply.finished.connect(loop.quit)
-        loop.exec_()
-
-        if reply.error() == QNetworkReply.NoError:
-            return reply.readAll().data().decode()
-        else:
-            raise Exception(reply.errorString())
+        use_common = bool(common_field1 and common_field2)
+        groups = {}
+        if use_common:
+            for pos, f in enumerate(features2):
+                groups.setdefault(f[common_field2], []).append(pos)
+
+        index = None
+        if buffer_size > 0:
+            index = QgsSpatialIndex()
+            for pos, f in enumerate(features2):
+                if not f.geometry().isEmpty():
+                    point = f.geometry().asPoint()
+                    index.addFeature(pos, QgsRectangle(point.x(), point.y(), point.x(), point.y()))
+
+        candidates = []
+        for feature1 in features1:
+            if index is None:
+                matches = [features2[pos] for pos in groups.get(feature1[common_field1], [])] if use_common else features2
+            else:
+                origin = feature1.geometry().asPoint()
+                hits = set(index.intersects(QgsRectangle(origin.x() - buffer_size, origin.y() - buffer_size,
+                                                         origin.x() + buffer_size, origin.y() + buffer_size)))
+                if use_common:
+                    positions = [pos for pos in groups.get(feature1[common_field1], []) if pos in hits]
+                else:
+                    positions = sorted(hits)
+                matches = [features2[pos] for pos in positions
+                           if origin.distance(features2[pos].geometry().asPoint()) <= buffer_size]
+            candidates.append(matches)
+        return candidates
+
+    def runSignature(self, parameters, features1, features2, graph):
+        """
+        Empreinte des paramètres et des données d'entrée, pour n'accepter qu'un fichier
+        de reprise produit par le même traitement : contenu des points (identifiant,
+        géométrie, attributs) et, avec le graphe local, contenu du graphe.
+        """
+        keys = [self.ID_FIELD1, self.ID_FIELD2, self.BUFFER_SIZE, self.COMMON_FIELD1, self.COMMON_FIELD2,
+                self.CKB_MODE, self.CKB_OPTI, self.TOP_K, 'FILTER_MIN_DISTANCE', self.OD_TABLE, self.BACKEND,
+                self.NETWORK, self.SPEED_FIELD, self.DIRECTION_FIELD]
+        description = {key: str(parameters.get(key)) for key in keys}
+        digest = hashlib.sha1()
+        for features in (features1, features2):
+            digest.update(str(len(features)).encode('utf-8'))
+            for feature in features:
+                digest.update(str(feature.id()).encode('utf-8'))
+                digest.update(bytes(feature.geometry().asWkb()))
+                digest.update(repr(feature.attributes()).encode('utf-8'))
+        description['content'] = digest.hexdigest()
+        if graph is not None:
+            description['graph'] = graph.digest()
+        return hashlib.sha1(json.dumps(description, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def projectedToWgs84(self, coordinates, transform):
+        """
+        Convertit une liste de coordonnées Lambert 93 en coordonnées WGS84 [lon, lat].
+        """
+        line = QgsLineString([c[0] for c in coordinates], [c[1] for c in coordinates])
+        line.transform(transform)
+        return [[x, y] for x, y in zip(line.xVector(), line.yVector())]
+
+    def cacheKey(self, point1, point2, mode, opti, precision):
+        """
+        Clé de cache d'un itinéraire : coordonnées WGS84 arrondies, profil, optimisation et ressource.
+        """
+        return (
+            f"{round(point1.x(), precision)},{round(point1.y(), precision)};"
+            f"{round(point2.x(), precision)},{round(point2.y(), precision)};"
+            f"{mode};{opti};{self.RESOURCE}"
+        )
 
     def transformFeature(self, feature, transform):
         """
@@ -351,6 +703,13 @@ class ItineraireParLaRouteAlgorithm(QgsProcessingAlgorithm):
                 <li>Option de filtrage par champs communs (pour ne traiter que les itinéraires entre points ayant le même identifiant).</li>
                 <li>Ajout d'un buffer optionnel pour limiter les calculs d'itinéraires aux entités proches.</li>
                 <li>Choix de conserver uniquement l'itinéraire avec la distance minimale pour chaque point de départ.</li>
+                <li>Requêtes simultanées (paramètres avancés) avec un débit maximal en requêtes par seconde, pour respecter les limites de l'API. Les erreurs transitoires (429, 5xx, coupure réseau) sont retentées avec une attente croissante ; si le service se dégrade, le traitement est suspendu quelques secondes.</li>
+                <li>Mode « k plus proches » : seules les k destinations les plus proches à vol d'oiseau sont routées. Combiné au filtre de distance minimale, le calcul s'étend automatiquement jusqu'à ce que l'itinéraire le plus court soit garanti.</li>
+                <li>Sortie sans géométrie (table origine-destination) pour les matrices de distances.</li>
+                <li>Simplification optionnelle des itinéraires (tolérance en mètres) et géométries demandées au format polyline encodée pour alléger les réponses de l'API.</li>
+                <li>Écriture des itinéraires au fil du calcul et fichier de reprise optionnel : un calcul annulé ou interrompu peut être relancé sans refaire les itinéraires déjà obtenus. Le fichier est ignoré si les paramètres ou le contenu des couches (points, tronçons) ont changé.</li>
+                <li>Moteur de calcul au choix : API IGN, ou graphe local construit à partir d'une couche de tronçons routiers (ex. BD TOPO <i>troncon_de_route</i>, champs vitesse et sens de circulation optionnels). Le graphe est mis en cache sur disque ; les grandes matrices se calculent alors hors ligne, sans limite de débit, avec un seul arbre des plus courts chemins par point de départ.</li>
+                <li>Cache persistant des itinéraires (SQLite) : une nouvelle exécution sur les mêmes origines et destinations n'interroge plus l'API. Durée de validité et taille maximale configurables.</li>
             </ul>
             <h4>Résultats :</h4>
             <p>Le plugin génère une couche contenant les itinéraires sous forme de lignes, avec les attributs suivants :</p>
@@ -0,0 +1,151 @@
+"""
+Moteur de plus tôt arrivée « Connection Scan » (CSA) sur tableaux NumPy.
+
+Les horaires d'un jour sont transformés une fois en connexions (arrêt de
+départ, arrêt d'arrivée, heures en secondes entières depuis minuit, trip),
+triées par heure de départ. Une requête parcourt une seule fois les
+connexions de sa fenêtre horaire : le nombre de correspondances n'est pas
+limité, contrairement à travel.compute_arrival_points (4 au plus).
+"""
+import heapq
+
+import numpy as np
+import pandas as pd
+
+from . import prepare
+
+
+UNREACHED = np.iinfo(np.int64).max
+
+
+class ConnectionScan:
+    """
+    Connexions et correspondances à pied d'un jour, prêtes pour les requêtes.
+
+    day_data : données d'un jour (prepare.prepare_day_data), stoptimes triés
+    par (trip_id, datetime). Comme dans travel.compute_arrival_points, on
+    monte dans un trip à un arrêt atteint strictement avant son passage.
+    """
+
+    def __init__(self, day_data, day):
+        self.day_start = pd.Timestamp(day)
+
+        stops = day_data.stops.drop_duplicates(subset="stop_id").reset_index(drop=True)
+        self.stop_ids = stops["stop_id"].to_numpy()
+        self.stop_lat = stops["stop_lat"].to_numpy(dtype=np.float64)
+        self.stop_lon = stops["stop_lon"].to_numpy(dtype=np.float64)
+        index = pd.Index(self.stop_ids)
+
+        # Connexions : couples de passages horaires consécutifs d'un même trip. Les
+        # arrêts sans horaire (autorisés par GTFS hors points de référence) sont
+        # écartés : la connexion relie alors les arrêts horaires qui les encadrent.
+        stoptimes = day_data.stoptimes
+        stop = index.get_indexer(stoptimes["stop_id"])
+        known = (stop >= 0) & stoptimes["datetime"].notna().to_numpy()
+        stop = stop[known].astype(np.int32)
+        trip = pd.factorize(stoptimes["trip_id"])[0][known].astype(np.int32)
+        seconds = self._seconds(stoptimes["datetime"][known])
+        same_trip = trip[1:] == trip[:-1]
+        dep_time = seconds[:-1][same_trip]
+        order = np.argsort(dep_time, kind="stable")
+        self.dep_time = dep_time[order]
+        self.arr_time = seconds[1:][same_trip][order]
+        self.dep_stop = stop[:-1][same_trip][order]
+        self.arr_stop = stop[1:][same_trip][order]
+        self.trip = trip[:-1][same_trip][order]
+        self.trip_count = int(trip.max()) + 1 if len(trip) else 0
+
+        # Passages horaires triés par heure : arrêts desservis dans une fenêtre
+        order = np.argsort(seconds, kind="stable")
+        self.served_time = seconds[order]
+        self.served_stop = stop[order]
+
+        # Correspondances à pied (transfers.Transfers), renumérotées selon les arrêts
+        # ci-dessus, en CSR trié par durée croissante pour chaque arrêt
+        transfers = day_data.durations
+        renumber = index.get_indexer(transfers.stop_ids)
+        walk_from = renumber[transfers.sources()]
+        walk_to = renumber[transfers.indices]
+        walk_seconds = transfers.seconds.astype(np.int32)
+        known = (walk_from >= 0) & (walk_to >= 0)
+        walk_from, walk_to, walk_seconds = walk_from[known], walk_to[known], walk_seconds[known]
+        order = np.lexsort((walk_seconds, walk_from))
+        walk_from = walk_from[order]
+        # Listes Python : parcourues élément par élément dans la boucle de scan
+        self.walk_indptr = np.searchsorted(walk_from, np.arange(len(self.stop_ids) + 1)).tolist()
+        self.walk_to = walk_to[order].tolist()
+        self.walk_seconds = walk_seconds[order].tolist()
+
+    def _seconds(self, datetimes):
+        return ((datetimes - self.day_start).dt.total_seconds().to_numpy()).astype(np.int64)
+
+    def earliest_arrivals(self, lat, lon, start_datetime, end_datetime):
+        """Heure d'arrivée au plus tôt (secondes depuis minuit, UNREACHED sinon) à chaque arrêt.
+
+        Les correspondances à pied s'enchaînent (A → B → C même si A et C sont
+        trop éloignés pour une correspondance directe), comme les tours
+        successifs de travel.walk_from_stops : après chaque descente, elles sont
+        relâchées jusqu'au point fixe par un Dijkstra borné par la fin de la fenêtre.
+        """
+        start = int((start_datetime - self.day_start).total_seconds())
+        end = int((end_datetime - self.day_start).total_seconds())
+
+        # Marche directe depuis l'origine
+        walk = np.rint(
+            prepare.distance_meters(lat, self.stop_lat, lon, self.stop_lon) / prepare.WALKING_SPEED_M_S
+        ).astype(np.int64) + start
+        arrival = np.where(walk < end, walk, UNREACHED).tolist()
+
+        boarded = bytearray(self.trip_count)
+        indptr, walk_to, walk_seconds = self.walk_indptr, self.walk_to, self.walk_seconds
+        # Connexions partant dans la fenêtre ]start, end[
+        lo = int(np.searchsorted(self.dep_time, start, side="right"))
+        hi = int(np.searchsorted(self.dep_time, end, side="left"))
+        for dep_stop, arr_stop, dep, arr, trip in zip(
+            self.dep_stop[lo:hi].tolist(),
+            self.arr_stop[lo:hi].tolist(),
+            self.dep_time[lo:hi].tolist(),
+            self.arr_time[lo:hi].tolist(),
+            self.trip[lo:hi].tolist(),
+        ):
+            if not boarded[trip]:
+                if arrival[dep_stop] >= dep:
+                    continue
+                boarded[trip] = 1
+            if arr >= end or arr >= arrival[arr_stop]:
+                continue
+            arrival[arr_stop] = arr
+            heap = [(arr, arr_stop)]
+            while heap:
+                time, stop = heapq.heappop(heap)
+                if time > arrival[stop]:
+                    continue
+                for k in range(indptr[stop], indptr[stop + 1]):
+                    reached = time + walk_seconds[k]
+                    if reached >= end:
+                        break
+                    if reached < arrival[walk_to[k]]:
+                        arrival[walk_to[k]] = reached
+                        heapq.heappush(heap, (reached, walk_to[k]))
+        return np.array(arrival, dtype=np.int64)
+
+    def arrival_points(self, lat, lon, start_datetime, end_datetime):
+        """
+        returns: df with columns ["stop_id", "arrival_datetime", "lat", "lon"],
+        comme travel.compute_arrival_points : seuls les arrêts desservis
+        entre start_datetime et end_datetime sont renvoyés
+        """
+        arrival = self.earliest_arrivals(lat, lon, start_datetime, end_datetime)
+        start = int((start_datetime - self.day_start).total_seconds())
+        end = int((end_datetime - self.day_start).total_seconds())
+        lo = int(np.searchsorted(self.served_time, start, side="right"))
+        hi = int(np.searchsorted(self.served_time, end, side="left"))
+        served = np.zeros(len(self.stop_ids), dtype=bool)
+        served[self.served_stop[lo:hi]] = True
+        reached = (arrival != UNREACHED) & served
+        return pd.DataFrame({
+            "stop_id": self.stop_ids[reached],
+            "arrival_datetime": self.day_start + pd.to_timedelta(arrival[reached], unit="s"),
+            "lat": self.stop_lat[reached],
+            "lon": self.stop_lon[reached],
+        }).sort_values(by="arrival_datetime").reset_index(drop=True)
@@ -1,38 +1,148 @@
+import hashlib
+import json
 import os
 from collections import namedtuple
 
 import pandas as pd
 import numpy as np
 
-Data = namedtuple("Data", ["stops", "durations", "trips_dates", "stoptimes"])
-
-
-def load_prepared_data(gtfs_folder):
-    paths = {field: os.path.join(gtfs_folder, field + ".p") for field in Data._fields}
-    dataframes = {field: pd.read_pickle(path) for field, path in paths.items()}
-    data = Data(**dataframes)
-    return data
-
-
-def _store(df, folder, name):
-    path = os.path.join(folder, name)
-    df.to_pickle(path)
-
+from .transfers import Transfers
 
-def store_durations(durations, gtfs_folder):
-    _store(durations, gtfs_folder, "durations.p")
-
-
-def store_stops(stops, gtfs_folder):
-    _store(stops, gtfs_folder, "stops.p")
+Data = namedtuple("Data", ["stops", "durations", "trips_dates", "stoptimes"])
 
 
-def store_trips_dates(trips_dates, gtfs_folder):
-    _store(trips_dates, gtfs_folder, "trips_dates.p")
+# Cache des données préparées : une colonne par fichier .npy (lecture sans
+# pickle), identifiants encodés en int32 (seuls les codes sont conservés : ils
+# ne servent qu'aux jointures), heures en secondes int32, dates en jours int32.
+# header.json porte l'empreinte du flux GTFS d'origine.
+CACHE_FOLDER = "isochrone_cache"
+CACHE_FORMAT = 1
+FEED_FILES = ["stops.txt", "routes.txt", "trips.txt", "calendar_dates.txt", "stop_times.txt"]
+MISSING_SECONDS = np.iinfo(np.int32).min
+
+
+def _cache_path(gtfs_folder, name=""):
+    return os.path.join(gtfs_folder, CACHE_FOLDER, name)
+
+
+def feed_checksum(gtfs_folder):
+    """Empreinte SHA-1 du contenu des fichiers GTFS utilisés."""
+    digest = hashlib.sha1()
+    for name in FEED_FILES:
+        digest.update(name.encode("utf-8"))
+        with open(os.path.join(gtfs_folder, name), "rb") as handle:
+            for block in iter(lambda: handle.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def read_header(gtfs_folder):
+    """En-tête du cache, ou None s'il n'existe pas."""
+    try:
+        with open(_cache_path(gtfs_folder, "header.json"), encoding="utf-8") as handle:
+            return json.load(handle)
+    except (OSError, ValueError):
+        return None
+
+
+def has_prepared_data(gtfs_folder, checksum, max_walk_distance_m):
+    """Indique si le cache correspond au flux (empreinte) et aux paramètres de préparation."""
+    header = read_header(gtfs_folder)
+    return (
+        header is not None
+        and header.get("format") == CACHE_FORMAT
+        and header.get("checksum") == checksum
+        and header.get("max_walk_distance_m") == max_walk_distance_m
+    )
 
 
-def store_stoptimes(stoptimes, gtfs_folder):
-    _store(stoptimes, gtfs_folder, "stoptimes.p")
+def load_prepared_data(gtfs_folder):
+    """
+    Charge les données préparées depuis le cache. stop_id et trip_id restent
+    encodés en entiers (mêmes codes dans toutes les tables) : ils ne servent
+    qu'aux jointures.
+    """
+    def column(name):
+        return np.load(_cache_path(gtfs_folder, name + ".npy"), allow_pickle=False)
+
+    stops = pd.DataFrame({
+        "stop_id": column("stops_stop_id"),
+        "stop_lat": column("stops_stop_lat"),
+        "stop_lon": column("stops_stop_lon"),
+    })
+    durations = Transfers(
+        np.asarray(stops["stop_id"]),
+        column("durations_indptr"),
+        column("durations_indices"),
+        column("durations_seconds"),
+        read_header(gtfs_folder)["max_walk_distance_m"],
+    )
+    trips_dates = pd.DataFrame({
+        "trip_id": column("trips_dates_trip_id"),
+        "route_type": column("trips_dates_route_type"),
+        "date": pd.to_datetime(np.asarray(column("trips_dates_date")).astype("datetime64[D]")),
+    })
+    arrival = np.asarray(column("stoptimes_arrival_time"), dtype=np.float64)
+    arrival[arrival == MISSING_SECONDS] = np.nan
+    stoptimes = pd.DataFrame({
+        "trip_id": column("stoptimes_trip_id"),
+        "stop_id": column("stoptimes_stop_id"),
+        "arrival_time": pd.to_timedelta(arrival, unit="s"),
+    })
+    return Data(stops=stops, durations=durations, trips_dates=trips_dates, stoptimes=stoptimes)
+
+
+def store_prepared_data(data, gtfs_folder, checksum):
+    """
+    Écrit les données préparées (identifiants sous forme de chaînes) dans le
+    cache, puis l'en-tête : un cache interrompu n'a donc pas d'en-tête valide.
+    Chaque fichier est écrit à côté puis renommé : aucun fichier du cache
+    n'est laissé à moitié écrit.
+    """
+    folder = _cache_path(gtfs_folder)
+    os.makedirs(folder, exist_ok=True)
+    header_path = _cache_path(gtfs_folder, "header.json")
+    if os.path.exists(header_path):
+        os.remove(header_path)
+
+    def save(name, values):
+        path = _cache_path(gtfs_folder, name + ".npy")
+        with open(path + ".tmp", "wb") as handle:
+            np.save(handle, values, allow_pickle=False)
+        os.replace(path + ".tmp", path)
+
+    # Codes des identifiants, communs à toutes les tables
+    stop_codes = pd.factorize(pd.concat([data.stops["stop_id"], data.stoptimes["stop_id"]]))[0]
+    trip_codes = pd.factorize(pd.concat([data.trips_dates["trip_id"], data.stoptimes["trip_id"]]))[0]
+    stop_codes, trip_codes = stop_codes.astype(np.int32), trip_codes.astype(np.int32)
+
+    n_stops, n_trips = len(data.stops), len(data.trips_dates)
+    save("stops_stop_id", stop_codes[:n_stops])
+    save("stops_stop_lat", data.stops["stop_lat"].to_numpy(dtype=np.float64))
+    save("stops_stop_lon", data.stops["stop_lon"].to_numpy(dtype=np.float64))
+
+    save("durations_indptr", data.durations.indptr.astype(np.int32))
+    save("durations_indices", data.durations.indices.astype(np.int32))
+    save("durations_seconds", data.durations.seconds.astype(np.uint16))
+
+    save("trips_dates_trip_id", trip_codes[:n_trips])
+    save("trips_dates_route_type", data.trips_dates["route_type"].to_numpy(dtype=np.int16))
+    save("trips_dates_date", data.trips_dates["date"].to_numpy().astype("datetime64[D]").astype(np.int32))
+
+    arrival = data.stoptimes["arrival_time"].dt.total_seconds().to_numpy()
+    save("stoptimes_trip_id", trip_codes[n_trips:])
+    save("stoptimes_stop_id", stop_codes[n_stops:])
+    save("stoptimes_arrival_time", np.where(np.isnan(arrival), MISSING_SECONDS, arrival).astype(np.int32))
+
+    with open(header_path, "w", encoding="utf-8") as handle:
+        json.dump({
+            "format": CACHE_FORMAT,
+            "checksum": checksum,
+            "max_walk_distance_m": data.durations.max_distance_m,
+            "stops": n_stops,
+            "trips_dates": n_trips,
+            "stoptimes": len(data.stoptimes),
+        }, handle)
 
 
 def load_raw_stops(gtfs_folder):
@@ -77,6 +187,6 @@ def load_raw_stoptimes(gtfs_folder):
     stoptimes = pd.read_csv(
         path_stoptimes, usecols=["trip_id", "stop_id", "arrival_time"], dtype="object",
     )
-    stoptimes["arrival_time"] = pd.TimedeltaIndex(stoptimes["arrival_time"]).round("S")
+    stoptimes["arrival_time"] = pd.TimedeltaIndex(stoptimes["arrival_time"]).round("s")
     stoptimes = stoptimes.loc[:, ["trip_id", "stop_id", "arrival_time"]]
     return stoptimes
@@ -4,10 +4,14 @@ import json
 import geopandas
 import pandas as pd
 from .load import load_prepared_data
-from . import prepare, travel
+from . import csa, prepare, travel
 from shapely.geometry import Point
 import math
 
+# Moteurs de recherche des heures d'arrivée aux arrêts
+ENGINE_PANDAS = "pandas"  # travel.compute_arrival_points : jointures pandas, 4 correspondances au plus
+ENGINE_CSA = "csa"  # csa.ConnectionScan : Connection Scan sur tableaux NumPy
+
 def compute_isochrone(gtfs_folder, lat, lon, start_datetime, max_duration_seconds):
     data = load_prepared_data(gtfs_folder)
     print(data)
@@ -17,13 +21,19 @@ def compute_isochrone(gtfs_folder, lat, lon, start_datetime, max_duration_second
     )
 
 
-def compute_isochrone_with_data(data, lat, lon, start_datetime, max_duration_seconds, use_bus=True, use_tram=True):
+def compute_isochrone_with_data(data, lat, lon, start_datetime, max_duration_seconds, use_bus=True, use_tram=True,
+                                engine=ENGINE_PANDAS):
 
     end_datetime = start_datetime + datetime.timedelta(seconds=max_duration_seconds)
-    data = prepare.prepare_data_for_query(
-        data, start_datetime, end_datetime, use_bus, use_tram
-    )
-    points = travel.compute_arrival_points(data, lat, lon, start_datetime, end_datetime)
+    if engine == ENGINE_CSA:
+        day = start_datetime.date()
+        scan = csa.ConnectionScan(prepare.prepare_day_data(data, day), day)
+        points = scan.arrival_points(lat, lon, start_datetime, end_datetime)
+    else:
+        data = prepare.prepare_data_for_query(
+            data, start_datetime, end_datetime, use_bus, use_tram
+        )
+        points = travel.compute_arrival_points(data, lat, lon, start_datetime, end_datetime)
     distances = walk_from_points(points, end_datetime)
     geojson = build_isochrone_from_points(distances)
 
@@ -39,6 +49,19 @@ def walk_from_points(points, end_datetime):
     return distances
 
 
+def build_band_from_points(points, band_end_datetime):
+    """
+    Isochrone d'une tranche à partir des arrêts d'une recherche menée jusqu'à
+    une heure de fin au moins égale à band_end_datetime : chaque arrêt atteint
+    avant la fin de la tranche est étendu de (fin de tranche - arrivée) × vitesse de marche.
+    """
+    band = points.loc[points["arrival_datetime"] < band_end_datetime].copy()
+    if band.empty:
+        return {"type": "FeatureCollection", "features": []}
+    distances = walk_from_points(band, band_end_datetime)
+    return build_isochrone_from_points(distances)
+
+
 def build_isochrone_from_points(distances):
     points = geopandas.GeoDataFrame(
         distances, geometry=geopandas.points_from_xy(distances["lon"], distances["lat"])
@@ -102,9 +125,16 @@ def compute_isochrone_arrival(gtfs_folder, lat, lon, arrival_time, max_duration_
     Calcule les isochrones pour une heure d'arrivée souhaitée à partir d'un point (lat, lon).
     """
     # Charger les données GTFS
-     # Charger les données GTFS
     data = load_prepared_data(gtfs_folder)
-    stops = data.stops
+    return compute_isochrone_arrival_with_data(data, lat, lon, arrival_time, max_duration_seconds)
+
+
+def compute_isochrone_arrival_with_data(data, lat, lon, arrival_time, max_duration_seconds):
+    """
+    Comme compute_isochrone_arrival, à partir de données déjà chargées en mémoire.
+    """
+    # Copie : filter_accessible_stops ajoute une colonne aux arrêts
+    stops = data.stops.copy()
     stop_times = data.stoptimes
     trips_dates = data.trips_dates
 
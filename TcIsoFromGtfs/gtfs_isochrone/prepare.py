@@ -2,61 +2,77 @@ import pandas as pd
 import numpy as np
 
 from . import load
+from .transfers import Transfers
 
 
 EARTH_RADIUS_METERS = 6_371_000
 WALKING_SPEED_M_S = 1.1
+# Distance maximale d'une correspondance à pied entre deux arrêts
+MAX_WALK_DISTANCE_M = 1000
+# Les durées de marche sont stockées en secondes uint16 (Transfers)
+MAX_WALK_DISTANCE_LIMIT_M = np.iinfo(np.uint16).max * WALKING_SPEED_M_S
 
 
 def prepare_data_for_query(data, start_datetime, end_datetime, use_bus, use_tram):
-    # Étape 1 : Copier les données
-    stops = data.stops.copy()
-    durations = data.durations.copy()
-    trips_dates = data.trips_dates.copy()
-    stoptimes = data.stoptimes.copy()
+    day_data = prepare_day_data(data, start_datetime.date())
+    return prepare_window(day_data, start_datetime, end_datetime)
 
 
+def prepare_day_data(data, day):
+    """Horaires des trajets actifs le jour 'day', datés et triés par (trip_id, datetime).
 
-    # Étape 2 : Filtrer les trajets actifs pour la journée spécifiée
-    trips_dates = trips_dates.loc[trips_dates["date"].dt.date == start_datetime.date()]
+    Ne dépend que du jour : le résultat peut être conservé en mémoire et
+    réutilisé pour toutes les requêtes de ce jour (voir session.GtfsSession)."""
+    # Filtrer les trajets actifs pour la journée spécifiée
+    trips_dates = data.trips_dates.loc[data.trips_dates["date"].dt.date == day]
 
+    # Filtrer les horaires pour les trajets valides et ajouter datetime
+    stoptimes = data.stoptimes.merge(trips_dates, on="trip_id", how="inner")
+    stoptimes["datetime"] = stoptimes["date"] + stoptimes["arrival_time"]
+    stoptimes = stoptimes.loc[:, ["trip_id", "stop_id", "datetime"]].sort_values(by=["trip_id", "datetime"])
+
+    return load.Data(
+        stops=data.stops, durations=data.durations, trips_dates=trips_dates, stoptimes=stoptimes
+    )
 
-    # Étape 4 : Filtrer les horaires pour les trajets valides
-    stoptimes = stoptimes.merge(trips_dates, on="trip_id", how="inner")
 
-    # Ajouter datetime et filtrer les horaires pertinents
-    stoptimes["datetime"] = stoptimes["date"] + stoptimes["arrival_time"]
+def prepare_window(day_data, start_datetime, end_datetime):
+    """Restreint les données d'un jour (prepare_day_data) à la fenêtre [start, end]."""
+    # Filtrer les horaires pertinents
+    stoptimes = day_data.stoptimes
     stoptimes = stoptimes.loc[
-        (stoptimes["datetime"] > start_datetime) & (stoptimes["datetime"] < end_datetime),
-        ["trip_id", "stop_id", "datetime"],
+        (stoptimes["datetime"] > start_datetime) & (stoptimes["datetime"] < end_datetime)
     ]
 
-    # Étape 5 : Filtrer les arrêts valides
+    # Filtrer les arrêts valides
+    stops = day_data.stops
     stops = stops.loc[stops["stop_id"].isin(stoptimes["stop_id"].unique())]
 
-    # Étape 6 : Filtrer les durées valides
+    # Filtrer les durées valides
+    durations = day_data.durations.to_frame()
     durations = durations.loc[
         (durations["walk_duration"].dt.total_seconds() < (end_datetime - start_datetime).total_seconds())
         & durations["stop_id_from"].isin(stops["stop_id"])
         & durations["stop_id_to"].isin(stops["stop_id"])
     ]
 
-    # Étape 7 : Construire les nouvelles données
-    new_data = load.Data(
-        stops=stops, durations=durations, trips_dates=trips_dates, stoptimes=stoptimes
+    return load.Data(
+        stops=stops, durations=durations, trips_dates=day_data.trips_dates, stoptimes=stoptimes
     )
 
-    return new_data
 
+def prepare_data_in_gtfs_folder(folder, max_walk_distance_m=MAX_WALK_DISTANCE_M):
+    """
+    Prépare le dossier GTFS et renvoie les données préparées (load.load_prepared_data).
+    Le cache n'est reconstruit que si le flux ou la distance de marche ont changé.
+    """
+    checksum = load.feed_checksum(folder)
+    if load.has_prepared_data(folder, checksum, max_walk_distance_m):
+        return load.load_prepared_data(folder)
 
-
-def prepare_data_in_gtfs_folder(folder):
     # stops
     stops = load.load_raw_stops(folder)
-    durations = prepare_stop_walk_duration(stops)
-
-    load.store_stops(stops, folder)
-    load.store_durations(durations, folder)
+    durations = prepare_stop_walk_duration(stops, max_walk_distance_m)
 
     # trip dates with route type
     calendar_dates = load.load_raw_calendar_dates(folder)
@@ -64,11 +80,15 @@ def prepare_data_in_gtfs_folder(folder):
     routes = load.load_raw_routes(folder)
     trips_dates = prepare_trips_dates(trips, calendar_dates, routes)
 
-    load.store_trips_dates(trips_dates, folder)
-
     # stoptimes
     stoptimes = load.load_raw_stoptimes(folder)
-    load.store_stoptimes(stoptimes, folder)
+
+    load.store_prepared_data(
+        load.Data(stops=stops, durations=durations, trips_dates=trips_dates, stoptimes=stoptimes),
+        folder,
+        checksum,
+    )
+    return load.load_prepared_data(folder)
 
 
 def prepare_trips_dates(trips, calendar_dates, routes):
@@ -79,22 +99,51 @@ def prepare_trips_dates(trips, calendar_dates, routes):
     )
 
 
-def prepare_stop_walk_duration(stops):
-    stops = stops.copy()
-    stops["fake"] = True
-    distances = stops.merge(stops, on="fake", suffixes=["_from", "_to"])
-    lat1, lat2, lon1, lon2 = map(
-        lambda col: distances[col],
-        ["stop_lat_from", "stop_lat_to", "stop_lon_from", "stop_lon_to"],
-    )
-
-    distances["walk_duration"] = walk_duration(lat1, lat2, lon1, lon2)
+def prepare_stop_walk_duration(stops, max_distance_m=MAX_WALK_DISTANCE_M):
+    """
+    Correspondances à pied entre arrêts distants d'au plus max_distance_m (Transfers, CSR).
 
-    distances = distances.loc[
-        distances["stop_id_from"] != distances["stop_id_to"],
-        ["stop_id_from", "stop_id_to", "walk_duration"],
-    ]
-    return distances
+    Les arrêts sont répartis dans une grille de cellules d'au moins
+    max_distance_m de côté : seuls les couples d'une même cellule ou de
+    cellules voisines sont comparés, au lieu du produit cartésien des arrêts.
+    Une distance nulle ou négative ne donne aucune correspondance ; au-delà de
+    MAX_WALK_DISTANCE_LIMIT_M, les durées ne tiennent plus en uint16 (ValueError).
+    """
+    if max_distance_m > MAX_WALK_DISTANCE_LIMIT_M:
+        raise ValueError(
+            f"Distance de marche maximale trop grande : {max_distance_m} m (limite {MAX_WALK_DISTANCE_LIMIT_M:.0f} m)"
+        )
+    stop_ids = stops["stop_id"].to_numpy()
+    lat = stops["stop_lat"].to_numpy(dtype=np.float64)
+    lon = stops["stop_lon"].to_numpy(dtype=np.float64)
+    empty = np.empty(0, dtype=np.int64)
+    located = np.flatnonzero(np.isfinite(lat) & np.isfinite(lon))
+    if len(located) == 0 or max_distance_m <= 0:
+        return Transfers.from_pairs(stop_ids, empty, empty, empty, max_distance_m)
+
+    # Taille des cellules en degrés, majorée pour l'arrêt le plus éloigné de l'équateur
+    cell_lat = np.degrees(max_distance_m / EARTH_RADIUS_METERS)
+    cell_lon = cell_lat / max(np.cos(np.radians(np.max(np.abs(lat[located])))), 1e-6)
+    cells = pd.DataFrame({
+        "cell_x": np.floor(lon[located] / cell_lon).astype(np.int64),
+        "cell_y": np.floor(lat[located] / cell_lat).astype(np.int64),
+        "index": located,
+    })
+
+    walk_from, walk_to = [], []
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            shifted = cells.assign(cell_x=cells["cell_x"] + dx, cell_y=cells["cell_y"] + dy)
+            pairs = cells.merge(shifted, on=["cell_x", "cell_y"], suffixes=["_from", "_to"])
+            walk_from.append(pairs["index_from"].to_numpy())
+            walk_to.append(pairs["index_to"].to_numpy())
+    walk_from = np.concatenate(walk_from)
+    walk_to = np.concatenate(walk_to)
+
+    distances = distance_meters(lat[walk_from], lat[walk_to], lon[walk_from], lon[walk_to])
+    keep = (walk_from != walk_to) & (distances <= max_distance_m)
+    seconds = np.rint(distances[keep] / WALKING_SPEED_M_S)
+    return Transfers.from_pairs(stop_ids, walk_from[keep], walk_to[keep], seconds, max_distance_m)
 
 
 def distance_meters(lat1, lat2, lon1, lon2):
@@ -117,9 +166,9 @@ def distance_meters(lat1, lat2, lon1, lon2):
 
 def walk_duration(lat1, lat2, lon1, lon2):
     distances_meters = distance_meters(lat1, lat2, lon1, lon2)
-    walk_duration_seconds = pd.TimedeltaIndex(
-        distances_meters / WALKING_SPEED_M_S, "seconds"
-    ).round("S")
+    walk_duration_seconds = pd.to_timedelta(
+        np.asarray(distances_meters / WALKING_SPEED_M_S), unit="s"
+    ).round("s")
     return walk_duration_seconds
 
 
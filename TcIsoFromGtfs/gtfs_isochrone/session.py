@@ -0,0 +1,75 @@
+import datetime
+
+from . import csa, prepare, travel
+from .main import (
+    ENGINE_CSA,
+    ENGINE_PANDAS,
+    build_band_from_points,
+    build_isochrone_from_points,
+    compute_isochrone_arrival_with_data,
+    walk_from_points,
+)
+
+
+class GtfsSession:
+    """
+    Données GTFS chargées et préparées une seule fois pour toutes les requêtes
+    d'un traitement (un point, une durée, ...).
+
+    Les horaires filtrés sur un jour (prepare.prepare_day_data) sont gardés en
+    mémoire : une requête ne coûte plus que la restriction à sa fenêtre
+    horaire et la recherche elle-même. Avec le moteur ENGINE_CSA, les
+    connexions du jour (csa.ConnectionScan) sont elles aussi construites une
+    seule fois.
+    """
+
+    def __init__(self, data, engine=ENGINE_PANDAS):
+        self.data = data
+        self.engine = engine
+        self._days = {}
+        self._scans = {}
+
+    @classmethod
+    def from_gtfs_folder(cls, gtfs_folder, engine=ENGINE_PANDAS, max_walk_distance_m=prepare.MAX_WALK_DISTANCE_M):
+        """Prépare le dossier GTFS (cache reconstruit si le flux a changé) et garde les données en mémoire."""
+        return cls(prepare.prepare_data_in_gtfs_folder(gtfs_folder, max_walk_distance_m), engine)
+
+    def day_data(self, day):
+        """Données du jour 'day' (datetime.date), calculées à la première demande."""
+        if day not in self._days:
+            self._days[day] = prepare.prepare_day_data(self.data, day)
+        return self._days[day]
+
+    def arrival_points(self, lat, lon, start_datetime, end_datetime):
+        """Arrêts atteints depuis (lat, lon) avant end_datetime et heure d'arrivée, selon le moteur."""
+        day = start_datetime.date()
+        if self.engine == ENGINE_CSA:
+            if day not in self._scans:
+                self._scans[day] = csa.ConnectionScan(self.day_data(day), day)
+            return self._scans[day].arrival_points(lat, lon, start_datetime, end_datetime)
+        data = prepare.prepare_window(self.day_data(day), start_datetime, end_datetime)
+        return travel.compute_arrival_points(data, lat, lon, start_datetime, end_datetime)
+
+    def isochrone(self, lat, lon, start_datetime, max_duration_seconds):
+        """Isochrone (GeoJSON) au départ de (lat, lon) à start_datetime."""
+        end_datetime = start_datetime + datetime.timedelta(seconds=max_duration_seconds)
+        points = self.arrival_points(lat, lon, start_datetime, end_datetime)
+        distances = walk_from_points(points, end_datetime)
+        return build_isochrone_from_points(distances)
+
+    def isochrones(self, lat, lon, start_datetime, durations_seconds):
+        """Isochrones de plusieurs durées au départ de (lat, lon) : [(durée, GeoJSON)].
+
+        Une seule recherche est menée jusqu'à la plus grande durée ; les
+        heures d'arrivée aux arrêts suffisent ensuite à construire chaque tranche."""
+        durations_seconds = sorted(durations_seconds)
+        end_datetime = start_datetime + datetime.timedelta(seconds=durations_seconds[-1])
+        points = self.arrival_points(lat, lon, start_datetime, end_datetime)
+        return [
+            (duration, build_band_from_points(points, start_datetime + datetime.timedelta(seconds=duration)))
+            for duration in durations_seconds
+        ]
+
+    def isochrone_arrival(self, lat, lon, arrival_time, max_duration_seconds):
+        """Isochrone (GeoJSON) pour une arrivée en (lat, lon) à arrival_time."""
+        return compute_isochrone_arrival_with_data(self.data, lat, lon, arrival_time, max_duration_seconds)
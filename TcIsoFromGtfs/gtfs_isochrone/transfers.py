@@ -0,0 +1,63 @@
+"""
+Graphe creux des correspondances à pied entre arrêts, au format CSR :
+pour l'arrêt i, les arrêts voisins sont indices[indptr[i]:indptr[i + 1]] et
+les durées de marche (secondes) seconds[indptr[i]:indptr[i + 1]], triées par
+durée croissante.
+"""
+import numpy as np
+import pandas as pd
+
+
+class Transfers:
+    """Correspondances à pied limitées à une distance maximale (voir prepare.prepare_stop_walk_duration)."""
+
+    def __init__(self, stop_ids, indptr, indices, seconds, max_distance_m):
+        self.stop_ids = stop_ids  # object : stop_id de chaque indice
+        self.indptr = indptr  # int32, len(stop_ids) + 1
+        self.indices = indices  # int32
+        self.seconds = seconds  # uint16
+        self.max_distance_m = max_distance_m
+        self._frame = None
+
+    @classmethod
+    def from_pairs(cls, stop_ids, walk_from, walk_to, seconds, max_distance_m):
+        """Construit le CSR à partir de couples (indice départ, indice arrivée, secondes)."""
+        if len(seconds) and np.max(seconds) > np.iinfo(np.uint16).max:
+            raise ValueError(f"Durée de marche hors limites : {np.max(seconds)} s (uint16)")
+        order = np.lexsort((seconds, walk_from))
+        counts = np.bincount(walk_from, minlength=len(stop_ids))
+        indptr = np.zeros(len(stop_ids) + 1, dtype=np.int32)
+        np.cumsum(counts, out=indptr[1:])
+        return cls(
+            stop_ids,
+            indptr,
+            walk_to[order].astype(np.int32),
+            seconds[order].astype(np.uint16),
+            max_distance_m,
+        )
+
+    def __len__(self):
+        return len(self.indices)
+
+    def sources(self):
+        """Indice de l'arrêt de départ de chaque correspondance."""
+        return np.repeat(np.arange(len(self.stop_ids), dtype=np.int32), np.diff(self.indptr))
+
+    def to_frame(self):
+        """
+        DataFrame ["stop_id_from", "stop_id_to", "walk_duration"] attendu par
+        travel.compute_arrival_points ; construit à la première demande.
+        """
+        if self._frame is None:
+            self._frame = pd.DataFrame({
+                "stop_id_from": self.stop_ids[self.sources()],
+                "stop_id_to": self.stop_ids[self.indices],
+                "walk_duration": pd.to_timedelta(self.seconds.astype(np.int64), unit="s"),
+            })
+        return self._frame
+
+    def __getstate__(self):
+        # Le DataFrame dérivé n'est pas enregistré avec les tableaux
+        state = self.__dict__.copy()
+        state["_frame"] = None
+        return state
@@ -23,14 +23,12 @@ def compute_arrival_points(data, lat, lon, start_datetime, end_datetime):
     for num_changement in range(4):
         # find reachable stoptimes
         reachable_stoptimes = stoptimes.merge(reached_stops, on="stop_id", how="left")
-        reachable_stoptimes["reachable"] = np.nan
-        reachable_stoptimes.loc[
-            reachable_stoptimes["datetime"] > reachable_stoptimes["arrival_datetime"],
-            "reachable",
-        ] = True
+        reachable_stoptimes["reachable"] = np.where(
+            reachable_stoptimes["datetime"] > reachable_stoptimes["arrival_datetime"], 1.0, np.nan
+        )
         reachable_stoptimes["reachable"] = reachable_stoptimes.groupby("trip_id")[
             "reachable"
-        ].fillna(method="ffill")
+        ].ffill()
 
         # keep only reachable stoptimes, the rest is used for next iteration
         valids = reachable_stoptimes["reachable"].notnull()
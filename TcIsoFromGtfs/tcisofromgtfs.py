@@ -6,6 +6,7 @@ from qgis.core import (
     QgsProcessingParameterFile,
     QgsProcessingParameterString,
     QgsProcessingParameterEnum,
+    QgsProcessingParameterNumber,
     QgsProcessingParameterVectorLayer,
     QgsProcessingException,
     QgsFeature,
@@ -16,9 +17,10 @@ from qgis.core import (
 from qgis.PyQt.QtCore import QVariant
 
 
-from .gtfs_isochrone.main import compute_isochrone,compute_isochrone_arrival
 import datetime
-from .gtfs_isochrone.prepare import prepare_data_in_gtfs_folder
+from .gtfs_isochrone.session import GtfsSession
+from .gtfs_isochrone.main import ENGINE_CSA, ENGINE_PANDAS
+from .gtfs_isochrone.prepare import MAX_WALK_DISTANCE_M, MAX_WALK_DISTANCE_LIMIT_M
 # Obtenir la date et l'heure de demain
 tomorrow = datetime.datetime.now() + datetime.timedelta(days=1)
 
@@ -31,6 +33,8 @@ class GtfsIsochrone(QgsProcessingAlgorithm):
     INPUT_GTFS_FOLDER = "INPUT_GTFS_FOLDER"
     START_DATETIME = "START_DATETIME"
     TYPE_HEURE = "TYPE_HEURE"
+    ENGINE = "ENGINE"
+    MAX_WALK_DISTANCE = "MAX_WALK_DISTANCE"
     DURATION_RANGES = "DURATION_RANGES"
     OUTPUT_LAYER = "OUTPUT_LAYER"
 
@@ -64,6 +68,24 @@ class GtfsIsochrone(QgsProcessingAlgorithm):
                 defaultValue=1  # Par défaut : "Heure de départ"
             )
         )
+        self.addParameter(
+            QgsProcessingParameterEnum(
+                self.ENGINE,
+                self.tr("Moteur de calcul (heure de départ)"),
+                options=["Connection Scan (rapide, correspondances illimitées)", "Historique (pandas, 4 correspondances au plus)"],
+                defaultValue=1  # Par défaut : moteur historique, résultats inchangés pour les traitements existants
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.MAX_WALK_DISTANCE,
+                self.tr("Distance maximale d'une correspondance à pied entre arrêts (m)"),
+                type=QgsProcessingParameterNumber.Double,
+                minValue=0,
+                maxValue=MAX_WALK_DISTANCE_LIMIT_M,
+                defaultValue=MAX_WALK_DISTANCE_M
+            )
+        )
         self.addParameter(
             QgsProcessingParameterString(
                 "DURATION_RANGES",
@@ -92,9 +114,12 @@ class GtfsIsochrone(QgsProcessingAlgorithm):
         start_datetime_str = self.parameterAsString(parameters, self.START_DATETIME, context)
         duration_ranges = self.parameterAsString(parameters, "DURATION_RANGES", context)
         type_heure = parameters['TYPE_HEURE']  # 0 pour "Heure de départ", 1 pour "Heure d'arrivée"
+        engine = [ENGINE_CSA, ENGINE_PANDAS][self.parameterAsEnum(parameters, self.ENGINE, context)]
+        max_walk_distance = self.parameterAsDouble(parameters, self.MAX_WALK_DISTANCE, context)
         try : 
             feedback.pushInfo("Préparation des données d'entrée...")
-            prepare_data_in_gtfs_folder(gtfs_folder)
+            # Chargement et préparation une seule fois pour tous les points et toutes les durées
+            session = GtfsSession.from_gtfs_folder(gtfs_folder, engine, max_walk_distance)
         except Exception as e:
             raise QgsProcessingException(f"Impossible de préparer les données :{e}")
 
@@ -136,18 +161,21 @@ class GtfsIsochrone(QgsProcessingAlgorithm):
             point = geom.asPoint()
             lat, lon = point.y(), point.x()
 
-            for max_duration in duration_list:
-                feedback.pushInfo(f"Calcul de l'isochrone pour lat={lat}, lon={lon}, durée={max_duration} minutes")
-
-               
-
-                if type_heure == 0:
-                    feedback.pushInfo("Calcul des isochrones avec heure de départ")
-                    geojson = compute_isochrone(gtfs_folder, lat, lon, start_datetime, max_duration * 60)
-                elif type_heure == 1:
+            if type_heure == 0:
+                feedback.pushInfo(f"Calcul des isochrones avec heure de départ pour lat={lat}, lon={lon}, durées={duration_list} minutes")
+                # Une seule recherche jusqu'à la plus grande durée : toutes les tranches en sont déduites
+                bands = [
+                    (duration // 60, geojson)
+                    for duration, geojson in session.isochrones(lat, lon, start_datetime, [d * 60 for d in duration_list])
+                ]
+            else:
+                bands = []
+                for max_duration in duration_list:
+                    feedback.pushInfo(f"Calcul de l'isochrone pour lat={lat}, lon={lon}, durée={max_duration} minutes")
                     feedback.pushInfo("Calcul des isochrones avec heure d\'arrivée")
-                    geojson = compute_isochrone_arrival(gtfs_folder, lat, lon, start_datetime, max_duration * 60)
+                    bands.append((max_duration, session.isochrone_arrival(lat, lon, start_datetime, max_duration * 60)))
 
+            for max_duration, geojson in bands:
                 # Ajouter les isochrones à la couche de sortie
                 for feature_geojson in geojson["features"]:
                     if feature_geojson["geometry"]["type"] == "Polygon":
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+Lecture directe des tables d'un GTFS (archive .zip ou dossier) avec pandas,
+sans passer par des couches QGIS : seules les colonnes utiles sont lues, avec
+des types explicites, par blocs de lignes.
+"""
+
+import os
+import zipfile
+
+import pandas as pd
+
+
+# Types des colonnes lues : identifiants en texte (« 007 » doit rester « 007 »)
+DTYPES = {
+    "trip_id": str,
+    "stop_id": str,
+    "route_id": str,
+    "stop_sequence": "int32",
+    "stop_lat": "float64",
+    "stop_lon": "float64",
+}
+
+CHUNK_SIZE = 500_000
+
+
+def gtfs_root(path):
+    """Archive ou dossier GTFS désigné par 'path' : un fichier .txt désigne son dossier."""
+    if path.lower().endswith(".txt"):
+        return os.path.dirname(path)
+    return path
+
+
+def has_table(path, table):
+    """Indique si le GTFS contient 'table' (ex. « trips.txt »)."""
+    root = gtfs_root(path)
+    if zipfile.is_zipfile(root):
+        with zipfile.ZipFile(root) as archive:
+            return _member(archive, table) is not None
+    return os.path.exists(os.path.join(root, table))
+
+
+def _member(archive, table):
+    # Certaines archives placent les fichiers dans un sous-dossier
+    for name in archive.namelist():
+        if os.path.basename(name) == table:
+            return name
+    return None
+
+
+def read_table(path, table, columns, feedback=None):
+    """Lit les colonnes 'columns' de la table 'table' du GTFS 'path' (zip ou dossier).
+
+    La lecture se fait par blocs de CHUNK_SIZE lignes pour suivre la
+    progression et permettre l'annulation ; une colonne absente lève KeyError.
+    """
+    root = gtfs_root(path)
+    if zipfile.is_zipfile(root):
+        with zipfile.ZipFile(root) as archive:
+            member = _member(archive, table)
+            if member is None:
+                raise FileNotFoundError(f"{table} absent de l'archive {root}")
+            with archive.open(member) as handle:
+                return _read_chunks(handle, table, columns, feedback)
+    with open(os.path.join(root, table), "rb") as handle:
+        return _read_chunks(handle, table, columns, feedback)
+
+
+def _read_chunks(handle, table, columns, feedback):
+    # Les deux lectures utilisent les mêmes options ; les noms de colonnes sont
+    # ensuite nettoyés (en-têtes du type « trip_id, stop_id ») et imposés via 'names'
+    options = dict(encoding="utf-8-sig", skipinitialspace=True)
+    header = pd.read_csv(handle, nrows=0, **options)
+    names = [name.strip() for name in header.columns]
+    missing = [column for column in columns if column not in names]
+    if missing:
+        raise KeyError(f"{table} : colonnes manquantes {missing}")
+    handle.seek(0)
+    dtype = {column: DTYPES.get(column, str) for column in columns}
+    chunks = []
+    rows = 0
+    for chunk in pd.read_csv(handle, header=0, names=names, usecols=columns, dtype=dtype,
+                             chunksize=CHUNK_SIZE, **options):
+        chunks.append(chunk)
+        rows += len(chunk)
+        if feedback is not None:
+            if feedback.isCanceled():
+                break
+            feedback.pushInfo(f"{table} : {rows} lignes lues...")
+    df = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=columns)
+    return df[columns]
@@ -1,5 +1,10 @@
+import contextlib
+import csv
+import json
+import math
+import os
+import threading
 import pandas as pd
-import requests
 from collections import defaultdict
 from qgis.PyQt.QtCore import QCoreApplication, QVariant
 from qgis.core import (
@@ -16,7 +21,22 @@ from qgis.core import (
     QgsCoordinateReferenceSystem,
     QgsFeatureSink,
     QgsPointXY,
+    QgsProcessingParameterBoolean,
+    QgsProcessingParameterFile,
+    QgsProcessingParameterFileDestination,
+    QgsProcessingOutputFile,
+    QgsFeatureRequest,
+    QgsProcessingParameterEnum,
+    QgsProcessingParameterField,
+    QgsCoordinateTransform,
+    QgsLineString,
 )
+from ..routing_common.http_client import HttpError
+from ..routing_common.concurrency import ordered_map, FeedbackCancel
+from ..routing_common.api_options import api_parameters, read_api_parameters, open_client, open_cache
+from ..routing_common.road_graph import RoadGraph
+from .segments import sort_stop_times, build_segments, unique_pairs, stop_sequences
+from .gtfs_reader import read_table, has_table
 
 
 
@@ -25,17 +45,44 @@ from qgis.core import (
 class GtfsRouteIgn(QgsProcessingAlgorithm):
     """Génère une couche d'itinéraires à partir de deux fichiers GTFS."""
 
+    INPUT_GTFS = "INPUT_GTFS"
     INPUT_TRIP_FILE = "INPUT_TRIP_FILE"
     INPUT_STOP_FILE = "INPUT_STOP_FILE"
+    INPUT_TRIPS_FILE = "INPUT_TRIPS_FILE"
+    BACKEND = "BACKEND"
+    NETWORK = "NETWORK"
+    SPEED_FIELD = "SPEED_FIELD"
+    DIRECTION_FIELD = "DIRECTION_FIELD"
+    BY_PATTERN = "BY_PATTERN"
+    SHAPES_FILE = "SHAPES_FILE"
+    TRIP_SHAPES_FILE = "TRIP_SHAPES_FILE"
     OUTPUT_LAYER = "OUTPUT_LAYER"
 
+    RESOURCE = "bdtopo-osrm"
+    # Précision des coordonnées dans la clé du cache des segments (5 décimales ≈ 1 m)
+    CACHE_PRECISION = 5
+    # Distance (m) entre un arrêt et le tronçon le plus proche au-delà de laquelle on avertit
+    SNAP_WARNING_DISTANCE = 100.0
+
     def initAlgorithm(self, config=None):
+        # GTFS lu directement (archive .zip, ou un fichier .txt de son dossier),
+        # à la place des couches stop_times et stops
+        self.addParameter(
+            QgsProcessingParameterFile(
+                self.INPUT_GTFS,
+                self.tr("GTFS : archive .zip ou fichier .txt du dossier (remplace les couches)"),
+                behavior=QgsProcessingParameterFile.File,
+                fileFilter="GTFS (*.zip *.txt)",
+                optional=True,
+            )
+        )
         # Couche stop_times
         self.addParameter(
             QgsProcessingParameterFeatureSource(
                 self.INPUT_TRIP_FILE,
                 self.tr("Couche stop_times (trip_id, stop_id, stop_sequence)"),
                 types=[QgsProcessing.TypeVector],
+                optional=True,
             )
         )
         # Couche stops
@@ -44,6 +91,59 @@ class GtfsRouteIgn(QgsProcessingAlgorithm):
                 self.INPUT_STOP_FILE,
                 self.tr("Couche stops (stop_id, stop_lat, stop_lon)"),
                 types=[QgsProcessing.TypeVector],
+                optional=True,
+            )
+        )
+        # Couche trips, pour la liste des route_id de chaque séquence d'arrêts
+        self.addParameter(
+            QgsProcessingParameterFeatureSource(
+                self.INPUT_TRIPS_FILE,
+                self.tr("Couche trips (trip_id, route_id), optionnelle"),
+                types=[QgsProcessing.TypeVector],
+                optional=True,
+            )
+        )
+        # Moteur de calcul : API IGN ou graphe local construit à partir d'une couche de tronçons
+        self.addParameter(
+            QgsProcessingParameterEnum(
+                self.BACKEND,
+                self.tr("Moteur de calcul"),
+                options=["API IGN (geopf)", "Graphe local (couche de tronçons routiers)"],
+                allowMultiple=False,
+                defaultValue=0,
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterFeatureSource(
+                self.NETWORK,
+                self.tr("Couche de tronçons routiers (graphe local, ex. BD TOPO troncon_de_route)"),
+                types=[QgsProcessing.TypeVectorLine],
+                optional=True,
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterField(
+                self.SPEED_FIELD,
+                self.tr("Champ vitesse en km/h (graphe local, optionnel)"),
+                parentLayerParameterName=self.NETWORK,
+                type=QgsProcessingParameterField.Numeric,
+                optional=True,
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterField(
+                self.DIRECTION_FIELD,
+                self.tr("Champ sens de circulation (graphe local, optionnel)"),
+                parentLayerParameterName=self.NETWORK,
+                optional=True,
+            )
+        )
+        # Une géométrie par séquence ordonnée d'arrêts (pattern) au lieu d'une par trip
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                self.BY_PATTERN,
+                self.tr("Une entité par séquence d'arrêts (pattern) au lieu d'une par trip"),
+                defaultValue=False,
             )
         )
         # Paramètre de sortie
@@ -52,27 +152,76 @@ class GtfsRouteIgn(QgsProcessingAlgorithm):
                 self.OUTPUT_LAYER, self.tr("Couche de sortie (itinéraires)")
             )
         )
-
-    def source_to_dataframe(self, source):
-        """Convertit une couche QGIS en un DataFrame pandas."""
-        fields = [field.name() for field in source.fields()]
-        data = []
-        for feature in source.getFeatures():
-            data.append(feature.attributes())
-        return pd.DataFrame(data, columns=fields)
+        self.addParameter(
+            QgsProcessingParameterFileDestination(
+                self.SHAPES_FILE,
+                self.tr("Fichier GTFS shapes.txt (optionnel)"),
+                fileFilter="GTFS shapes (*.txt)",
+                optional=True,
+                createByDefault=False,
+            )
+        )
+        self.addOutput(
+            QgsProcessingOutputFile(
+                self.TRIP_SHAPES_FILE,
+                self.tr("Correspondance trip_id → shape_id (à côté de shapes.txt)"),
+            )
+        )
+        # Exécution concurrente et cache persistant des segments entre arrêts
+        for param in api_parameters(self, self.tr("Utiliser le cache des segments"), precision=False):
+            self.addParameter(param)
+
+    def source_to_dataframe(self, source, columns=None):
+        """Convertit une couche QGIS en un DataFrame pandas, colonne par colonne.
+
+        Seuls les champs 'columns' présents dans la couche (tous par défaut) sont
+        lus, sans les géométries."""
+        fields = source.fields()
+        names = [name for name in (columns or fields.names()) if fields.indexOf(name) >= 0]
+        indexes = [fields.indexOf(name) for name in names]
+        request = QgsFeatureRequest().setFlags(QgsFeatureRequest.NoGeometry).setSubsetOfAttributes(indexes)
+        values = [[] for _ in names]
+        for feature in source.getFeatures(request):
+            attributes = feature.attributes()
+            for column, index in zip(values, indexes):
+                column.append(attributes[index])
+        return pd.DataFrame(dict(zip(names, values)), columns=names)
 
     def processAlgorithm(self, parameters, context, feedback):
         # Récupération des couches
+        gtfs_path = self.parameterAsFile(parameters, self.INPUT_GTFS, context)
         trip_source = self.parameterAsSource(parameters, self.INPUT_TRIP_FILE, context)
         stop_source = self.parameterAsSource(parameters, self.INPUT_STOP_FILE, context)
-
-        if not trip_source or not stop_source:
-            raise QgsProcessingException("Les couches d'entrée sont requises.")
-
-        # Convertir les couches en DataFrame
-        feedback.pushInfo("Conversion des couches en DataFrame...")
-        trip_df = self.source_to_dataframe(trip_source)
-        stop_df = self.source_to_dataframe(stop_source)
+        api = read_api_parameters(self, parameters, context)
+        trips_source = self.parameterAsSource(parameters, self.INPUT_TRIPS_FILE, context)
+        by_pattern = self.parameterAsBoolean(parameters, self.BY_PATTERN, context)
+        shapes_file = self.parameterAsFileOutput(parameters, self.SHAPES_FILE, context)
+        use_graph = self.parameterAsEnum(parameters, self.BACKEND, context) == 1
+        network = self.parameterAsSource(parameters, self.NETWORK, context)
+        speed_field = self.parameterAsString(parameters, self.SPEED_FIELD, context)
+        direction_field = self.parameterAsString(parameters, self.DIRECTION_FIELD, context)
+
+        if use_graph and network is None:
+            raise QgsProcessingException("Le graphe local nécessite une couche de tronçons routiers.")
+
+        if gtfs_path:
+            # Lecture directe des fichiers texte : colonnes utiles seulement, types explicites, par blocs
+            feedback.pushInfo(f"Lecture du GTFS {gtfs_path}...")
+            try:
+                trip_df = read_table(gtfs_path, "stop_times.txt", ["trip_id", "stop_id", "stop_sequence"], feedback)
+                stop_df = read_table(gtfs_path, "stops.txt", ["stop_id", "stop_lat", "stop_lon"], feedback)
+            except (OSError, KeyError, ValueError) as e:
+                raise QgsProcessingException(f"Lecture du GTFS impossible : {e}")
+            if feedback.isCanceled():
+                return {}
+        else:
+            if not trip_source or not stop_source:
+                raise QgsProcessingException("Les couches d'entrée (ou un GTFS) sont requises.")
+
+            # Convertir les couches en DataFrame
+            feedback.pushInfo("Conversion des couches en DataFrame...")
+            trip_df = self.source_to_dataframe(trip_source, ["trip_id", "stop_id", "stop_sequence"])
+            stop_df = self.source_to_dataframe(stop_source, ["stop_id", "stop_lat", "stop_lon"])
 
         feedback.pushInfo(f"stop_times contient {len(trip_df)} lignes.")
         feedback.pushInfo(f"stops contient {len(stop_df)} lignes.")
@@ -97,54 +246,71 @@ class GtfsRouteIgn(QgsProcessingAlgorithm):
         feedback.pushInfo(f"Fusion terminée avec {len(merged_df)} lignes.")
 
         # Trier par trip_id et stop_sequence
-        merged_df = merged_df.sort_values(by=["trip_id", "stop_sequence"])
-
-        # Préparation des segments pour chaque trip_id
-        trip_segments = defaultdict(list)
-        result = []
-
-        # Génération des segments d'itinéraires
-        for i in range(len(merged_df)):
-            trip_id = merged_df.iloc[i]["trip_id"]
-            stop_sequence = merged_df.iloc[i]["stop_sequence"]
-            xy_depart = (merged_df.iloc[i]["stop_lat"], merged_df.iloc[i]["stop_lon"])
-
-            if (
-                i + 1 < len(merged_df)
-                and merged_df.iloc[i + 1]["trip_id"] == trip_id
-            ):
-                xy_arrivee = (
-                    merged_df.iloc[i + 1]["stop_lat"],
-                    merged_df.iloc[i + 1]["stop_lon"],
-                )
-            else:
-                xy_arrivee = None
+        merged_df = sort_stop_times(merged_df)
+
+        # Génération des segments d'itinéraires (arrêt, arrêt suivant du même trip)
+        segments_df = build_segments(merged_df)
 
-            result.append([trip_id, stop_sequence, xy_depart, xy_arrivee])
+        # Les mêmes couples d'arrêts consécutifs reviennent dans de nombreux trips :
+        # une seule requête par couple (stop_id départ, stop_id arrivée)
+        pairs = unique_pairs(segments_df)
+        feedback.pushInfo(f"{len(segments_df)} segments, dont {len(pairs)} couples d'arrêts distincts.")
+        del segments_df
 
-        # Requêtes à l'API IGN pour les itinéraires
-        for trip_id, stop_sequence, xy_depart, xy_arrivee in result:
-            if xy_arrivee:
+        # Entités à écrire : (identifiant, attributs, couples d'arrêts dans l'ordre du trajet)
+        trip_stops = stop_sequences(merged_df)
+        del merged_df
+        fields = QgsFields()
+        items = []
+        # Trips représentés par chaque shape_id, pour relier shapes.txt au flux (trips.txt)
+        trips_by_shape = {}
+        if by_pattern:
+            # Regroupement des trips par séquence ordonnée d'arrêts : les trips d'un même
+            # pattern parcourent les mêmes couples d'arrêts, donc la même géométrie
+            route_by_trip = {}
+            if trips_source is not None:
+                trips_df = self.source_to_dataframe(trips_source, ["trip_id", "route_id"])
+                if "trip_id" in trips_df.columns and "route_id" in trips_df.columns:
+                    route_by_trip = dict(zip(trips_df["trip_id"].astype(str), trips_df["route_id"].astype(str)))
+                else:
+                    feedback.reportError("La couche trips doit contenir les champs trip_id et route_id.")
+            elif gtfs_path and has_table(gtfs_path, "trips.txt"):
                 try:
-                    api_url = (
-                        f"https://data.geopf.fr/navigation/itineraire?"
-                        f"resource=bdtopo-osrm&profile=car&optimization=fastest"
-                        f"&start={xy_depart[1]},{xy_depart[0]}"
-                        f"&end={xy_arrivee[1]},{xy_arrivee[0]}"
-                        f"&geometryFormat=geojson"
-                    )
-                    response = requests.get(api_url)
-                    if response.status_code == 200:
-                        route_data = response.json()
-                        coordinates = route_data["geometry"]["coordinates"]
-                        trip_segments[trip_id].append(coordinates)
-                except Exception as e:
-                    feedback.reportError(f"Erreur pour trip_id={trip_id}: {e}")
-
-        # Création de la couche de sortie
+                    trips_df = read_table(gtfs_path, "trips.txt", ["trip_id", "route_id"])
+                    route_by_trip = dict(zip(trips_df["trip_id"], trips_df["route_id"]))
+                except (OSError, KeyError, ValueError) as e:
+                    feedback.reportError(f"Lecture de trips.txt impossible : {e}")
+            patterns = {}
+            for trip_id, stops in trip_stops.items():
+                patterns.setdefault(stops, []).append(trip_id)
+            feedback.pushInfo(f"{len(trip_stops)} trips regroupés en {len(patterns)} séquences d'arrêts.")
+
+            fields.append(QgsField("pattern_id", QVariant.String))
+            fields.append(QgsField("trip_count", QVariant.Int))
+            fields.append(QgsField("route_ids", QVariant.String))
+            fields.append(QgsField("stop_count", QVariant.Int))
+            for n, (stops, trip_ids) in enumerate(patterns.items(), start=1):
+                pattern_id = f"P{n}"
+                routes = sorted({route_by_trip[str(t)] for t in trip_ids if str(t) in route_by_trip})
+                items.append((pattern_id, [pattern_id, len(trip_ids), ",".join(routes), len(stops)],
+                              list(zip(stops, stops[1:]))))
+                trips_by_shape[pattern_id] = [str(t) for t in trip_ids]
+        else:
+            fields.append(QgsField("trip_id", QVariant.String))
+            for trip_id, stops in trip_stops.items():
+                if len(stops) < 2:
+                    continue
+                trip_id = str(trip_id)
+                # Vérification que trip_id n'est pas vide
+                if not trip_id or trip_id.strip() == "":
+                    feedback.reportError(f"⚠️ trip_id vide détecté, remplacement par 'UNKNOWN'")
+                    trip_id = "UNKNOWN"
+                items.append((trip_id, [trip_id], list(zip(stops, stops[1:]))))
+                trips_by_shape[trip_id] = [trip_id]
+        del trip_stops
+
+        # Création de la couche de sortie, alimentée au fil du calcul
         feedback.pushInfo("Création de la couche de sortie...")
-        fields = QgsFields()
-        fields.append(QgsField("trip_id", QVariant.String))
 
         (sink, sink_id) = self.parameterAsSink(
             parameters,
@@ -160,52 +326,269 @@ class GtfsRouteIgn(QgsProcessingAlgorithm):
                 self.invalidSinkError(parameters, self.OUTPUT_LAYER)
             )
 
-        # Ajout des segments dans la couche de sortie
-        # Ajout des segments à la couche de sortie
-        for trip_id, segments in trip_segments.items():
-            trip_id = str(trip_id)
-            # Vérification que trip_id n'est pas vide
-            if not trip_id or trip_id.strip() == "":
-                feedback.reportError(f"⚠️ trip_id vide détecté, remplacement par 'UNKNOWN'")
-                trip_id = "UNKNOWN"
-
-            # Vérification que segments contient bien des données
-            if not segments or len(segments) == 0:
+        # Suivi des entités : nombre de couples encore attendus par entité et entités en
+        # attente de chaque couple. Une entité est écrite dès que tous ses couples sont
+        # obtenus ; la géométrie d'un couple est libérée quand plus aucune entité ne l'attend.
+        remaining = []
+        waiting = defaultdict(list)
+        users = defaultdict(int)
+        for index, (trip_id, attributes, item_pairs) in enumerate(items):
+            distinct = set(item_pairs)
+            remaining.append(len(distinct))
+            for pair in distinct:
+                waiting[pair].append(index)
+                users[pair] += 1
+            if not distinct:
                 feedback.reportError(f"⚠️ Aucun segment trouvé pour trip_id={trip_id}, ignoré.")
-                continue  # Ignore cette entrée si aucun segment n'est disponible
-
-            # Vérification supplémentaire : au moins un segment doit contenir au moins 2 points
-            valid_segments = [
-                [QgsPointXY(pt[0], pt[1]) for pt in segment] for segment in segments if len(segment) > 1
-            ]
-
-            if not valid_segments:
-                feedback.reportError(f"⚠️ trip_id={trip_id} a des segments vides ou invalides, ignoré.")
-                continue  # Ignore cette entrée si aucun segment n'est valide
 
+        if use_graph:
+            # Graphe local : construit une fois puis relu depuis le cache disque
+            crs_projected = QgsCoordinateReferenceSystem("EPSG:2154")
+            transform_network = QgsCoordinateTransform(network.sourceCrs(), crs_projected, context.transformContext())
+            graph = RoadGraph.cached(network, transform_network, "car", speed_field, direction_field, feedback)
+            if feedback.isCanceled():
+                return {}
+            if graph.arc_count == 0:
+                raise QgsProcessingException("La couche de tronçons routiers ne fournit aucun tronçon exploitable.")
+            feedback.pushInfo(f"Graphe local : {graph.node_count} nœuds, {graph.arc_count} arcs.")
+            stream = self.routeOnGraph(graph, pairs, context, feedback)
+        else:
+            stream = self.fetchSegments(pairs, api, feedback)
+
+        results = {self.OUTPUT_LAYER: sink_id}
+        complete = False
+        with contextlib.ExitStack() as stack:
+            shapes_writer = trip_shapes_writer = None
+            if shapes_file:
+                # Table trip_id → shape_id à reporter dans la colonne shape_id de trips.txt
+                root, ext = os.path.splitext(shapes_file)
+                trip_shapes_file = f"{root}_trips{ext or '.txt'}"
+
+                def discard_partial_files():
+                    """Supprime shapes.txt et sa table s'ils n'ont pas été écrits jusqu'au bout."""
+                    if complete:
+                        return
+                    for path in (shapes_file, trip_shapes_file):
+                        if os.path.exists(path):
+                            os.remove(path)
+                    feedback.reportError("Traitement interrompu : shapes.txt incomplet supprimé.")
+
+                # Enregistré avant l'ouverture : appelé après la fermeture des fichiers
+                stack.callback(discard_partial_files)
+                shapes_writer = csv.writer(stack.enter_context(open(shapes_file, "w", newline="", encoding="utf-8")))
+                shapes_writer.writerow(["shape_id", "shape_pt_lat", "shape_pt_lon", "shape_pt_sequence", "shape_dist_traveled"])
+                trip_shapes_writer = csv.writer(
+                    stack.enter_context(open(trip_shapes_file, "w", newline="", encoding="utf-8"))
+                )
+                trip_shapes_writer.writerow(["trip_id", "shape_id"])
+
+            # Écriture au fil de l'eau : chaque géométrie de segment est réutilisée par
+            # toutes les entités qui le parcourent
+            segment_geometries = {}
+            total = len(pairs) or 1
+            written = 0
+            for done, (pair, coordinates) in enumerate(stream, start=1):
+                feedback.setProgress(int(done * 100 / total))
+                segment_geometries[pair] = coordinates
+                for index in waiting.pop(pair, []):
+                    remaining[index] -= 1
+                    if remaining[index]:
+                        continue
+                    trip_id, attributes, item_pairs = items[index]
+                    items[index] = None
+                    segments = [segment_geometries[p] for p in item_pairs if segment_geometries[p] is not None]
+                    if self.writeItem(sink, fields, shapes_writer, trip_id, attributes, segments, feedback):
+                        written += 1
+                        if trip_shapes_writer is not None:
+                            trip_shapes_writer.writerows((trip, trip_id) for trip in trips_by_shape[trip_id])
+                    for p in set(item_pairs):
+                        users[p] -= 1
+                        if not users[p]:
+                            del segment_geometries[p]
+            feedback.pushInfo(f"{written} entité(s) écrite(s) dans la couche de sortie.")
+            complete = not feedback.isCanceled()
+
+        if shapes_file and complete:
+            feedback.pushInfo(f"Correspondance trip_id → shape_id : {trip_shapes_file}")
+            results[self.SHAPES_FILE] = shapes_file
+            results[self.TRIP_SHAPES_FILE] = trip_shapes_file
+        return results
+
+    def writeItem(self, sink, fields, shapes_writer, trip_id, attributes, segments, feedback):
+        """Ajoute une entité (trip ou pattern) à la couche de sortie et, le cas échéant,
+        sa forme à shapes.txt. Renvoie True si l'entité a été écrite."""
+        # Vérification que segments contient bien des données
+        if not segments or len(segments) == 0:
+            feedback.reportError(f"⚠️ Aucun segment trouvé pour trip_id={trip_id}, ignoré.")
+            return False  # Ignore cette entrée si aucun segment n'est disponible
+
+        # Vérification supplémentaire : au moins un segment doit contenir au moins 2 points
+        valid_segments = [
+            [QgsPointXY(pt[0], pt[1]) for pt in segment] for segment in segments if len(segment) > 1
+        ]
+
+        if not valid_segments:
+            feedback.reportError(f"⚠️ trip_id={trip_id} a des segments vides ou invalides, ignoré.")
+            return False  # Ignore cette entrée si aucun segment n'est valide
+
+        if shapes_writer is not None:
+            self.writeShape(shapes_writer, trip_id, segments)
+
+        try:
+            # Création de l'entité
+            feature = QgsFeature(fields)
+
+            # Création de la géométrie MultiLineString
+            multiline = QgsGeometry.fromMultiPolylineXY(valid_segments)
+
+            # Vérification que la géométrie est bien créée
+            if not multiline or multiline.isEmpty():
+                feedback.reportError(f"⚠️ Géométrie invalide pour trip_id={trip_id}, ignorée.")
+                return False  # Ignore cette entité si la géométrie est invalide
+
+            # Affectation des attributs
+            feature.setGeometry(multiline)
+            feature.setAttributes(attributes)
+
+            # Ajout de l'entité à la couche de sortie
+            sink.addFeature(feature, QgsFeatureSink.FastInsert)
+            return True
+
+        except Exception as e:
+            feedback.reportError(f"❌ Erreur lors du traitement de trip_id={trip_id}: {e}")
+            return False
+
+    def fetchSegments(self, pairs, api, feedback):
+        """Géométries des couples d'arrêts distincts par l'API IGN : requêtes simultanées
+        à débit limité, cache persistant. Générateur de (couple, coordonnées ou None en
+        cas d'échec), dans l'ordre de 'pairs' ; s'arrête à l'annulation."""
+        cancel = threading.Event()
+        client = open_client(api, cancel)
+        cache = open_cache(api, "segments_gtfs.sqlite", "des segments", feedback)
+
+        def fetch_segment(item):
+            """Exécuté dans un worker : géométrie d'un couple d'arrêts (cache, sinon API)."""
+            pair, (xy_depart, xy_arrivee) = item
+            key = self.cacheKey(xy_depart, xy_arrivee)
+            if cache is not None:
+                cached = cache.get(key)
+                if cached is not None:
+                    return pair, cached, None
+            api_url = (
+                f"https://data.geopf.fr/navigation/itineraire?"
+                f"resource={self.RESOURCE}&profile=car&optimization=fastest"
+                f"&start={xy_depart[1]},{xy_depart[0]}"
+                f"&end={xy_arrivee[1]},{xy_arrivee[0]}"
+                f"&geometryFormat=geojson"
+            )
             try:
-                # Création de l'entité
-                feature = QgsFeature(fields)
-                
-                # Création de la géométrie MultiLineString
-                multiline = QgsGeometry.fromMultiPolylineXY(valid_segments)
-
-                # Vérification que la géométrie est bien créée
-                if not multiline or multiline.isEmpty():
-                    feedback.reportError(f"⚠️ Géométrie invalide pour trip_id={trip_id}, ignorée.")
-                    continue  # Ignore cette entité si la géométrie est invalide
-
-                # Affectation des attributs
-                feature.setGeometry(multiline)
-                feature.setAttribute("trip_id", trip_id)
-
-                # Ajout de l'entité à la couche de sortie
-                sink.addFeature(feature, QgsFeatureSink.FastInsert)
-
-            except Exception as e:
-                feedback.reportError(f"❌ Erreur lors du traitement de trip_id={trip_id}: {e}")
+                content = client.get(api_url)
+                if content is None:
+                    return pair, None, None
+                coordinates = json.loads(content)["geometry"]["coordinates"]
+            except (HttpError, ValueError, KeyError, TypeError) as e:
+                return pair, None, e
+            if cache is not None:
+                cache.put(key, coordinates)
+            return pair, coordinates, None
+
+        # Requêtes à l'API IGN pour les couples distincts, en parallèle
+        try:
+            for pair, coordinates, error in ordered_map(
+                    fetch_segment, pairs.items(), api.max_workers, feedback, cancel):
+                if error is not None:
+                    feedback.reportError(f"Erreur pour le segment {pair[0]} → {pair[1]} : {error}")
+                yield pair, coordinates
+        finally:
+            feedback.pushInfo(f"API : {client.stats.summary()}.")
+            if cache is not None:
+                feedback.pushInfo(f"Cache : {cache.hits} segment(s) réutilisé(s), {cache.misses} requête(s) à l'API.")
+                cache.close()
+
+    def routeOnGraph(self, graph, pairs, context, feedback):
+        """Géométries des couples d'arrêts distincts sur le graphe local.
+
+        Chaque arrêt est projeté sur le tronçon le plus proche, parcouru en partie
+        depuis ou jusqu'au projeté ; un seul Dijkstra par arrêt de départ sert tous
+        ses arrêts suivants. Les chemins (Lambert 93) sont reconvertis en WGS84.
+        Générateur de (couple, coordonnées ou None)."""
+        crs_wgs84 = QgsCoordinateReferenceSystem("EPSG:4326")
+        crs_projected = QgsCoordinateReferenceSystem("EPSG:2154")
+        to_projected = QgsCoordinateTransform(crs_wgs84, crs_projected, context.transformContext())
+        to_wgs84 = QgsCoordinateTransform(crs_projected, crs_wgs84, context.transformContext())
+
+        positions = {}
+
+        def position_of(stop_id, lat_lon):
+            if stop_id not in positions:
+                point = to_projected.transform(QgsPointXY(float(lat_lon[1]), float(lat_lon[0])))
+                positions[stop_id] = graph.nearest_position(point.x(), point.y())
+            return positions[stop_id]
+
+        by_origin = defaultdict(list)
+        for (stop_from, stop_to), (xy_depart, xy_arrivee) in pairs.items():
+            position_of(stop_from, xy_depart)
+            position_of(stop_to, xy_arrivee)
+            by_origin[stop_from].append((stop_from, stop_to))
+        feedback.pushInfo(f"{len(positions)} arrêts projetés sur le réseau, {len(by_origin)} arbres à calculer.")
+        far = sorted((position.distance, stop_id) for stop_id, position in positions.items()
+                     if position.distance > self.SNAP_WARNING_DISTANCE)
+        if far:
+            feedback.reportError(
+                f"⚠️ {len(far)} arrêt(s) à plus de {self.SNAP_WARNING_DISTANCE:.0f} m du réseau "
+                f"(max. {far[-1][0]:.0f} m, arrêt {far[-1][1]}) : tracés à vérifier."
+            )
 
-        return {self.OUTPUT_LAYER: sink_id}
+        cancel = FeedbackCancel(feedback)
+        for stop_from, origin_pairs in by_origin.items():
+            if feedback.isCanceled():
+                break
+            paths = graph.routes_between(positions[stop_from], [positions[pair[1]] for pair in origin_pairs],
+                                         "duration", cancel)
+            if cancel.is_set():
+                # Arbre interrompu : chemins incomplets
+                break
+            for pair, path in zip(origin_pairs, paths):
+                if path is None:
+                    feedback.reportError(f"Aucun chemin dans le graphe local pour le segment {pair[0]} → {pair[1]}")
+                    yield pair, None
+                    continue
+                coordinates = path["coordinates"]
+                line = QgsLineString([c[0] for c in coordinates], [c[1] for c in coordinates])
+                line.transform(to_wgs84)
+                yield pair, [[x, y] for x, y in zip(line.xVector(), line.yVector())]
+
+    def writeShape(self, writer, shape_id, segments):
+        """Écrit les points d'une géométrie dans shapes.txt, avec shape_dist_traveled
+        en mètres (distance cumulée, formule de haversine). Le premier point de chaque
+        segment, identique au dernier du segment précédent, n'est pas répété."""
+        sequence = 0
+        distance = 0.0
+        previous = None
+        for segment in segments:
+            for lon, lat in (pt[:2] for pt in segment):
+                if previous is not None:
+                    if (lon, lat) == previous:
+                        continue
+                    distance += self.haversine(previous, (lon, lat))
+                sequence += 1
+                writer.writerow([shape_id, f"{lat:.6f}", f"{lon:.6f}", sequence, f"{distance:.1f}"])
+                previous = (lon, lat)
+
+    @staticmethod
+    def haversine(point1, point2):
+        """Distance en mètres entre deux points (lon, lat) en degrés."""
+        lon1, lat1, lon2, lat2 = map(math.radians, (point1[0], point1[1], point2[0], point2[1]))
+        a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+        return 2 * 6371008.8 * math.asin(math.sqrt(a))
+
+    def cacheKey(self, xy_depart, xy_arrivee):
+        """Clé de cache d'un segment : coordonnées (lat, lon) arrondies des deux arrêts et ressource."""
+        p = self.CACHE_PRECISION
+        return (
+            f"{round(float(xy_depart[0]), p)},{round(float(xy_depart[1]), p)};"
+            f"{round(float(xy_arrivee[0]), p)},{round(float(xy_arrivee[1]), p)};car;fastest;{self.RESOURCE}"
+        )
 
     def name(self):
         return "gtfs_route_ign"
@@ -232,14 +615,18 @@ class GtfsRouteIgn(QgsProcessingAlgorithm):
         return """
             <h3>Outil Inddigo : GTFS to Route IGN</h3>
             <p>Ce plugin permet de générer des itinéraires détaillés à partir de fichiers GTFS, en utilisant une API externe pour obtenir les tracés géographiques précis.</p>
-            <p>Il est nécessaire d'ajouter les couches avec ""Ajouter une couche de texte délimité, afin de filtrer les trip_id si nécessaire</p>
+            <p>Le GTFS peut être lu directement (archive .zip ou dossier, en désignant l'un de ses fichiers .txt) : seules les colonnes utiles sont chargées, sans créer de couche QGIS. Sinon, il est nécessaire d'ajouter les couches avec ""Ajouter une couche de texte délimité, afin de filtrer les trip_id si nécessaire</p>
 
             <h4>Fonctionnalités principales :</h4>
             <ul>
                 <li>Fusion des données de fichiers GTFS (<b>stops_time</b> et <b>stops</b>).</li>
                 <li>Génération automatique des segments d'itinéraires entre les arrêts, basés sur les coordonnées des arrêts.</li>
-                <li>Requête à une API de routage (IGN) pour obtenir des itinéraires optimisés et précis entre les points.</li>
+                <li>Requête à une API de routage (IGN) pour obtenir des itinéraires optimisés et précis entre les points. Une seule requête par couple d'arrêts distinct, réutilisée par tous les trajets ; requêtes simultanées avec débit maximal et cache persistant des segments (paramètres avancés).</li>
                 <li>Création d'une couche de sortie au format <b>MultiLineString</b>, avec les segments regroupés par identifiant de trajet (<b>trip_id</b>).</li>
+                <li>Mode « séquence d'arrêts » : une entité par pattern (suite ordonnée d'arrêts) avec le nombre de trips et, si la couche trips est fournie, la liste des route_id. La sortie est réduite d'autant.</li>
+                <li>Moteur de calcul au choix : API IGN, ou graphe local construit à partir d'une couche de tronçons routiers (ex. BD TOPO <i>troncon_de_route</i>) : les arrêts sont projetés sur le tronçon le plus proche (avertissement au-delà de 100 m) et les tracés calculés hors ligne, sans limite de débit.</li>
+                <li>Écriture au fil du calcul : chaque trajet (ou pattern) est ajouté à la couche dès que tous ses segments sont obtenus ; progression par segment et annulation possible entre deux requêtes.</li>
+                <li>Export optionnel d'un fichier GTFS <b>shapes.txt</b> (shape_id = trip_id ou pattern_id, shape_dist_traveled en mètres), accompagné d'une table <b>trip_id, shape_id</b> (fichier <i>&lt;shapes&gt;_trips.txt</i>) qui relie chaque trip à sa forme, à reporter dans trips.txt. En cas d'annulation ou d'erreur, ces deux fichiers incomplets sont supprimés.</li>
             </ul>
             
             <h4>Paramètres :</h4>
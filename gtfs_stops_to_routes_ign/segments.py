@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+Construction vectorisée des segments entre arrêts consécutifs d'un GTFS
+(pandas uniquement, sans dépendance à QGIS).
+"""
+
+import pandas as pd
+
+
+SEGMENT_COLUMNS = ["trip_id", "stop_sequence", "stop_from", "stop_to",
+                   "lat_from", "lon_from", "lat_to", "lon_to"]
+
+
+def sort_stop_times(merged_df):
+    """Trie stop_times (fusionné avec stops) par trip_id puis stop_sequence numérique.
+
+    stop_sequence est converti en nombre : lu depuis un fichier texte, il
+    serait sinon trié comme une chaîne (« 10 » avant « 2 »)."""
+    merged_df = merged_df.assign(stop_sequence=pd.to_numeric(merged_df["stop_sequence"], errors="coerce"))
+    return merged_df.sort_values(by=["trip_id", "stop_sequence"], kind="stable")
+
+
+def build_segments(sorted_df):
+    """Renvoie un DataFrame d'une ligne par segment (arrêt, arrêt suivant du même trip).
+
+    'sorted_df' est trié par sort_stop_times. L'arrêt suivant est obtenu par
+    un décalage groupé (groupby/shift) : aucune boucle Python par ligne."""
+    following = sorted_df.groupby("trip_id", sort=False)[["stop_id", "stop_lat", "stop_lon"]].shift(-1)
+    has_next = following["stop_id"].notna().to_numpy()
+    segments = pd.DataFrame({
+        "trip_id": sorted_df["trip_id"].to_numpy()[has_next],
+        "stop_sequence": sorted_df["stop_sequence"].to_numpy()[has_next],
+        "stop_from": sorted_df["stop_id"].to_numpy()[has_next],
+        "stop_to": following["stop_id"].to_numpy()[has_next],
+        "lat_from": sorted_df["stop_lat"].to_numpy()[has_next],
+        "lon_from": sorted_df["stop_lon"].to_numpy()[has_next],
+        "lat_to": following["stop_lat"].to_numpy()[has_next],
+        "lon_to": following["stop_lon"].to_numpy()[has_next],
+    }, columns=SEGMENT_COLUMNS)
+    return segments
+
+
+def unique_pairs(segments):
+    """Couples d'arrêts distincts : {(stop_from, stop_to): ((lat, lon) départ, (lat, lon) arrivée)}."""
+    distinct = segments.drop_duplicates(subset=["stop_from", "stop_to"])
+    return {
+        (stop_from, stop_to): ((lat_from, lon_from), (lat_to, lon_to))
+        for stop_from, stop_to, lat_from, lon_from, lat_to, lon_to in zip(
+            distinct["stop_from"], distinct["stop_to"], distinct["lat_from"],
+            distinct["lon_from"], distinct["lat_to"], distinct["lon_to"])
+    }
+
+
+def stop_sequences(sorted_df):
+    """Séquence ordonnée des stop_id de chaque trip : {trip_id: tuple(stop_id)}."""
+    return sorted_df.groupby("trip_id", sort=False)["stop_id"].agg(tuple).to_dict()
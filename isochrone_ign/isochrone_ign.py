@@ -1,4 +1,5 @@
-import requests
+import json
+import threading
 from qgis.PyQt.QtCore import QCoreApplication,QVariant
 from qgis.core import (
     QgsProcessingAlgorithm,
@@ -15,8 +16,16 @@ from qgis.core import (
     QgsProcessingException,
     QgsFeatureSink,
     QgsProcessing,
-    QgsProcessingParameterString,QgsField
+    QgsProcessingParameterString,QgsField,
+    QgsFields,
+    QgsProcessingParameterField,
+    QgsProcessingParameterBoolean,
+    QgsProcessingParameterDefinition
 )
+from ..routing_common.http_client import HttpError
+from ..routing_common.concurrency import ordered_map
+from ..routing_common.api_options import api_parameters, read_api_parameters, open_client, open_cache
+from .scoring import PointScorer
 
 class IsochroneIgnAlgorithm(QgsProcessingAlgorithm):
     INPUT = "INPUT"
@@ -24,8 +33,16 @@ class IsochroneIgnAlgorithm(QgsProcessingAlgorithm):
     TYPE = "TYPE"
     VALEUR = "VALEUR"
     BUFFER = "BUFFER"
+    BUFFER_SEGMENTS = "BUFFER_SEGMENTS"
+    SIMPLIFY_TOLERANCE = "SIMPLIFY_TOLERANCE"
+    RINGS = "RINGS"
+    DISSOLVE = "DISSOLVE"
+    SCORE_LAYER = "SCORE_LAYER"
+    SCORE_FIELD = "SCORE_FIELD"
     OUTPUT = "OUTPUT"
 
+    RESOURCE = "bdtopo-valhalla"
+
     def initAlgorithm(self, config):
         """
         Définit les paramètres de l'algorithme.
@@ -82,6 +99,67 @@ class IsochroneIgnAlgorithm(QgsProcessingAlgorithm):
             )
         )
 
+        # Géométrie : finesse des arrondis du buffer et simplification (en Lambert 93)
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.SIMPLIFY_TOLERANCE,
+                self.tr("Tolérance de simplification des isochrones (en mètres, 0 = aucune)"),
+                type=QgsProcessingParameterNumber.Double,
+                defaultValue=0,
+                minValue=0
+            )
+        )
+        advanced_param_segments = QgsProcessingParameterNumber(
+            self.BUFFER_SEGMENTS,
+            self.tr("Nombre de segments par quart de cercle pour le buffer"),
+            type=QgsProcessingParameterNumber.Integer,
+            defaultValue=8,
+            minValue=1,
+            maxValue=360
+        )
+        advanced_param_segments.setFlags(advanced_param_segments.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+        self.addParameter(advanced_param_segments)
+
+        # Modes de sortie : anneaux sans recouvrement et/ou fusion de tous les points par tranche
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                self.RINGS,
+                self.tr("Anneaux sans recouvrement (tranche n moins tranche n-1)"),
+                defaultValue=False
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                self.DISSOLVE,
+                self.tr("Fusionner les isochrones de tous les points par tranche (zones de chalandise)"),
+                defaultValue=False
+            )
+        )
+
+        # Notation : somme pondérée d'une couche de points ou de carreaux dans chaque isochrone
+        self.addParameter(
+            QgsProcessingParameterFeatureSource(
+                self.SCORE_LAYER,
+                self.tr("Couche à comptabiliser dans les isochrones (population, équipements...)"),
+                [QgsProcessing.TypeVectorPoint, QgsProcessing.TypeVectorPolygon],
+                optional=True
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterField(
+                self.SCORE_FIELD,
+                self.tr("Champ de pondération (vide = nombre d'entités)"),
+                parentLayerParameterName=self.SCORE_LAYER,
+                type=QgsProcessingParameterField.Numeric,
+                optional=True
+            )
+        )
+
+        # Exécution concurrente ; cache persistant des isochrones : relancer une étude avec
+        # une tranche supplémentaire ne demande à l'API que la nouvelle tranche
+        for param in api_parameters(self, self.tr("Utiliser le cache des isochrones")):
+            self.addParameter(param)
+
     def processAlgorithm(self, parameters, context, feedback):
         """
         Logique principale du traitement.
@@ -91,6 +169,13 @@ class IsochroneIgnAlgorithm(QgsProcessingAlgorithm):
         cost_type = self.parameterAsEnum(parameters, self.TYPE, context)
         duration_ranges = self.parameterAsString(parameters, self.VALEUR, context)
         buffer_size = self.parameterAsDouble(parameters, self.BUFFER, context)
+        buffer_segments = self.parameterAsInt(parameters, self.BUFFER_SEGMENTS, context)
+        simplify_tolerance = self.parameterAsDouble(parameters, self.SIMPLIFY_TOLERANCE, context)
+        rings = self.parameterAsBoolean(parameters, self.RINGS, context)
+        dissolve = self.parameterAsBoolean(parameters, self.DISSOLVE, context)
+        score_source = self.parameterAsSource(parameters, self.SCORE_LAYER, context)
+        score_field = self.parameterAsString(parameters, self.SCORE_FIELD, context)
+        api = read_api_parameters(self, parameters, context)
 
         if source is None:
             raise QgsProcessingException(self.invalidSourceError(parameters, self.INPUT))
@@ -119,11 +204,23 @@ class IsochroneIgnAlgorithm(QgsProcessingAlgorithm):
             transform_to_wgs84 = None
             feedback.pushInfo("La couche est déjà en WGS84.")
 
+        # Transformations vers le CRS métrique (Lambert 93), créées une seule fois pour tout le traitement
+        crs_projected = QgsCoordinateReferenceSystem("EPSG:2154")
+        transform_to_projected = QgsCoordinateTransform(crs_wgs84, crs_projected, context.transformContext())
+        transform_to_wgs84_back = QgsCoordinateTransform(crs_projected, crs_wgs84, context.transformContext())
+
        
-        fields = source.fields()
+        # Une entité fusionnée regroupe plusieurs points : les attributs source ne sont pas repris
+        fields = QgsFields() if dissolve else source.fields()
         fields.append(QgsField("mode", QVariant.String))
         fields.append(QgsField("cost_type", QVariant.String))
         fields.append(QgsField("cost_value", QVariant.Int))
+        if rings or dissolve:
+            fields.append(QgsField("cost_min", QVariant.Int))
+            fields.append(QgsField("cost_max", QVariant.Int))
+        if score_source is not None:
+            fields.append(QgsField("score", QVariant.Double))
+            fields.append(QgsField("score_count", QVariant.Int))
 
         # Définir la couche de sortie avec les champs dynamiques
         (sink, dest_id) = self.parameterAsSink(
@@ -131,15 +228,27 @@ class IsochroneIgnAlgorithm(QgsProcessingAlgorithm):
             self.OUTPUT,
             context,
             fields,  # Liste des champs sans géométrie
-            QgsWkbTypes.Polygon,  # Géométrie de type Polygone
+            QgsWkbTypes.MultiPolygon if rings or dissolve else QgsWkbTypes.Polygon,  # Géométrie de type Polygone
             crs_wgs84  # CRS pour la couche de sortie
         )        # Vérifier si la couche source est correctement définie
         if sink is None:
             raise QgsProcessingException("Erreur lors de la création de la couche de sortie.")
 
-        # Traiter chaque entité
-        for feature in source.getFeatures():
-            for cost_value in cost_value_list : 
+        # Index spatial de la couche à comptabiliser, construit une fois dans le CRS de sortie
+        scorer = None
+        if score_source is not None:
+            feedback.pushInfo("Indexation de la couche à comptabiliser...")
+            transform_score = QgsCoordinateTransform(score_source.sourceCrs(), crs_wgs84, context.transformContext())
+            scorer = PointScorer(score_source, score_field, transform_score, feedback)
+            feedback.pushInfo(f"{len(scorer)} entité(s) indexée(s).")
+
+        modes = ["car", "pedestrian"]
+        types = ["time", "distance"]
+
+        def iter_requests():
+            """Génère une tâche (entité, valeur de coût, url, clé de cache) par point et par
+            tranche. Les transformations restent dans le thread principal."""
+            for feature in source.getFeatures():
                 geom = feature.geometry()
 
                 # Vérification : la géométrie doit être non vide et un Point
@@ -154,60 +263,166 @@ class IsochroneIgnAlgorithm(QgsProcessingAlgorithm):
                 # Récupérer les coordonnées pour la requête API
                 point = geom.asPoint()
                 lon, lat = point.x(), point.y()
-
-                # Construire l'URL pour la requête
-                modes = ["car", "pedestrian"]
-                types = ["time", "distance"]
-
-                url = (
-                    f"https://data.geopf.fr/navigation/isochrone?"
-                    f"resource=bdtopo-valhalla&profile={modes[mode]}&costType={types[cost_type]}&"
-                    f"point={lon},{lat}&costValue={cost_value}"
-                )
-                feedback.pushInfo(f"Requête URL : {url}")
-
-                # Envoyer la requête
-                try:
-                    response = requests.get(url)
-                    response.raise_for_status()
-                    data = response.json()
-                except requests.RequestException as e:
-                    feedback.reportError(f"Erreur lors de la requête pour l'entité {feature.id()} : {e}")
-                    continue
-
-                # Extraire le polygone de la réponse
+                for cost_value in cost_value_list:
+                    url = (
+                        f"https://data.geopf.fr/navigation/isochrone?"
+                        f"resource={self.RESOURCE}&profile={modes[mode]}&costType={types[cost_type]}&"
+                        f"point={lon},{lat}&costValue={cost_value}"
+                    )
+                    key = self.cacheKey(lon, lat, modes[mode], types[cost_type], cost_value, api.cache_precision)
+                    yield feature, cost_value, url, key
+
+        cancel = threading.Event()
+        client = open_client(api, cancel)
+        cache = open_cache(api, "isochrones.sqlite", "des isochrones", feedback)
+
+        def fetch_isochrone(task):
+            """Exécuté dans un worker : lecture du cache, sinon requête HTTP et décodage JSON."""
+            feature, cost_value, url, key = task
+            if cache is not None:
+                cached = cache.get(key)
+                if cached is not None:
+                    return task, cached, None
+            try:
+                content = client.get(url)
+                if content is None:
+                    return task, None, None
+                # Seule la géométrie est conservée
+                data = {"geometry": json.loads(content)["geometry"]}
+            except (HttpError, ValueError, KeyError) as e:
+                return task, None, e
+            if cache is not None:
+                cache.put(key, data)
+            return task, data, None
+
+        total = source.featureCount() * len(cost_value_list) or 1
+        feedback.pushInfo(f"{api.max_workers} requête(s) simultanée(s), débit maximal : {api.rate_limit or 'illimité'} requêtes/s.")
+
+        # Anneaux : isochrone précédente du point en cours (les tranches d'un point arrivent à la suite)
+        previous_id, previous_polygon, previous_cost = None, None, 0
+        # Anneaux : point dont une tranche a échoué, tranches suivantes ignorées
+        skipped_id = None
+        # Fusion : isochrones de tous les points, par tranche
+        bands = {cost_value: [] for cost_value in cost_value_list}
+
+        # Les résultats arrivent dans l'ordre des entités et des tranches
+        for current, (task, data, error) in enumerate(
+                ordered_map(fetch_isochrone, iter_requests(), api.max_workers, feedback, cancel)):
+            feedback.setProgress(int(current * 100 / total))
+            feature, cost_value, url, key = task
+            if data is None and error is None:
+                continue
+            if rings and feature.id() == skipped_id:
+                continue
+
+            # Extraire le polygone de la réponse
+            polygon = None
+            if error is not None:
+                feedback.reportError(f"Erreur lors de la requête pour l'entité {feature.id()} : {error}")
+            else:
                 try:
                     coordinates = data["geometry"]["coordinates"][0]
                     polygon = QgsGeometry.fromPolygonXY([[QgsPointXY(*coord) for coord in coordinates]])
-                except KeyError as e:
+                except (KeyError, IndexError, TypeError) as e:
                     feedback.reportError(f"Données de géométrie manquantes dans la réponse pour l'entité {feature.id()} : {e}")
+            if polygon is None:
+                if rings:
+                    # L'anneau suivant couvrirait deux tranches : on s'arrête à la dernière tranche complète
+                    skipped_id = feature.id()
+                    feedback.reportError(f"Anneaux de l'entité {feature.id()} à partir de la tranche {cost_value} ignorés.")
+                continue
+
+            # Buffer et simplification optionnels, en mètres
+            if buffer_size > 0 or simplify_tolerance > 0:
+                polygon = self.bufferIsochrone(polygon, buffer_size, buffer_segments, simplify_tolerance,
+                                               transform_to_projected, transform_to_wgs84_back)
+
+            if dissolve:
+                bands[cost_value].append(polygon)
+                continue
+
+            new_attributes = [feature[field.name()] for field in source.fields()]  # Copier les attributs existants
+            new_attributes.extend([modes[mode], types[cost_type], cost_value])  # Ajouter mode, cost_type et cost_value
+            if rings:
+                if feature.id() != previous_id:
+                    previous_id, previous_polygon, previous_cost = feature.id(), None, 0
+                ring = polygon.difference(previous_polygon) if previous_polygon is not None else polygon
+                new_attributes.extend([previous_cost, cost_value])
+                previous_polygon, previous_cost = polygon, cost_value
+                polygon = ring
+                if polygon.isEmpty():
                     continue
+                polygon.convertToMultiType()
 
-                # Vérifier si un buffer doit être appliqué
-                if buffer_size > 0:
-                    # Transformer en CRS métrique (par exemple EPSG:2154 pour Lambert 93)
-                    crs_projected = QgsCoordinateReferenceSystem("EPSG:2154")
-                    transform_to_projected = QgsCoordinateTransform(crs_wgs84, crs_projected, context.transformContext())
-                    transform_to_wgs84_back = QgsCoordinateTransform(crs_projected, crs_wgs84, context.transformContext())
-
-                    # Appliquer la transformation pour buffer
-                    polygon.transform(transform_to_projected)
-                    polygon = polygon.buffer(buffer_size, segments=360)
+            if scorer is not None:
+                new_attributes.extend(scorer.score(polygon))
 
-                    # Revenir au CRS WGS84
-                    polygon.transform(transform_to_wgs84_back)
+            # Ajouter l'entité dans la couche de sortie
+            new_feature = QgsFeature(fields)
+            new_feature.setAttributes(new_attributes)
+            new_feature.setGeometry(polygon)  # Ajouter la géométrie résultante
+            sink.addFeature(new_feature, QgsFeatureSink.FastInsert)
 
-                # Ajouter l'entité dans la couche de sortie
-                new_feature = QgsFeature(fields)
-                new_attributes = [feature[field.name()] for field in source.fields()]  # Copier les attributs existants
-                new_attributes.extend([modes[mode], types[cost_type], cost_value])  # Ajouter mode, cost_type et cost_value
-                new_feature.setAttributes(new_attributes)
-                new_feature.setGeometry(polygon)  # Ajouter la géométrie résultante
-                sink.addFeature(new_feature, QgsFeatureSink.FastInsert)
+        if dissolve and not feedback.isCanceled():
+            self.writeDissolvedBands(sink, fields, bands, rings, modes[mode], types[cost_type], scorer, feedback)
 
+        feedback.pushInfo(f"API : {client.stats.summary()}.")
+        if cache is not None:
+            feedback.pushInfo(f"Cache : {cache.hits} isochrone(s) réutilisée(s), {cache.misses} requête(s) à l'API.")
+            cache.close()
         feedback.pushInfo("Traitement terminé avec succès.")
         return {self.OUTPUT: dest_id}
 
+    def bufferIsochrone(self, polygon, buffer_size, segments, tolerance, transform_to_projected, transform_to_wgs84):
+        """
+        Applique le buffer puis la simplification dans le CRS métrique et revient en WGS84.
+        Avec 'segments' segments par quart de cercle, chaque arrondi du buffer compte
+        4 × segments sommets au plus (1 440 avec l'ancienne valeur fixe de 360).
+        """
+        polygon.transform(transform_to_projected)
+        if buffer_size > 0:
+            polygon = polygon.buffer(buffer_size, segments)
+        if tolerance > 0:
+            simplified = polygon.simplify(tolerance)
+            if not simplified.isEmpty():
+                polygon = simplified
+        polygon.transform(transform_to_wgs84)
+        return polygon
+
+    def writeDissolvedBands(self, sink, fields, bands, rings, mode, cost_type, scorer, feedback):
+        """
+        Écrit une entité par tranche : union de toutes les isochrones de la tranche
+        (QgsGeometry.unaryUnion, union en cascade GEOS indexée par un arbre STR),
+        ou, avec les anneaux, union de la tranche moins union de la tranche précédente.
+        """
+        previous_union, previous_cost = None, 0
+        for cost_value in sorted(bands):
+            if not bands[cost_value]:
+                continue
+            feedback.pushInfo(f"Fusion de {len(bands[cost_value])} isochrone(s) pour la tranche {cost_value}...")
+            union = QgsGeometry.unaryUnion(bands[cost_value])
+            geometry = union
+            if rings and previous_union is not None:
+                geometry = union.difference(previous_union)
+            cost_min = previous_cost if rings else 0
+            previous_union, previous_cost = union, cost_value
+            if geometry.isEmpty():
+                continue
+            geometry.convertToMultiType()
+            new_feature = QgsFeature(fields)
+            attributes = [mode, cost_type, cost_value, cost_min, cost_value]
+            if scorer is not None:
+                attributes.extend(scorer.score(geometry))
+            new_feature.setAttributes(attributes)
+            new_feature.setGeometry(geometry)
+            sink.addFeature(new_feature, QgsFeatureSink.FastInsert)
+
+    def cacheKey(self, lon, lat, profile, cost_type, cost_value, precision):
+        """
+        Clé de cache d'une isochrone : point WGS84 arrondi, profil, type et valeur de coût, ressource.
+        """
+        return f"{round(lon, precision)},{round(lat, precision)};{profile};{cost_type};{cost_value};{self.RESOURCE}"
+
     def name(self):
         return 'isochrone'
 
@@ -238,8 +453,13 @@ class IsochroneIgnAlgorithm(QgsProcessingAlgorithm):
             <ul>
                 <li>Mode de transport : voiture ou piéton.</li>
                 <li>Type de coût : temps (minutes) ou distance (mètres).</li>
-                <li>Possibilité d'ajouter un buffer (tampon) autour des isochrones générés.</li>
-                <li>Les isochrones sont calculés via l'API IGN et exportés sous forme de polygones géographiques.</li>
+                <li>Possibilité d'ajouter un buffer (tampon) autour des isochrones générés, avec un nombre de segments d'arrondi réglable (paramètres avancés), et de simplifier les polygones à une tolérance en mètres.</li>
+                <li>Requêtes simultanées avec un débit maximal (paramètres avancés).</li>
+                <li>Anneaux sans recouvrement : chaque tranche moins la précédente, avec les attributs cost_min et cost_max (les populations ne sont plus comptées plusieurs fois). Si la requête d'une tranche échoue pour un point, ses anneaux suivants sont ignorés et signalés dans le journal, plutôt que de couvrir deux tranches.</li>
+                <li>Fusion par tranche des isochrones de tous les points (zones de chalandise), combinable avec les anneaux.</li>
+                <li>Notation optionnelle : somme d'un champ (ex. population des carreaux INSEE Filosofi) ou nombre d'entités d'une couche de points ou de carreaux dans chaque isochrone, écrite dans les attributs score et score_count. Les carreaux sont comptés par leur centroïde ; combiné aux anneaux, chaque habitant n'est compté qu'une fois.</li>
+                <li>Cache persistant des isochrones (SQLite) : relancer une étude avec une tranche supplémentaire ne demande à l'API que la nouvelle tranche.</li>
+                <li>Les isochrones sont calculés via l'API IGN et exportés sous forme de polygones géographiques. Les erreurs transitoires de l'API sont retentées automatiquement.</li>
             </ul>
             
             <h4>Paramètres :</h4>
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+Notation des isochrones : somme pondérée d'une couche de points ou de
+carreaux (population INSEE Filosofi, équipements...) contenus dans chaque
+polygone, calculée directement pendant la génération des isochrones.
+"""
+
+from qgis.core import QgsFeatureRequest, QgsGeometry, QgsRectangle, QgsSpatialIndex, QgsWkbTypes
+
+
+class PointScorer:
+    """Index spatial des entités à compter et de leur poids.
+
+    Les carreaux (polygones) sont réduits à leur centroïde : un carreau est
+    compté entier dans l'isochrone qui contient son centre, ce qui évite une
+    intersection surfacique par carreau. Sans champ de poids, chaque entité
+    compte pour 1.
+    """
+
+    def __init__(self, source, weight_field=None, transform=None, feedback=None):
+        self.index = QgsSpatialIndex()
+        self.points = []
+        self.weights = []
+        request = QgsFeatureRequest().setSubsetOfAttributes([weight_field] if weight_field else [], source.fields())
+        for feature in source.getFeatures(request):
+            if feedback is not None and feedback.isCanceled():
+                break
+            geometry = feature.geometry()
+            if geometry.isEmpty():
+                continue
+            if transform is not None:
+                geometry.transform(transform)
+            if geometry.type() == QgsWkbTypes.PointGeometry and not geometry.isMultipart():
+                point = geometry.asPoint()
+            else:
+                point = geometry.centroid().asPoint()
+            weight = 1.0
+            if weight_field:
+                try:
+                    weight = float(feature[weight_field])
+                except (TypeError, ValueError):
+                    continue
+            pos = len(self.points)
+            self.points.append(QgsGeometry.fromPointXY(point))
+            self.weights.append(weight)
+            self.index.addFeature(pos, QgsRectangle(point.x(), point.y(), point.x(), point.y()))
+
+    def __len__(self):
+        return len(self.points)
+
+    def score(self, geometry):
+        """Renvoie (somme des poids, nombre d'entités) des points contenus dans 'geometry'.
+
+        Les candidats sont filtrés par l'emprise de l'index puis testés avec un
+        moteur de géométrie préparé (un seul prétraitement par polygone)."""
+        candidates = self.index.intersects(geometry.boundingBox())
+        if not candidates:
+            return 0.0, 0
+        engine = QgsGeometry.createGeometryEngine(geometry.constGet())
+        engine.prepareGeometry()
+        total, count = 0.0, 0
+        for pos in candidates:
+            if engine.intersects(self.points[pos].constGet()):
+                total += self.weights[pos]
+                count += 1
+        return total, count
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+Paramètres avancés communs aux traitements qui interrogent les services de
+l'IGN (requêtes simultanées, débit maximal, cache persistant des réponses),
+et construction du client HTTP et du cache correspondants.
+"""
+
+from collections import namedtuple
+
+from qgis.core import (
+    QgsProcessingParameterBoolean,
+    QgsProcessingParameterDefinition,
+    QgsProcessingParameterFile,
+    QgsProcessingParameterNumber,
+)
+
+from .cache import ResponseCache, default_cache_path
+from .concurrency import TokenBucket
+from .http_client import HttpClient
+
+
+MAX_WORKERS = 'MAX_WORKERS'
+RATE_LIMIT = 'RATE_LIMIT'
+USE_CACHE = 'USE_CACHE'
+CACHE_FILE = 'CACHE_FILE'
+CACHE_PRECISION = 'CACHE_PRECISION'
+CACHE_TTL_DAYS = 'CACHE_TTL_DAYS'
+CACHE_MAX_SIZE_MB = 'CACHE_MAX_SIZE_MB'
+
+ApiOptions = namedtuple('ApiOptions', ['max_workers', 'rate_limit', 'use_cache', 'cache_file',
+                                       'cache_precision', 'cache_ttl_days', 'cache_max_size_mb'])
+
+
+def api_parameters(algorithm, use_cache_label, precision=True):
+    """Paramètres avancés d'exécution, dans l'ordre d'affichage.
+
+    'use_cache_label' est le libellé (traduit) de l'activation du cache. Sans
+    'precision', la précision des coordonnées des clés du cache n'est pas
+    proposée (voir read_api_parameters)."""
+    tr = algorithm.tr
+    params = [
+        QgsProcessingParameterNumber(
+            MAX_WORKERS,
+            tr('Nombre de requêtes simultanées'),
+            type=QgsProcessingParameterNumber.Integer,
+            defaultValue=4,
+            minValue=1,
+            maxValue=16
+        ),
+        QgsProcessingParameterNumber(
+            RATE_LIMIT,
+            tr('Débit maximal (requêtes par seconde, 0 = illimité)'),
+            type=QgsProcessingParameterNumber.Double,
+            defaultValue=4.5,
+            minValue=0
+        ),
+        QgsProcessingParameterBoolean(
+            USE_CACHE,
+            use_cache_label,
+            defaultValue=True
+        ),
+        QgsProcessingParameterFile(
+            CACHE_FILE,
+            tr('Fichier de cache SQLite (vide = cache du profil QGIS)'),
+            behavior=QgsProcessingParameterFile.File,
+            fileFilter='SQLite (*.sqlite *.db)',
+            optional=True
+        ),
+    ]
+    if precision:
+        params.append(QgsProcessingParameterNumber(
+            CACHE_PRECISION,
+            tr('Précision des coordonnées pour le cache (décimales, 5 ≈ 1 m)'),
+            type=QgsProcessingParameterNumber.Integer,
+            defaultValue=5,
+            minValue=0,
+            maxValue=8
+        ))
+    params += [
+        QgsProcessingParameterNumber(
+            CACHE_TTL_DAYS,
+            tr('Durée de validité du cache (jours, 0 = illimitée)'),
+            type=QgsProcessingParameterNumber.Integer,
+            defaultValue=180,
+            minValue=0
+        ),
+        QgsProcessingParameterNumber(
+            CACHE_MAX_SIZE_MB,
+            tr('Taille maximale du cache (Mo, 0 = illimitée)'),
+            type=QgsProcessingParameterNumber.Integer,
+            defaultValue=500,
+            minValue=0
+        ),
+    ]
+    for param in params:
+        param.setFlags(param.flags() | QgsProcessingParameterDefinition.FlagAdvanced)
+    return params
+
+
+def read_api_parameters(algorithm, parameters, context, precision=5):
+    """Valeurs des paramètres de api_parameters. 'precision' est la précision
+    utilisée lorsque le paramètre correspondant n'est pas proposé."""
+    if algorithm.parameterDefinition(CACHE_PRECISION) is not None:
+        precision = algorithm.parameterAsInt(parameters, CACHE_PRECISION, context)
+    return ApiOptions(
+        max_workers=algorithm.parameterAsInt(parameters, MAX_WORKERS, context),
+        rate_limit=algorithm.parameterAsDouble(parameters, RATE_LIMIT, context),
+        use_cache=algorithm.parameterAsBoolean(parameters, USE_CACHE, context),
+        cache_file=algorithm.parameterAsFile(parameters, CACHE_FILE, context),
+        cache_precision=precision,
+        cache_ttl_days=algorithm.parameterAsInt(parameters, CACHE_TTL_DAYS, context),
+        cache_max_size_mb=algorithm.parameterAsInt(parameters, CACHE_MAX_SIZE_MB, context),
+    )
+
+
+def open_client(options, cancel):
+    """Client HTTP partagé par les workers : débit régulé par un seau de jetons,
+    délai maximal, nouvelles tentatives sur 429/5xx et disjoncteur."""
+    return HttpClient(rate_limiter=TokenBucket(options.rate_limit), cancel=cancel)
+
+
+def open_cache(options, file_name, label, feedback):
+    """Cache persistant des réponses (fichier 'file_name' du profil QGIS par
+    défaut), ou None si le cache est désactivé."""
+    if not options.use_cache:
+        return None
+    cache_path = options.cache_file or default_cache_path(file_name)
+    feedback.pushInfo(f"Cache {label} : {cache_path}")
+    return ResponseCache(cache_path, options.cache_ttl_days, options.cache_max_size_mb)
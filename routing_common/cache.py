@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Cache persistant (SQLite) des réponses des services de calcul, partagé entre
+les exécutions : une entrée par clé, avec durée de vie (TTL) et éviction des
+entrées les moins récemment utilisées (LRU) au-delà d'une taille maximale.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from qgis.core import QgsApplication
+
+
+def default_cache_path(file_name):
+    """Chemin par défaut d'un fichier de cache dans le profil QGIS de l'utilisateur."""
+    folder = os.path.join(QgsApplication.qgisSettingsDirPath(), 'cache', 'pluginsinddigodg')
+    os.makedirs(folder, exist_ok=True)
+    return os.path.join(folder, file_name)
+
+
+class ResponseCache:
+    """Table clé → réponse JSON stockée dans un fichier SQLite.
+
+    Les accès sont protégés par un verrou : une même instance peut être
+    utilisée depuis les workers d'un pool de requêtes. 'ttl_days' <= 0
+    désactive l'expiration, 'max_size_mb' <= 0 désactive l'éviction.
+    """
+
+    _COMMIT_EVERY = 50
+
+    def __init__(self, path, ttl_days=0, max_size_mb=0):
+        self.path = path
+        self.ttl = ttl_days * 86400 if ttl_days and ttl_days > 0 else None
+        self.max_bytes = int(max_size_mb * 1024 * 1024) if max_size_mb and max_size_mb > 0 else None
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._uncommitted = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " payload TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created REAL NOT NULL,"
+            " accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self._conn.commit()
+
+    def get(self, key):
+        """Renvoie la réponse mise en cache pour 'key', ou None (absente ou expirée)."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (self.ttl is not None and now - row[1] > self.ttl):
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self._tick()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key, value):
+        """Enregistre (ou remplace) la réponse 'value' (sérialisable en JSON)."""
+        payload = json.dumps(value, separators=(',', ':'))
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, payload, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, payload, len(payload), now, now),
+            )
+            self._tick()
+
+    def _tick(self):
+        self._uncommitted += 1
+        if self._uncommitted >= self._COMMIT_EVERY:
+            self._conn.commit()
+            self._uncommitted = 0
+
+    def evict(self):
+        """Supprime les entrées expirées puis les moins récemment utilisées
+        jusqu'à repasser sous la taille maximale. Renvoie le nombre d'entrées supprimées."""
+        removed = 0
+        with self._lock:
+            if self.ttl is not None:
+                removed += self._conn.execute(
+                    "DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,)
+                ).rowcount
+            if self.max_bytes is not None:
+                total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+                if total > self.max_bytes:
+                    excess = total - self.max_bytes
+                    keys = []
+                    for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed"):
+                        keys.append((key,))
+                        excess -= size
+                        if excess <= 0:
+                            break
+                    self._conn.executemany("DELETE FROM responses WHERE key = ?", keys)
+                    removed += len(keys)
+            self._conn.commit()
+            self._uncommitted = 0
+        return removed
+
+    def close(self):
+        """Applique la politique d'éviction et ferme le fichier."""
+        self.evict()
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+Fichier de reprise (JSON Lines) pour les traitements longs : chaque unité de
+travail terminée y est ajoutée au fil de l'eau, ce qui permet de relancer un
+calcul annulé ou interrompu sans refaire les unités déjà traitées.
+"""
+
+import json
+import os
+
+
+class RunCheckpoint:
+    """Journal des unités terminées d'un traitement.
+
+    La première ligne contient la signature du traitement (paramètres et
+    données d'entrée) ; un fichier dont la signature diffère est ignoré et
+    réécrit. Les lignes suivantes sont de la forme {"unit": id, "results": [...]}.
+    'done' ne contient que les unités relues au démarrage : les unités
+    enregistrées pendant l'exécution ne sont pas conservées en mémoire.
+    """
+
+    def __init__(self, path, signature):
+        self.path = path
+        self.done = {}
+        resumed = False
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                lines = [line for line in f.read().split('\n') if line]
+            try:
+                header = json.loads(lines[0])
+            except (IndexError, ValueError):
+                header = {}
+            if header.get('signature') == signature:
+                resumed = True
+                valid = 1
+                for line in lines[1:]:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Dernière ligne tronquée par un arrêt brutal : elle est retirée
+                        break
+                    self.done[record['unit']] = record['results']
+                    valid += 1
+                if valid < len(lines):
+                    with open(path, 'w', encoding='utf-8') as f:
+                        f.write('\n'.join(lines[:valid]) + '\n')
+        self.resumed = resumed
+        self._file = open(path, 'a' if resumed else 'w', encoding='utf-8')
+        if not resumed:
+            self._file.write(json.dumps({'signature': signature}) + '\n')
+            self._file.flush()
+
+    def record(self, unit, results):
+        """Ajoute une unité terminée et force l'écriture sur disque."""
+        self._file.write(json.dumps({'unit': unit, 'results': results}, default=str) + '\n')
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Outils communs d'exécution concurrente pour les appels aux services de calcul
+(itinéraires, isochrones) : limitation de débit et pool de requêtes borné.
+"""
+
+import threading
+import time
+import concurrent.futures
+from collections import deque
+
+
+class TokenBucket:
+    """Limiteur de débit à seau de jetons, partagé entre threads.
+
+    'rate' est le nombre de jetons rendus par seconde (requêtes/s) ; une valeur
+    <= 0 désactive la limitation. 'capacity' borne la rafale autorisée : avec
+    la valeur par défaut (1), les requêtes sont simplement espacées de 1/rate.
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = float(rate or 0)
+        self.capacity = max(1.0, float(capacity))
+        self._tokens = self.capacity
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, cancel=None):
+        """Bloque jusqu'à obtention d'un jeton.
+
+        Renvoie False si 'cancel' (threading.Event) est armé pendant l'attente,
+        True sinon.
+        """
+        if self.rate <= 0:
+            return not (cancel is not None and cancel.is_set())
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._stamp) * self.rate)
+                self._stamp = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if cancel is None:
+                time.sleep(wait)
+            elif cancel.wait(wait):
+                return False
+
+
+class FeedbackCancel:
+    """Annulation d'un QgsFeedback vue comme un threading.Event (is_set), pour
+    les calculs longs exécutés dans le thread principal (graphe local)."""
+
+    def __init__(self, feedback):
+        self.feedback = feedback
+
+    def is_set(self):
+        return self.feedback is not None and self.feedback.isCanceled()
+
+
+def ordered_map(func, items, max_workers, feedback=None, cancel=None):
+    """Applique 'func' à chaque élément de 'items' dans un pool de threads borné.
+
+    Générateur : les résultats sont renvoyés dans l'ordre d'entrée, quel que
+    soit l'ordre de fin des requêtes. Au plus 2 × max_workers éléments sont en
+    vol, 'items' peut donc être un générateur paresseux. L'annulation
+    (feedback.isCanceled()) est testée à intervalle court ; elle arme 'cancel'
+    pour que les workers en attente d'un jeton abandonnent au plus vite.
+
+    'func' est exécutée hors du thread principal : elle ne doit pas utiliser
+    'feedback' et doit capturer ses propres erreurs.
+    """
+    cancel = cancel or threading.Event()
+    window = max(1, int(max_workers)) * 2
+    items = iter(items)
+    pending = deque()
+    exhausted = False
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, int(max_workers)))
+    try:
+        while True:
+            while not exhausted and len(pending) < window:
+                try:
+                    item = next(items)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending.append(executor.submit(func, item))
+            if not pending:
+                return
+            while True:
+                if feedback is not None and feedback.isCanceled():
+                    return
+                try:
+                    result = pending[0].result(timeout=0.2)
+                    break
+                except concurrent.futures.TimeoutError:
+                    continue
+            pending.popleft()
+            yield result
+    finally:
+        cancel.set()
+        executor.shutdown(wait=True, cancel_futures=True)
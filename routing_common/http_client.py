@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""
+Client HTTP commun aux algorithmes qui interrogent les services IGN
+(itinéraires, isochrones) : délai maximal par requête, nouvelles tentatives
+avec attente exponentielle (en respectant l'en-tête Retry-After), disjoncteur
+qui suspend tout le traitement quand le service se dégrade, et statistiques
+de l'exécution.
+"""
+
+import email.utils
+import random
+import threading
+import time
+
+from qgis.core import QgsBlockingNetworkRequest, QgsFeedback
+from qgis.PyQt.QtCore import QUrl
+from qgis.PyQt.QtNetwork import QNetworkRequest
+
+
+# Codes HTTP considérés comme transitoires : la requête est retentée
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class HttpError(Exception):
+    """Échec définitif d'une requête ('status' vaut None pour une erreur réseau)."""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class HttpStats:
+    """Compteurs d'une exécution, partagés entre threads."""
+
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.bytes = 0
+        self.breaker_trips = 0
+        self.latencies = []
+        self._lock = threading.Lock()
+
+    def add(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def add_latency(self, seconds):
+        with self._lock:
+            self.latencies.append(seconds)
+
+    def percentile(self, q):
+        """Latence (s) au centile 'q' (0-100), ou None sans requête."""
+        with self._lock:
+            values = sorted(self.latencies)
+        if not values:
+            return None
+        return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+    def summary(self):
+        """Résumé lisible des compteurs, pour le journal du traitement."""
+        text = (f"{self.requests} requête(s) HTTP, {self.retries} nouvelle(s) tentative(s), "
+                f"{self.failures} échec(s), {self.bytes / 1024:.0f} Ko reçus")
+        if self.latencies:
+            text += (f", latence p50 {self.percentile(50) * 1000:.0f} ms, "
+                     f"p90 {self.percentile(90) * 1000:.0f} ms, p99 {self.percentile(99) * 1000:.0f} ms")
+        if self.breaker_trips:
+            text += f", {self.breaker_trips} suspension(s) du service"
+        return text
+
+
+class HttpClient:
+    """Session HTTP d'une exécution : requêtes GET synchrones avec reprise sur
+    erreur transitoire.
+
+    Utilise QgsBlockingNetworkRequest (proxy et authentification de QGIS) :
+    une même instance peut être appelée depuis les workers d'un pool.
+    Chaque requête passe par le QgsNetworkAccessManager du thread appelant :
+    les connexions (keep-alive) ne sont réutilisées qu'au sein d'un même
+    worker, la négociation TLS a donc lieu une fois par thread du pool. À
+    l'annulation, les requêtes en cours sont interrompues (leur connexion est
+    fermée) ; les connexions inactives sont libérées avec les threads du pool,
+    à la fin de ordered_map. HTTP/2 est autorisé lorsque la version de Qt le
+    permet.
+
+    - 'timeout' : délai maximal d'une tentative, en secondes ;
+    - 'max_retries' : nombre de nouvelles tentatives après une erreur réseau
+      ou un code 429/5xx ; l'attente double à chaque fois (à partir de
+      'backoff' s, plafonnée à 'max_backoff' s) avec une part aléatoire, ou
+      suit l'en-tête Retry-After s'il est présent ;
+    - disjoncteur : après 'breaker_threshold' échecs consécutifs, toutes les
+      requêtes sont suspendues pendant 'breaker_pause' secondes ;
+    - 'rate_limiter' : TokenBucket optionnel, sollicité avant chaque tentative ;
+    - 'cancel' (threading.Event) : l'annulation interrompt les attentes et
+      les requêtes en cours, get() renvoie alors None. Seul l'événement est
+      consulté : le feedback du traitement n'est utilisé que par le thread
+      principal (voir concurrency.ordered_map).
+    """
+
+    def __init__(self, timeout=30, max_retries=4, backoff=0.5, max_backoff=30,
+                 breaker_threshold=5, breaker_pause=30, rate_limiter=None, cancel=None):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.breaker_threshold = breaker_threshold
+        self.breaker_pause = breaker_pause
+        self.rate_limiter = rate_limiter
+        self.cancel = cancel
+        self.stats = HttpStats()
+        self._lock = threading.Lock()
+        self._consecutive_failures = 0
+        self._open_until = 0.0
+        self._in_flight = set()
+        self._watcher = None
+
+    def canceled(self):
+        return self.cancel is not None and self.cancel.is_set()
+
+    def _watch_cancel(self):
+        """Thread de surveillance : à l'annulation, interrompt les requêtes en cours."""
+        self.cancel.wait()
+        with self._lock:
+            in_flight = list(self._in_flight)
+        for request_feedback in in_flight:
+            request_feedback.cancel()
+
+    def _begin(self):
+        """QgsFeedback d'une tentative, annulé avec le traitement."""
+        request_feedback = QgsFeedback()
+        with self._lock:
+            if self.cancel is not None and self._watcher is None:
+                self._watcher = threading.Thread(target=self._watch_cancel, daemon=True)
+                self._watcher.start()
+            self._in_flight.add(request_feedback)
+        # Annulation survenue avant l'enregistrement : le thread de surveillance l'a manquée
+        if self.canceled():
+            request_feedback.cancel()
+        return request_feedback
+
+    def _end(self, request_feedback):
+        with self._lock:
+            self._in_flight.discard(request_feedback)
+
+    def _sleep(self, seconds):
+        """Attente interruptible ; renvoie False si le traitement est annulé."""
+        deadline = time.monotonic() + seconds
+        while not self.canceled():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return True
+            time.sleep(min(remaining, 0.2))
+        return False
+
+    def _wait_breaker(self):
+        with self._lock:
+            wait = self._open_until - time.monotonic()
+        return wait <= 0 or self._sleep(wait)
+
+    def _record(self, success):
+        with self._lock:
+            if success:
+                self._consecutive_failures = 0
+                return
+            self._consecutive_failures += 1
+            if self._consecutive_failures >= self.breaker_threshold and time.monotonic() >= self._open_until:
+                self._open_until = time.monotonic() + self.breaker_pause
+                self._consecutive_failures = 0
+                trip = True
+            else:
+                trip = False
+        if trip:
+            self.stats.add(breaker_trips=1)
+
+    def _delay(self, attempt, retry_after):
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff * 4)
+        delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def createRequest(self, url):
+        """QNetworkRequest d'une tentative ; point d'extension pour les en-têtes."""
+        request = QNetworkRequest(QUrl(url))
+        if hasattr(request, 'setTransferTimeout'):
+            request.setTransferTimeout(int(self.timeout * 1000))
+        # Qt >= 5.15 : négociation HTTP/2 (ALPN), repli automatique sur HTTP/1.1
+        http2 = getattr(QNetworkRequest, 'Http2AllowedAttribute', None)
+        if http2 is not None:
+            request.setAttribute(http2, True)
+        return request
+
+    def get(self, url):
+        """Renvoie le corps de la réponse (bytes), None si le traitement est
+        annulé. Lève HttpError après épuisement des tentatives."""
+        attempt = 0
+        while True:
+            if not self._wait_breaker():
+                return None
+            if self.rate_limiter is not None and not self.rate_limiter.acquire(self.cancel):
+                return None
+            if self.canceled():
+                return None
+
+            blocking = QgsBlockingNetworkRequest()
+            request_feedback = self._begin()
+            start = time.monotonic()
+            try:
+                error_code = blocking.get(self.createRequest(url), False, request_feedback)
+            finally:
+                self._end(request_feedback)
+            if request_feedback.isCanceled():
+                return None
+            self.stats.add_latency(time.monotonic() - start)
+            self.stats.add(requests=1)
+            reply = blocking.reply()
+            status = reply.attribute(QNetworkRequest.HttpStatusCodeAttribute)
+
+            if error_code == QgsBlockingNetworkRequest.NoError:
+                content = bytes(reply.content())
+                self.stats.add(bytes=len(content))
+                self._record(True)
+                return content
+
+            transient = status is None or status in RETRY_STATUS
+            if transient:
+                self._record(False)
+            if not transient or attempt >= self.max_retries:
+                self.stats.add(failures=1)
+                message = blocking.errorMessage()
+                raise HttpError(f"HTTP {status} : {message}" if status else message, status)
+
+            retry_after = parse_retry_after(bytes(reply.rawHeader(b'Retry-After')).decode('latin-1'))
+            self.stats.add(retries=1)
+            if not self._sleep(self._delay(attempt, retry_after)):
+                return None
+            attempt += 1
+
+
+def parse_retry_after(value):
+    """Interprète l'en-tête Retry-After (secondes ou date HTTP) ; None si absent ou invalide."""
+    value = (value or '').strip()
+    if not value:
+        return None
+    if value.isdigit():
+        return float(value)
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, date.timestamp() - time.time())
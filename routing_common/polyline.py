@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+"""
+Décodage des géométries au format « Encoded Polyline » renvoyées par les
+services de calcul lorsque l'on demande geometryFormat=polyline.
+"""
+
+
+def decode_polyline(encoded, precision=5):
+    """Décode une polyligne encodée et renvoie la liste des coordonnées [lon, lat].
+
+    Le format encode des couples (lat, lon) en écarts successifs ; l'ordre est
+    inversé ici pour correspondre à celui des coordonnées GeoJSON.
+    """
+    factor = 10 ** precision
+    coordinates = []
+    index = lat = lon = 0
+    length = len(encoded)
+    while index < length:
+        deltas = []
+        for _ in range(2):
+            shift = result = 0
+            while True:
+                byte = ord(encoded[index]) - 63
+                index += 1
+                result |= (byte & 0x1f) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += deltas[0]
+        lon += deltas[1]
+        coordinates.append([lon / factor, lat / factor])
+    return coordinates
@@ -0,0 +1,564 @@
+# -*- coding: utf-8 -*-
+"""
+Graphe routier local construit à partir d'une couche de tronçons (par exemple
+BD TOPO « troncon_de_route ») : alternative hors ligne aux services de calcul
+d'itinéraires.
+
+Le graphe est stocké sous forme compacte (CSR) dans des tableaux NumPy et mis
+en cache sur disque (.npz) ; les plus courts chemins sont calculés par
+Dijkstra (un départ, plusieurs arrivées) ou A* (un départ, une arrivée), entre
+nœuds ou entre points projetés sur les tronçons (routes_between). Les
+coordonnées sont celles du système projeté de construction (Lambert 93).
+"""
+
+import hashlib
+import heapq
+import json
+import math
+import os
+from collections import namedtuple
+
+import numpy as np
+from qgis.core import QgsSpatialIndex, QgsRectangle, QgsPointXY, QgsFeatureRequest
+
+from .cache import default_cache_path
+
+
+# Vitesses par défaut (km/h) lorsque la couche ne fournit pas de champ vitesse
+DEFAULT_SPEEDS_KMH = {'car': 50.0, 'pedestrian': 4.0}
+
+# Position d'un point projeté sur un tronçon : 'fraction' de la longueur du
+# tronçon depuis son premier sommet, projeté (x, y) et distance au point d'origine
+EdgePosition = namedtuple('EdgePosition', ['edge', 'fraction', 'x', 'y', 'distance'])
+
+
+def project_on_polyline(xs, ys, x, y):
+    """Projection orthogonale du point (x, y) sur la polyligne (xs, ys).
+
+    Renvoie (distance au point, abscisse curviligne du projeté, x, y du projeté)."""
+    xs, ys = np.asarray(xs, dtype=np.float64), np.asarray(ys, dtype=np.float64)
+    dx, dy = np.diff(xs), np.diff(ys)
+    square = dx * dx + dy * dy
+    t = np.clip(((x - xs[:-1]) * dx + (y - ys[:-1]) * dy) / np.where(square > 0, square, 1.0), 0.0, 1.0)
+    px, py = xs[:-1] + t * dx, ys[:-1] + t * dy
+    distances = np.hypot(px - x, py - y)
+    i = int(np.argmin(distances))
+    segments = np.sqrt(square)
+    return float(distances[i]), float(segments[:i].sum() + t[i] * segments[i]), float(px[i]), float(py[i])
+
+
+def polyline_slice(xs, ys, start, end):
+    """Points de la polyligne (xs, ys) entre les abscisses curvilignes 'start' et
+    'end', dans l'ordre de parcours de 'start' vers 'end'."""
+    if end < start:
+        return polyline_slice(xs, ys, end, start)[::-1]
+    cumulative = np.concatenate([[0.0], np.cumsum(np.hypot(np.diff(xs), np.diff(ys)))])
+
+    def point_at(offset):
+        i = min(max(int(np.searchsorted(cumulative, offset, side='right')) - 1, 0), len(xs) - 2)
+        segment = cumulative[i + 1] - cumulative[i]
+        t = min(max((offset - cumulative[i]) / segment, 0.0), 1.0) if segment > 0 else 0.0
+        return (float(xs[i] + t * (xs[i + 1] - xs[i])), float(ys[i] + t * (ys[i + 1] - ys[i])))
+
+    inner = [(float(xs[i]), float(ys[i])) for i in range(len(xs)) if start < cumulative[i] < end]
+    return [point_at(start)] + inner + [point_at(end)]
+
+
+class RoadGraph:
+    """Graphe orienté compact : pour le nœud u, les arcs sortants sont les
+    indices k de indptr[u] à indptr[u + 1] ; head[k] est le nœud d'arrivée,
+    length[k] la longueur (m), duration[k] la durée (s). Chaque arc renvoie au
+    tronçon edge[k], parcouru à l'envers si reverse[k] vaut 1."""
+
+    _ARRAYS = ('node_x', 'node_y', 'indptr', 'tail', 'head', 'length', 'duration',
+               'edge', 'reverse', 'coord_ptr', 'coord_x', 'coord_y')
+
+    def __init__(self, **arrays):
+        for name in self._ARRAYS:
+            setattr(self, name, arrays[name])
+        # Listes Python pour la boucle de Dijkstra (l'indexation NumPy unitaire est lente)
+        self._indptr = self.indptr.tolist()
+        self._head = self.head.tolist()
+        self._weights = {'length': self.length.tolist(), 'duration': self.duration.tolist()}
+        speeds = self.length / np.maximum(self.duration, 1e-9)
+        self.max_speed = float(speeds.max()) if len(speeds) else 1.0
+        self._index = None
+        self._edge_index = None
+        self._edge_ends = None
+        self._component = None
+
+    @property
+    def node_count(self):
+        return len(self.node_x)
+
+    @property
+    def arc_count(self):
+        return len(self.head)
+
+    # ------------------------------------------------------------------
+    # Construction / cache disque
+    # ------------------------------------------------------------------
+    @classmethod
+    def from_source(cls, source, transform, profile, speed_field=None, direction_field=None,
+                    feedback=None, snap=0.1):
+        """Construit le graphe à partir d'une couche linéaire.
+
+        'transform' projette les géométries dans le système de calcul (métrique).
+        Les extrémités distantes de moins de 'snap' mètres sont fusionnées.
+        'direction_field' suit la convention BD TOPO (« Sens direct »,
+        « Sens inverse », « Double sens ») ; il est ignoré pour les piétons.
+        """
+        default_speed = DEFAULT_SPEEDS_KMH[profile]
+        nodes = {}
+        node_x, node_y = [], []
+        tails, heads, lengths, speeds, directions = [], [], [], [], []
+        coord_ptr, coord_x, coord_y = [0], [], []
+
+        def node_for(x, y):
+            key = (round(x / snap), round(y / snap))
+            node = nodes.get(key)
+            if node is None:
+                node = nodes[key] = len(node_x)
+                node_x.append(x)
+                node_y.append(y)
+            return node
+
+        attributes = [name for name in (speed_field, direction_field) if name]
+        request = QgsFeatureRequest().setSubsetOfAttributes(attributes, source.fields())
+        total = source.featureCount() or 1
+        for current, feature in enumerate(source.getFeatures(request)):
+            if feedback is not None:
+                if feedback.isCanceled():
+                    break
+                feedback.setProgress(int(current * 100 / total))
+            geometry = feature.geometry()
+            if geometry.isEmpty():
+                continue
+            geometry.transform(transform)
+
+            speed = default_speed
+            if speed_field and profile == 'car':
+                try:
+                    value = float(feature[speed_field])
+                    if value > 0:
+                        speed = value
+                except (TypeError, ValueError):
+                    pass
+            direction = 0  # 0 : double sens, 1 : sens direct, -1 : sens inverse
+            if direction_field and profile == 'car':
+                value = str(feature[direction_field] or '').lower()
+                if 'direct' in value:
+                    direction = 1
+                elif 'inverse' in value:
+                    direction = -1
+
+            parts = geometry.asMultiPolyline() if geometry.isMultipart() else [geometry.asPolyline()]
+            for points in parts:
+                if len(points) < 2:
+                    continue
+                length = sum(points[i].distance(points[i + 1]) for i in range(len(points) - 1))
+                tails.append(node_for(points[0].x(), points[0].y()))
+                heads.append(node_for(points[-1].x(), points[-1].y()))
+                lengths.append(length)
+                speeds.append(speed)
+                directions.append(direction)
+                coord_x.extend(p.x() for p in points)
+                coord_y.extend(p.y() for p in points)
+                coord_ptr.append(len(coord_x))
+
+        lengths = np.asarray(lengths, dtype=np.float64)
+        return cls.from_edges(
+            node_x, node_y, tails, heads, lengths, lengths / (np.asarray(speeds, dtype=np.float64) / 3.6),
+            directions, coord_ptr, coord_x, coord_y,
+        )
+
+    @classmethod
+    def from_edges(cls, node_x, node_y, tails, heads, lengths, durations, directions,
+                   coord_ptr, coord_x, coord_y):
+        """Construit le graphe à partir des tronçons : extrémités (indices de
+        nœuds), longueur (m), durée (s), sens (0 : double sens, 1 : sens direct,
+        -1 : sens inverse) et points du tracé de chaque tronçon (coord_x/coord_y
+        de coord_ptr[e] à coord_ptr[e + 1])."""
+        tails = np.asarray(tails, dtype=np.int32)
+        heads = np.asarray(heads, dtype=np.int32)
+        lengths = np.asarray(lengths, dtype=np.float64)
+        durations = np.asarray(durations, dtype=np.float64)
+        directions = np.asarray(directions, dtype=np.int8)
+        edges = np.arange(len(tails), dtype=np.int32)
+
+        forward = directions >= 0
+        backward = directions <= 0
+        arc_tail = np.concatenate([tails[forward], heads[backward]])
+        arc_head = np.concatenate([heads[forward], tails[backward]])
+        arc_edge = np.concatenate([edges[forward], edges[backward]])
+        arc_reverse = np.concatenate([np.zeros(forward.sum(), np.int8), np.ones(backward.sum(), np.int8)])
+
+        order = np.argsort(arc_tail, kind='stable')
+        counts = np.bincount(arc_tail, minlength=len(node_x))
+        indptr = np.zeros(len(node_x) + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        return cls(
+            node_x=np.asarray(node_x, dtype=np.float64),
+            node_y=np.asarray(node_y, dtype=np.float64),
+            indptr=indptr,
+            tail=arc_tail[order],
+            head=arc_head[order],
+            length=lengths[arc_edge[order]],
+            duration=durations[arc_edge[order]],
+            edge=arc_edge[order],
+            reverse=arc_reverse[order],
+            coord_ptr=np.asarray(coord_ptr, dtype=np.int64),
+            coord_x=np.asarray(coord_x, dtype=np.float64),
+            coord_y=np.asarray(coord_y, dtype=np.float64),
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(**{name: data[name] for name in cls._ARRAYS})
+
+    def save(self, path):
+        # Écriture dans un fichier temporaire puis renommage : pas de cache à moitié écrit
+        tmp_path = path + '.tmp.npz'
+        np.savez(tmp_path, **{name: getattr(self, name) for name in self._ARRAYS})
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def fingerprint(source, speed_field=None, direction_field=None, feedback=None):
+        """Empreinte SHA-1 du contenu lu pour construire le graphe : géométries
+        et champs vitesse/sens de chaque entité. Une modification sur place
+        (vitesse, sens, tracé) change l'empreinte, même à emprise constante."""
+        attributes = [name for name in (speed_field, direction_field) if name]
+        request = QgsFeatureRequest().setSubsetOfAttributes(attributes, source.fields())
+        digest = hashlib.sha1()
+        for feature in source.getFeatures(request):
+            if feedback is not None and feedback.isCanceled():
+                break
+            digest.update(str(feature.id()).encode('utf-8'))
+            digest.update(bytes(feature.geometry().asWkb()))
+            for name in attributes:
+                digest.update(repr(feature[name]).encode('utf-8'))
+        return digest.hexdigest()
+
+    def digest(self):
+        """Empreinte SHA-1 des tableaux du graphe."""
+        digest = hashlib.sha1()
+        for name in self._ARRAYS:
+            digest.update(np.ascontiguousarray(getattr(self, name)).tobytes())
+        return digest.hexdigest()
+
+    @classmethod
+    def cached(cls, source, transform, profile, speed_field=None, direction_field=None, feedback=None):
+        """Renvoie le graphe de la couche, depuis le cache disque s'il existe,
+        sinon en le construisant puis en l'enregistrant. La clé du cache
+        comprend l'empreinte du contenu de la couche (voir fingerprint)."""
+        description = {
+            'content': cls.fingerprint(source, speed_field, direction_field, feedback),
+            'source': source.sourceName(),
+            'features': source.featureCount(),
+            'extent': source.sourceExtent().toString(3),
+            'crs': transform.destinationCrs().authid(),
+            'profile': profile,
+            'speed_field': speed_field or '',
+            'direction_field': direction_field or '',
+        }
+        digest = hashlib.sha1(json.dumps(description, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+        path = default_cache_path(f'graphe_{digest}.npz')
+        if os.path.exists(path):
+            if feedback is not None:
+                feedback.pushInfo(f"Graphe routier relu depuis le cache : {path}")
+            return cls.load(path)
+        if feedback is not None:
+            feedback.pushInfo("Construction du graphe routier...")
+        graph = cls.from_source(source, transform, profile, speed_field, direction_field, feedback)
+        if feedback is None or not feedback.isCanceled():
+            graph.save(path)
+        return graph
+
+    # ------------------------------------------------------------------
+    # Requêtes
+    # ------------------------------------------------------------------
+    def nearest_node(self, x, y):
+        """Nœud du graphe le plus proche du point (x, y), dans le système du graphe."""
+        if self._index is None:
+            self._index = QgsSpatialIndex()
+            for node, (nx, ny) in enumerate(zip(self.node_x.tolist(), self.node_y.tolist())):
+                self._index.addFeature(node, QgsRectangle(nx, ny, nx, ny))
+        hits = self._index.nearestNeighbor(QgsPointXY(x, y), 1)
+        return hits[0] if hits else None
+
+    def components(self):
+        """Composante connexe de chaque nœud, sans tenir compte du sens de
+        circulation ; calculée (parcours en largeur) à la première demande."""
+        if self._component is None:
+            ends = np.concatenate([self.tail, self.head])
+            others = np.concatenate([self.head, self.tail])
+            order = np.argsort(ends, kind='stable')
+            indptr = np.zeros(self.node_count + 1, dtype=np.int64)
+            np.cumsum(np.bincount(ends, minlength=self.node_count), out=indptr[1:])
+            indptr, neighbours = indptr.tolist(), others[order].tolist()
+            component = [-1] * self.node_count
+            label = 0
+            for start in range(self.node_count):
+                if component[start] >= 0:
+                    continue
+                component[start] = label
+                queue = [start]
+                for u in queue:
+                    for v in neighbours[indptr[u]:indptr[u + 1]]:
+                        if component[v] < 0:
+                            component[v] = label
+                            queue.append(v)
+                label += 1
+            self._component = component
+        return self._component
+
+    def edge_coordinates(self, edge):
+        """Sommets (xs, ys) du tronçon 'edge', dans le sens de numérisation."""
+        start, end = int(self.coord_ptr[edge]), int(self.coord_ptr[edge + 1])
+        return self.coord_x[start:end], self.coord_y[start:end]
+
+    def nearest_position(self, x, y):
+        """Projection du point (x, y) sur le tronçon le plus proche (EdgePosition),
+        ou None si le graphe est vide."""
+        if self._edge_index is None:
+            self._edge_index = QgsSpatialIndex()
+            for edge in range(len(self.coord_ptr) - 1):
+                xs, ys = self.edge_coordinates(edge)
+                self._edge_index.addFeature(edge, QgsRectangle(float(xs.min()), float(ys.min()),
+                                                               float(xs.max()), float(ys.max())))
+        candidates = self._edge_index.nearestNeighbor(QgsPointXY(x, y), 4)
+        if not candidates:
+            return None
+        best = min((self._project(edge, x, y) for edge in candidates), key=lambda position: position.distance)
+        # L'index travaille sur les emprises : tout tronçon dont l'emprise est plus
+        # proche que le meilleur projeté est vérifié exactement
+        d = best.distance
+        for edge in self._edge_index.intersects(QgsRectangle(x - d, y - d, x + d, y + d)):
+            position = self._project(edge, x, y)
+            if position.distance < best.distance:
+                best = position
+        return best
+
+    def _project(self, edge, x, y):
+        xs, ys = self.edge_coordinates(edge)
+        distance, offset, px, py = project_on_polyline(xs, ys, x, y)
+        total = float(np.hypot(np.diff(xs), np.diff(ys)).sum())
+        return EdgePosition(int(edge), offset / total if total > 0 else 0.0, px, py, distance)
+
+    def _edges(self):
+        """Pour chaque tronçon : arc dans le sens de numérisation, arc à contresens
+        (-1 si la circulation y est interdite), nœud du premier et du dernier sommet."""
+        if self._edge_ends is None:
+            count = len(self.coord_ptr) - 1
+            forward, backward = np.full(count, -1, np.int64), np.full(count, -1, np.int64)
+            first, last = np.zeros(count, np.int64), np.zeros(count, np.int64)
+            arcs = np.arange(self.arc_count)
+            direct = self.reverse == 0
+            forward[self.edge[direct]] = arcs[direct]
+            backward[self.edge[~direct]] = arcs[~direct]
+            first[self.edge[direct]], last[self.edge[direct]] = self.tail[direct], self.head[direct]
+            first[self.edge[~direct]], last[self.edge[~direct]] = self.head[~direct], self.tail[~direct]
+            self._edge_ends = (forward.tolist(), backward.tolist(), first.tolist(), last.tolist())
+        return self._edge_ends
+
+    def shortest_path_tree(self, source, targets=None, weight='duration', cancel=None):
+        """Dijkstra depuis 'source'. S'arrête dès que tous les 'targets' sont atteints.
+
+        Les cibles situées dans une autre composante connexe (components) sont
+        écartées d'emblée : elles ne forcent pas l'exploration de toute la
+        composante du départ. Une cible de la même composante mais inaccessible
+        (sens uniques) reste, elle, cherchée jusqu'à épuisement.
+
+        Renvoie (cost, pred) : coût minimal par nœud atteint et arc d'arrivée
+        dans l'arbre des plus courts chemins.
+        """
+        remaining = None
+        if targets is not None:
+            component = self.components()
+            remaining = {t for t in targets if component[t] == component[source]}
+            if not remaining:
+                return {source: 0.0}, {}
+        return self._dijkstra({source: 0.0}, remaining, weight, cancel)
+
+    def _dijkstra(self, seeds, remaining, weight, cancel):
+        """Dijkstra multi-départ : 'seeds' associe à chaque nœud de départ son coût
+        initial. Arrêt lorsque l'ensemble 'remaining' (modifié) est épuisé, ou
+        tous les 10000 nœuds si 'cancel' (threading.Event) est armé."""
+        indptr, head, weights = self._indptr, self._head, self._weights[weight]
+        cost = dict(seeds)
+        pred = {}
+        heap = [(d, u) for u, d in seeds.items()]
+        heapq.heapify(heap)
+        settled = 0
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > cost[u]:
+                continue
+            if remaining is not None:
+                remaining.discard(u)
+                if not remaining:
+                    break
+            settled += 1
+            if cancel is not None and settled % 10000 == 0 and cancel.is_set():
+                break
+            for k in range(indptr[u], indptr[u + 1]):
+                v = head[k]
+                nd = d + weights[k]
+                if nd < cost.get(v, math.inf):
+                    cost[v] = nd
+                    pred[v] = k
+                    heapq.heappush(heap, (nd, v))
+        return cost, pred
+
+    def routes_between(self, start, ends, weight='duration', cancel=None):
+        """Chemins de la position 'start' vers chacune des positions 'ends'
+        (EdgePosition, voir nearest_position).
+
+        Les tronçons de départ et d'arrivée ne sont parcourus qu'en partie, depuis
+        ou jusqu'au point projeté, dans les sens de circulation autorisés. Un seul
+        Dijkstra part des extrémités du tronçon de départ et s'arrête dès que les
+        extrémités des tronçons d'arrivée sont atteintes.
+
+        Renvoie une liste alignée sur 'ends' de dicts {coordinates, distance,
+        duration}, None pour une arrivée inaccessible.
+        """
+        forward, backward, first, last = self._edges()
+        weights = self._weights[weight]
+        # Sorties du tronçon de départ : nœud → (coût, arc parcouru en partie, part parcourue)
+        exits = {}
+        for k, node, part in ((forward[start.edge], last[start.edge], 1.0 - start.fraction),
+                              (backward[start.edge], first[start.edge], start.fraction)):
+            if k >= 0 and part * weights[k] < exits.get(node, (math.inf,))[0]:
+                exits[node] = (part * weights[k], k, part)
+        # Entrées des tronçons d'arrivée : (arc parcouru en partie, nœud d'entrée, part parcourue)
+        entries = [[(k, node, part) for k, node, part in ((forward[end.edge], first[end.edge], end.fraction),
+                                                          (backward[end.edge], last[end.edge], 1.0 - end.fraction))
+                    if k >= 0] for end in ends]
+
+        cost, pred = {}, {}
+        if exits:
+            component = self.components()
+            label = component[first[start.edge]]
+            remaining = {node for end_entries in entries for _, node, _ in end_entries if component[node] == label}
+            if remaining:
+                cost, pred = self._dijkstra({node: value[0] for node, value in exits.items()},
+                                            remaining, weight, cancel)
+
+        paths = []
+        for end, end_entries in zip(ends, entries):
+            best, best_cost = None, math.inf
+            if end.edge == start.edge:
+                # Arrivée sur le tronçon de départ, en aval dans un sens autorisé
+                for k, downstream in ((forward[end.edge], end.fraction >= start.fraction),
+                                      (backward[end.edge], end.fraction <= start.fraction)):
+                    if k >= 0 and downstream and abs(end.fraction - start.fraction) * weights[k] < best_cost:
+                        best, best_cost = (k,), abs(end.fraction - start.fraction) * weights[k]
+            for k, node, part in end_entries:
+                if node in cost and cost[node] + part * weights[k] < best_cost:
+                    best, best_cost = (k, node, part), cost[node] + part * weights[k]
+            paths.append(None if best is None else self._partial_path(start, end, best, exits, pred))
+        return paths
+
+    def _partial_path(self, start, end, best, exits, pred):
+        """Chemin de 'start' à 'end' : directement le long du tronçon commun
+        (best = (arc,)) ou par l'arbre 'pred' (best = (arc d'entrée, nœud, part))."""
+        length, duration = self._weights['length'], self._weights['duration']
+        xs, ys = self.edge_coordinates(end.edge)
+        total = float(np.hypot(np.diff(xs), np.diff(ys)).sum())
+        if len(best) == 1:
+            k, = best
+            part = abs(end.fraction - start.fraction)
+            return {
+                'coordinates': polyline_slice(xs, ys, start.fraction * total, end.fraction * total),
+                'distance': part * length[k],
+                'duration': part * duration[k],
+            }
+        k, node, part = best
+        root, arcs = self._arcs_to(pred, node)
+        _, k0, part0 = exits[root]
+        start_xs, start_ys = self.edge_coordinates(start.edge)
+        start_total = float(np.hypot(np.diff(start_xs), np.diff(start_ys)).sum())
+        coordinates = polyline_slice(start_xs, start_ys, start.fraction * start_total,
+                                     0.0 if self.reverse[k0] else start_total)
+        for points in (self._arcs_coordinates(arcs),
+                       polyline_slice(xs, ys, total if self.reverse[k] else 0.0, end.fraction * total)):
+            coordinates.extend(points[1:])
+        return {
+            'coordinates': coordinates,
+            'distance': part0 * length[k0] + sum(length[a] for a in arcs) + part * length[k],
+            'duration': part0 * duration[k0] + sum(duration[a] for a in arcs) + part * duration[k],
+        }
+
+    def route(self, source, target, weight='duration'):
+        """Plus court chemin A* entre deux nœuds. Renvoie un dict
+        {coordinates, distance, duration} ou None si la cible est inaccessible."""
+        component = self.components()
+        if component[source] != component[target]:
+            return None
+        indptr, head, weights = self._indptr, self._head, self._weights[weight]
+        tx, ty = float(self.node_x[target]), float(self.node_y[target])
+        node_x, node_y = self.node_x, self.node_y
+        # Heuristique admissible : distance à vol d'oiseau (convertie en durée à la vitesse maximale)
+        scale = 1.0 if weight == 'length' else 1.0 / self.max_speed
+
+        def h(node):
+            return math.hypot(float(node_x[node]) - tx, float(node_y[node]) - ty) * scale
+
+        cost = {source: 0.0}
+        pred = {}
+        heap = [(h(source), 0.0, source)]
+        while heap:
+            _, d, u = heapq.heappop(heap)
+            if u == target:
+                return self.path(pred, source, target)
+            if d > cost[u]:
+                continue
+            for k in range(indptr[u], indptr[u + 1]):
+                v = head[k]
+                nd = d + weights[k]
+                if nd < cost.get(v, math.inf):
+                    cost[v] = nd
+                    pred[v] = k
+                    heapq.heappush(heap, (nd + h(v), nd, v))
+        return None
+
+    def path(self, pred, source, target):
+        """Reconstitue le chemin vers 'target' à partir de l'arbre 'pred'.
+        Renvoie un dict {coordinates, distance, duration} ou None si 'target' n'est pas atteint."""
+        if target != source and target not in pred:
+            return None
+        _, arcs = self._arcs_to(pred, target)
+        coordinates = self._arcs_coordinates(arcs)
+        if not coordinates:
+            # Départ et arrivée rattachés au même nœud
+            x, y = float(self.node_x[source]), float(self.node_y[source])
+            coordinates = [(x, y), (x, y)]
+        return {
+            'coordinates': coordinates,
+            'distance': float(sum(self.length[k] for k in arcs)),
+            'duration': float(sum(self.duration[k] for k in arcs)),
+        }
+
+    def _arcs_to(self, pred, node):
+        """Racine de l'arbre 'pred' et arcs menant de cette racine à 'node'."""
+        arcs = []
+        while node in pred:
+            k = pred[node]
+            arcs.append(k)
+            node = int(self.tail[k])
+        arcs.reverse()
+        return node, arcs
+
+    def _arcs_coordinates(self, arcs):
+        """Sommets d'une suite d'arcs consécutifs, sans répéter les nœuds de jonction."""
+        coordinates = []
+        for k in arcs:
+            xs, ys = self.edge_coordinates(int(self.edge[k]))
+            xs, ys = xs.tolist(), ys.tolist()
+            if self.reverse[k]:
+                xs.reverse()
+                ys.reverse()
+            points = list(zip(xs, ys))
+            coordinates.extend(points[1:] if coordinates else points)
+        return coordinates
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Banc d'essai de la construction des segments de l'algorithme GTFS to Route IGN :
+compare l'ancienne boucle (merged_df.iloc[i] à chaque ligne) à la construction
+vectorisée groupby/shift de gtfs_stops_to_routes_ign/segments.py, sur un flux
+GTFS synthétique.
+
+L'ancienne boucle n'est mesurée que sur les 'legacy_rows' premières lignes
+puis extrapolée : sur un stop_times de plusieurs millions de lignes elle dure
+plusieurs minutes.
+
+Usage (pandas seulement, QGIS n'est pas nécessaire) :
+
+    python3 scripts/bench_gtfs_segments.py [lignes_stop_times] [legacy_rows]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'gtfs_stops_to_routes_ign'))
+from segments import sort_stop_times, build_segments, unique_pairs  # noqa: E402
+
+
+def synthetic_feed(rows, stops_per_trip=25, stop_count=5000, patterns=400, seed=42):
+    """stop_times fusionné avec stops : les trips suivent un nombre limité de patterns."""
+    rng = np.random.default_rng(seed)
+    trips = rows // stops_per_trip
+    pattern_stops = rng.integers(0, stop_count, size=(patterns, stops_per_trip))
+    trip_pattern = rng.integers(0, patterns, size=trips)
+    stop_ids = pattern_stops[trip_pattern].ravel()
+    stop_lat = 45.0 + rng.random(stop_count)
+    stop_lon = 4.0 + rng.random(stop_count)
+    df = pd.DataFrame({
+        "trip_id": np.repeat([f"T{i}" for i in range(trips)], stops_per_trip),
+        "stop_sequence": np.tile(np.arange(1, stops_per_trip + 1), trips),
+        "stop_id": [f"S{s}" for s in stop_ids],
+        "stop_lat": stop_lat[stop_ids],
+        "stop_lon": stop_lon[stop_ids],
+    })
+    # Ordre d'origine mélangé, comme après la fusion avec stops
+    return df.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+
+def legacy(merged_df):
+    """Reproduction de l'ancienne boucle ligne à ligne."""
+    result = []
+    for i in range(len(merged_df)):
+        trip_id = merged_df.iloc[i]["trip_id"]
+        stop_sequence = merged_df.iloc[i]["stop_sequence"]
+        xy_depart = (merged_df.iloc[i]["stop_lat"], merged_df.iloc[i]["stop_lon"])
+        if i + 1 < len(merged_df) and merged_df.iloc[i + 1]["trip_id"] == trip_id:
+            xy_arrivee = (merged_df.iloc[i + 1]["stop_lat"], merged_df.iloc[i + 1]["stop_lon"])
+        else:
+            xy_arrivee = None
+        result.append([trip_id, stop_sequence, xy_depart, xy_arrivee])
+    return result
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    legacy_rows = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+
+    df = synthetic_feed(rows)
+    print(f"stop_times synthétique : {len(df)} lignes")
+
+    start = time.perf_counter()
+    sorted_df = sort_stop_times(df)
+    segments = build_segments(sorted_df)
+    pairs = unique_pairs(segments)
+    vectorized = time.perf_counter() - start
+    print(f"vectorisé : {vectorized:.2f} s ({len(segments)} segments, {len(pairs)} couples distincts)")
+
+    sample = sorted_df.head(legacy_rows)
+    start = time.perf_counter()
+    legacy(sample)
+    elapsed = time.perf_counter() - start
+    estimate = elapsed * len(df) / max(1, len(sample))
+    print(f"ancienne boucle : {elapsed:.2f} s pour {len(sample)} lignes, soit ~{estimate:.0f} s estimées "
+          f"pour {len(df)} lignes (x{estimate / max(vectorized, 1e-9):.0f})")
+
+    # Contrôle : mêmes segments sur l'échantillon
+    expected = [row for row in legacy(sample) if row[3] is not None]
+    check = build_segments(sample)
+    assert len(expected) == len(check), (len(expected), len(check))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Banc d'essai du buffer des isochrones (algorithme Isochrone) : compare l'ancien
+traitement (transformations recréées pour chaque polygone, 360 segments par
+quart de cercle) au nouveau (transformations créées une fois, nombre de
+segments réglable, simplification optionnelle).
+
+Mesure le nombre moyen de sommets par polygone et le temps total sur des
+isochrones synthétiques (polygones étoilés irréguliers autour de Paris).
+
+Usage, dans un environnement Python où qgis.core est importable :
+
+    python3 scripts/bench_isochrone_buffer.py [nombre_polygones] [buffer_m]
+"""
+
+import math
+import random
+import sys
+import time
+
+from qgis.core import (
+    QgsApplication,
+    QgsCoordinateReferenceSystem,
+    QgsCoordinateTransform,
+    QgsCoordinateTransformContext,
+    QgsGeometry,
+    QgsPointXY,
+)
+
+
+def synthetic_isochrone(rng, lon=2.35, lat=48.85, vertices=400, radius_deg=0.08):
+    """Polygone étoilé irrégulier, proche d'une isochrone renvoyée par l'API."""
+    points = []
+    for i in range(vertices):
+        angle = 2 * math.pi * i / vertices
+        r = radius_deg * (0.6 + 0.4 * rng.random())
+        points.append(QgsPointXY(lon + r * math.cos(angle), lat + 0.66 * r * math.sin(angle)))
+    points.append(points[0])
+    return QgsGeometry.fromPolygonXY([points])
+
+
+def old_path(polygon, buffer_size, context):
+    crs_wgs84 = QgsCoordinateReferenceSystem("EPSG:4326")
+    crs_projected = QgsCoordinateReferenceSystem("EPSG:2154")
+    transform_to_projected = QgsCoordinateTransform(crs_wgs84, crs_projected, context)
+    transform_to_wgs84_back = QgsCoordinateTransform(crs_projected, crs_wgs84, context)
+    polygon.transform(transform_to_projected)
+    polygon = polygon.buffer(buffer_size, segments=360)
+    polygon.transform(transform_to_wgs84_back)
+    return polygon
+
+
+def new_path(polygon, buffer_size, segments, tolerance, transform_to_projected, transform_to_wgs84):
+    polygon.transform(transform_to_projected)
+    polygon = polygon.buffer(buffer_size, segments)
+    if tolerance > 0:
+        simplified = polygon.simplify(tolerance)
+        if not simplified.isEmpty():
+            polygon = simplified
+    polygon.transform(transform_to_wgs84)
+    return polygon
+
+
+def run(label, polygons, func):
+    start = time.perf_counter()
+    vertices = 0
+    for polygon in polygons:
+        vertices += func(QgsGeometry(polygon)).constGet().nCoordinates()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {vertices / len(polygons):>10.0f} sommets/polygone {elapsed:>8.2f} s")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    buffer_size = float(sys.argv[2]) if len(sys.argv) > 2 else 200.0
+
+    app = QgsApplication([], False)
+    app.initQgis()
+    context = QgsCoordinateTransformContext()
+    rng = random.Random(42)
+    polygons = [synthetic_isochrone(rng) for _ in range(count)]
+
+    crs_wgs84 = QgsCoordinateReferenceSystem("EPSG:4326")
+    crs_projected = QgsCoordinateReferenceSystem("EPSG:2154")
+    to_projected = QgsCoordinateTransform(crs_wgs84, crs_projected, context)
+    to_wgs84 = QgsCoordinateTransform(crs_projected, crs_wgs84, context)
+
+    print(f"{count} isochrones, buffer de {buffer_size:.0f} m")
+    run("ancien (360 segments, transformations)", polygons,
+        lambda p: old_path(p, buffer_size, context))
+    for segments, tolerance in ((8, 0), (8, 10), (4, 25)):
+        run(f"nouveau ({segments} segments, tolérance {tolerance} m)", polygons,
+            lambda p, s=segments, t=tolerance: new_path(p, buffer_size, s, t, to_projected, to_wgs84))
+
+    app.exitQgis()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+# coding=utf-8
+"""Tests du fichier de reprise des traitements longs (routing_common.checkpoint)."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from routing_common.checkpoint import RunCheckpoint
+
+
+def done_units(path, signature):
+    """Unités relues par une nouvelle exécution."""
+    checkpoint = RunCheckpoint(path, signature)
+    checkpoint.close()
+    return checkpoint.done
+
+
+class RunCheckpointTest(unittest.TestCase):
+    """Écriture, reprise et invalidation du fichier de reprise."""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, "reprise.jsonl")
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_resume(self):
+        checkpoint = RunCheckpoint(self.path, "sig")
+        self.assertFalse(checkpoint.resumed)
+        checkpoint.record("1", [{"id1": "a", "distance": 1.5}])
+        checkpoint.record("2", [])
+        checkpoint.close()
+
+        checkpoint = RunCheckpoint(self.path, "sig")
+        self.assertTrue(checkpoint.resumed)
+        self.assertEqual(checkpoint.done, {"1": [{"id1": "a", "distance": 1.5}], "2": []})
+        checkpoint.record("3", [])
+        checkpoint.close()
+        self.assertEqual(set(done_units(self.path, "sig")), {"1", "2", "3"})
+
+    def test_other_signature(self):
+        checkpoint = RunCheckpoint(self.path, "sig")
+        checkpoint.record("1", [])
+        checkpoint.close()
+
+        checkpoint = RunCheckpoint(self.path, "autre")
+        checkpoint.close()
+        self.assertFalse(checkpoint.resumed)
+        self.assertEqual(checkpoint.done, {})
+        # Le fichier est réécrit avec la nouvelle signature
+        self.assertEqual(done_units(self.path, "autre"), {})
+
+    def test_truncated_line(self):
+        checkpoint = RunCheckpoint(self.path, "sig")
+        checkpoint.record("1", [])
+        checkpoint.close()
+        with open(self.path, "a", encoding="utf-8") as handle:
+            handle.write('{"unit": "2", "res')
+
+        checkpoint = RunCheckpoint(self.path, "sig")
+        self.assertEqual(set(checkpoint.done), {"1"})
+        checkpoint.record("2", [])
+        checkpoint.close()
+        self.assertEqual(set(done_units(self.path, "sig")), {"1", "2"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+# coding=utf-8
+"""Tests de l'exécution concurrente des requêtes (routing_common.concurrency)."""
+
+import random
+import threading
+import time
+import unittest
+
+from routing_common.concurrency import TokenBucket, ordered_map
+
+
+class CanceledFeedback:
+    """Feedback annulé après 'after' appels à isCanceled()."""
+
+    def __init__(self, after):
+        self.after = after
+
+    def isCanceled(self):
+        self.after -= 1
+        return self.after < 0
+
+
+class TokenBucketTest(unittest.TestCase):
+    """Espacement des jetons et annulation de l'attente."""
+
+    def test_rate(self):
+        bucket = TokenBucket(50)
+        start = time.monotonic()
+        for _ in range(11):
+            self.assertTrue(bucket.acquire())
+        # Premier jeton immédiat, puis un toutes les 20 ms
+        self.assertGreaterEqual(time.monotonic() - start, 0.18)
+
+    def test_unlimited(self):
+        bucket = TokenBucket(0)
+        start = time.monotonic()
+        for _ in range(1000):
+            self.assertTrue(bucket.acquire())
+        self.assertLess(time.monotonic() - start, 0.5)
+
+    def test_cancel(self):
+        bucket = TokenBucket(0.1)
+        cancel = threading.Event()
+        self.assertTrue(bucket.acquire(cancel))
+        threading.Timer(0.05, cancel.set).start()
+        start = time.monotonic()
+        self.assertFalse(bucket.acquire(cancel))
+        self.assertLess(time.monotonic() - start, 2)
+
+
+class OrderedMapTest(unittest.TestCase):
+    """Ordre des résultats, fenêtre bornée et annulation."""
+
+    def test_order(self):
+        rng = random.Random(0)
+        delays = [rng.random() * 0.01 for _ in range(100)]
+
+        def work(i):
+            time.sleep(delays[i])
+            return i * i
+
+        self.assertEqual(list(ordered_map(work, range(100), 8)), [i * i for i in range(100)])
+
+    def test_bounded_window(self):
+        consumed = []
+
+        def items():
+            for i in range(1000):
+                consumed.append(i)
+                yield i
+
+        results = ordered_map(lambda i: i, items(), 4)
+        self.assertEqual(next(results), 0)
+        # Au plus 2 × max_workers éléments en vol
+        self.assertLessEqual(len(consumed), 8)
+        results.close()
+
+    def test_cancel(self):
+        cancel = threading.Event()
+
+        def work(i):
+            if cancel.wait(5):
+                return None
+            return i
+
+        start = time.monotonic()
+        self.assertEqual(list(ordered_map(work, range(50), 4, CanceledFeedback(3), cancel)), [])
+        self.assertTrue(cancel.is_set())
+        self.assertLess(time.monotonic() - start, 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
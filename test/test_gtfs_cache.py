@@ -0,0 +1,101 @@
+# coding=utf-8
+"""Tests du cache .npy des données GTFS préparées (TcIsoFromGtfs, load)."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from TcIsoFromGtfs.gtfs_isochrone import load, prepare
+
+
+FEED = {
+    "stops.txt": (
+        "stop_id,stop_name,stop_lat,stop_lon\n"
+        "007,A,48.8500,2.3500\n"
+        "B,B,48.8510,2.3510\n"
+        "C,C,48.8600,2.3600\n"
+    ),
+    "routes.txt": "route_id,route_type\nR1,3\nR2,0\n",
+    "trips.txt": "route_id,service_id,trip_id\nR1,S1,T1\nR2,S1,T2\nR2,S2,T3\n",
+    "calendar_dates.txt": "service_id,date,exception_type\nS1,20240102,1\nS1,20240103,1\nS2,20240103,1\n",
+    "stop_times.txt": (
+        "trip_id,arrival_time,departure_time,stop_id,stop_sequence\n"
+        "T1,08:00:00,08:00:00,007,1\n"
+        "T1,,,B,2\n"
+        "T1,08:10:00,08:10:00,C,3\n"
+        "T2,25:30:00,25:30:00,C,1\n"
+        "T2,25:40:00,25:40:00,007,2\n"
+        "T3,09:00:00,09:00:00,B,1\n"
+    ),
+}
+
+
+class GtfsCacheTest(unittest.TestCase):
+    """Aller-retour store_prepared_data / load_prepared_data."""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        for name, content in FEED.items():
+            with open(os.path.join(self.folder, name), "w", encoding="utf-8") as handle:
+                handle.write(content)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_round_trip(self):
+        raw_stops = load.load_raw_stops(self.folder)
+        raw_stoptimes = load.load_raw_stoptimes(self.folder)
+        data = prepare.prepare_data_in_gtfs_folder(self.folder, 500)
+
+        # Identifiants encodés : mêmes codes dans toutes les tables
+        stop_codes = dict(zip(raw_stops["stop_id"], data.stops["stop_id"]))
+        self.assertEqual(len(set(stop_codes.values())), 3)
+        self.assertEqual(data.stops["stop_id"].dtype, np.int32)
+        np.testing.assert_array_equal(data.stops["stop_lat"], raw_stops["stop_lat"])
+        np.testing.assert_array_equal(data.stops["stop_lon"], raw_stops["stop_lon"])
+        self.assertEqual(list(data.stoptimes["stop_id"]), [stop_codes[s] for s in raw_stoptimes["stop_id"]])
+
+        # Heures au-delà de minuit et horaire manquant conservés
+        arrival = data.stoptimes["arrival_time"]
+        self.assertTrue(pd.isna(arrival[1]))
+        self.assertEqual(arrival[3], pd.Timedelta(hours=25, minutes=30))
+        self.assertTrue((arrival.dropna() == raw_stoptimes["arrival_time"].dropna()).all())
+
+        trip_codes = set(data.trips_dates["trip_id"])
+        self.assertTrue(set(data.stoptimes["trip_id"]) <= trip_codes)
+        self.assertEqual(len(data.trips_dates), 5)
+        self.assertEqual(sorted(data.trips_dates["route_type"]), [0, 0, 0, 3, 3])
+        self.assertEqual(
+            sorted(data.trips_dates["date"].dt.strftime("%Y%m%d")),
+            ["20240102", "20240102", "20240103", "20240103", "20240103"],
+        )
+
+        # Correspondances : A <-> B (150 m environ) seulement
+        self.assertEqual(len(data.durations), 2)
+        self.assertEqual(data.durations.seconds.dtype, np.uint16)
+        self.assertEqual(data.durations.max_distance_m, 500)
+
+    def test_checksum_invalidates_cache(self):
+        prepare.prepare_data_in_gtfs_folder(self.folder, 500)
+        checksum = load.feed_checksum(self.folder)
+        self.assertTrue(load.has_prepared_data(self.folder, checksum, 500))
+        self.assertFalse(load.has_prepared_data(self.folder, checksum, 600))
+
+        with open(os.path.join(self.folder, "stops.txt"), "a", encoding="utf-8") as handle:
+            handle.write("D,D,48.9,2.4\n")
+        self.assertFalse(load.has_prepared_data(self.folder, load.feed_checksum(self.folder), 500))
+
+    def test_no_pickle(self):
+        prepare.prepare_data_in_gtfs_folder(self.folder, 500)
+        cache = os.path.join(self.folder, load.CACHE_FOLDER)
+        for name in os.listdir(cache):
+            if name.endswith(".npy"):
+                self.assertNotEqual(np.load(os.path.join(cache, name), allow_pickle=False).dtype, object)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,179 @@
+# coding=utf-8
+"""Tests du moteur Connection Scan de TcIsoFromGtfs (pandas et NumPy seulement)."""
+
+import datetime
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from TcIsoFromGtfs.gtfs_isochrone import csa, load, prepare, travel
+
+
+DAY = datetime.date(2024, 5, 1)
+
+
+def synthetic_data(stop_count=12, seed=0, untimed=False):
+    """Petit réseau : 6 lignes de 5 arrêts, passages toutes les 20 minutes."""
+    rng = np.random.default_rng(seed)
+    stops = pd.DataFrame({
+        "stop_id": [f"S{i}" for i in range(stop_count)],
+        "stop_lat": 48.80 + rng.random(stop_count) * 0.04,
+        "stop_lon": 2.30 + rng.random(stop_count) * 0.04,
+    })
+    rows, trips = [], []
+    for line in range(6):
+        sequence = rng.choice(stop_count, 5, replace=False)
+        for run in range(6):
+            trip_id = f"L{line}R{run}"
+            trips.append(trip_id)
+            start = 7 * 3600 + run * 1200 + int(rng.integers(0, 600))
+            for k, stop in enumerate(sequence):
+                seconds = start + k * 240
+                # Arrêt intermédiaire sans horaire (non point de référence)
+                blank = untimed and k == 2 and run % 2 == 0
+                rows.append((trip_id, f"S{stop}", pd.NaT if blank else pd.Timedelta(seconds=seconds)))
+    stoptimes = pd.DataFrame(rows, columns=["trip_id", "stop_id", "arrival_time"])
+    trips_dates = pd.DataFrame({"trip_id": trips, "route_type": 3, "date": pd.Timestamp(DAY)})
+    durations = prepare.prepare_stop_walk_duration(stops, 800)
+    return load.Data(stops=stops, durations=durations, trips_dates=trips_dates, stoptimes=stoptimes)
+
+
+def brute_force_arrivals(data, lat, lon, start, end):
+    """Plus tôt arrivée par point fixe (correspondances illimitées), en secondes depuis minuit."""
+    def seconds(value):
+        return int((pd.Timestamp(value) - pd.Timestamp(DAY)).total_seconds())
+
+    start, end = seconds(start), seconds(end)
+    stoptimes = prepare.prepare_day_data(data, DAY).stoptimes.dropna(subset=["datetime"])
+    walk = np.rint(
+        prepare.distance_meters(lat, data.stops["stop_lat"], lon, data.stops["stop_lon"]) / prepare.WALKING_SPEED_M_S
+    ) + start
+    arrival = {stop_id: int(w) for stop_id, w in zip(data.stops["stop_id"], walk) if w < end}
+    trips = [
+        [(stop_id, seconds(t)) for stop_id, t in zip(group["stop_id"], group["datetime"])]
+        for _, group in stoptimes.groupby("trip_id")
+    ]
+    walks = data.durations.to_frame()
+    walks = list(zip(walks["stop_id_from"], walks["stop_id_to"], walks["walk_duration"].dt.total_seconds().astype(int)))
+    changed = True
+    while changed:
+        changed = False
+        for trip in trips:
+            boarded = False
+            for stop_id, t in trip:
+                if not start < t < end:
+                    continue
+                if boarded and t < arrival.get(stop_id, end):
+                    arrival[stop_id] = t
+                    changed = True
+                if not boarded and arrival.get(stop_id, end) < t:
+                    boarded = True
+        for stop_from, stop_to, duration in walks:
+            if stop_from in arrival and arrival[stop_from] + duration < arrival.get(stop_to, end):
+                arrival[stop_to] = arrival[stop_from] + duration
+                changed = True
+    served = set(stoptimes.loc[(stoptimes["datetime"] > pd.Timestamp(DAY) + pd.Timedelta(seconds=start))
+                               & (stoptimes["datetime"] < pd.Timestamp(DAY) + pd.Timedelta(seconds=end)), "stop_id"])
+    return {stop_id: t for stop_id, t in arrival.items() if stop_id in served}
+
+
+class ConnectionScanTest(unittest.TestCase):
+    """Comparaison du moteur CSA au moteur pandas historique et à une recherche exhaustive."""
+
+    def compare_engines(self, data, lat, lon):
+        start = datetime.datetime(2024, 5, 1, 7, 0)
+        end = start + datetime.timedelta(minutes=45)
+        day_data = prepare.prepare_day_data(data, DAY)
+
+        scan = csa.ConnectionScan(day_data, DAY)
+        points = scan.arrival_points(lat, lon, start, end)
+        # Le moteur pandas peut garder pour un arrêt une ligne sans coordonnées
+        # (ex aequo avec son passage) : on compare l'heure d'arrivée minimale par arrêt
+        expected = travel.compute_arrival_points(
+            prepare.prepare_window(day_data, start, end), lat, lon, start, end
+        ).groupby("stop_id")["arrival_datetime"].min()
+
+        self.assertTrue((points["arrival_datetime"] >= pd.Timestamp(start)).all())
+        self.assertTrue((points["arrival_datetime"] < pd.Timestamp(end)).all())
+        got = dict(zip(points["stop_id"], points["arrival_datetime"]))
+        want = expected.to_dict()
+        self.assertEqual(set(got), set(want))
+        # Le moteur pandas (4 correspondances, trips consommés) peut trouver plus tard,
+        # jamais plus tôt ; tolérance : arrondi à la seconde des marches enchaînées
+        for stop_id, arrival in want.items():
+            self.assertLessEqual((got[stop_id] - arrival).total_seconds(), 1, stop_id)
+
+        reference = brute_force_arrivals(data, lat, lon, start, end)
+        self.assertEqual(set(got), set(reference))
+        for stop_id, seconds in reference.items():
+            arrival = (got[stop_id] - pd.Timestamp(DAY)).total_seconds()
+            self.assertLessEqual(abs(arrival - seconds), 1, stop_id)
+
+    def test_matches_pandas_engine(self):
+        for seed in range(3):
+            self.compare_engines(synthetic_data(seed=seed), 48.82, 2.32)
+
+    def test_untimed_stops(self):
+        """Les arrêts sans horaire ne créent pas de connexion ni d'heure invalide."""
+        data = synthetic_data(seed=1, untimed=True)
+        scan = csa.ConnectionScan(prepare.prepare_day_data(data, DAY), DAY)
+        self.assertTrue((scan.arr_time >= 0).all())
+        self.assertTrue((scan.dep_time >= 0).all())
+        for seed in range(3):
+            self.compare_engines(synthetic_data(seed=seed, untimed=True), 48.82, 2.32)
+
+    def test_unlimited_transfers(self):
+        """Une chaîne de 6 trips successifs est suivie de bout en bout."""
+        stops = pd.DataFrame({
+            "stop_id": [f"S{i}" for i in range(7)],
+            "stop_lat": [48.0 + i * 0.1 for i in range(7)],
+            "stop_lon": [2.0] * 7,
+        })
+        rows = []
+        for i in range(6):
+            rows.append((f"T{i}", f"S{i}", pd.Timedelta(hours=7, minutes=10 * i + 1)))
+            rows.append((f"T{i}", f"S{i + 1}", pd.Timedelta(hours=7, minutes=10 * i + 9)))
+        data = load.Data(
+            stops=stops,
+            durations=prepare.prepare_stop_walk_duration(stops, 500),
+            trips_dates=pd.DataFrame({"trip_id": [f"T{i}" for i in range(6)], "route_type": 3,
+                                      "date": pd.Timestamp(DAY)}),
+            stoptimes=pd.DataFrame(rows, columns=["trip_id", "stop_id", "arrival_time"]),
+        )
+        scan = csa.ConnectionScan(prepare.prepare_day_data(data, DAY), DAY)
+        start = datetime.datetime(2024, 5, 1, 7, 0)
+        points = scan.arrival_points(48.0, 2.0, start, start + datetime.timedelta(hours=2))
+        arrivals = dict(zip(points["stop_id"], points["arrival_datetime"]))
+        self.assertEqual(arrivals["S6"], pd.Timestamp("2024-05-01 07:59:00"))
+
+    def test_chained_walks(self):
+        """Deux correspondances à pied enchaînées (S1 → S2 → S3, ~670 m chacune) relient
+        deux trips, alors que S1 et S3 sont trop éloignés pour une correspondance directe."""
+        stops = pd.DataFrame({
+            "stop_id": ["S0", "S1", "S2", "S3", "S4"],
+            "stop_lat": [48.0, 48.1, 48.106, 48.112, 48.3],
+            "stop_lon": [2.0] * 5,
+        })
+        rows = [
+            ("T0", "S0", pd.Timedelta(hours=7, minutes=1)), ("T0", "S1", pd.Timedelta(hours=7, minutes=10)),
+            ("T1", "S3", pd.Timedelta(hours=7, minutes=40)), ("T1", "S4", pd.Timedelta(hours=7, minutes=50)),
+        ]
+        data = load.Data(
+            stops=stops,
+            durations=prepare.prepare_stop_walk_duration(stops, 800),
+            trips_dates=pd.DataFrame({"trip_id": ["T0", "T1"], "route_type": 3, "date": pd.Timestamp(DAY)}),
+            stoptimes=pd.DataFrame(rows, columns=["trip_id", "stop_id", "arrival_time"]),
+        )
+        scan = csa.ConnectionScan(prepare.prepare_day_data(data, DAY), DAY)
+        start = datetime.datetime(2024, 5, 1, 7, 0)
+        end = start + datetime.timedelta(hours=2)
+        points = scan.arrival_points(48.0, 2.0, start, end)
+        arrivals = dict(zip(points["stop_id"], points["arrival_datetime"]))
+        self.assertEqual(arrivals["S4"], pd.Timestamp("2024-05-01 07:50:00"))
+        reference = brute_force_arrivals(data, 48.0, 2.0, start, end)
+        self.assertEqual(reference["S4"], 7 * 3600 + 50 * 60)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+# coding=utf-8
+"""Tests de la lecture directe des tables GTFS (gtfs_stops_to_routes_ign.gtfs_reader)."""
+
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+
+from gtfs_stops_to_routes_ign.gtfs_reader import has_table, read_table
+
+
+STOP_TIMES = (
+    "trip_id, arrival_time, stop_id, stop_sequence\n"
+    "T1, 08:00:00, 007, 1\n"
+    "T1, 08:05:00, 008, 2\n"
+)
+
+
+class GtfsReaderTest(unittest.TestCase):
+    """Lecture des colonnes utiles depuis un dossier ou une archive."""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        with open(os.path.join(self.folder, "stop_times.txt"), "w", encoding="utf-8") as handle:
+            handle.write(STOP_TIMES)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def check(self, df):
+        self.assertEqual(list(df.columns), ["trip_id", "stop_id", "stop_sequence"])
+        # Identifiants lus en texte : « 007 » reste « 007 »
+        self.assertEqual(list(df["stop_id"]), ["007", "008"])
+        self.assertEqual(list(df["stop_sequence"]), [1, 2])
+
+    def test_padded_header_folder(self):
+        self.check(read_table(self.folder, "stop_times.txt", ["trip_id", "stop_id", "stop_sequence"]))
+
+    def test_padded_header_zip(self):
+        archive = os.path.join(self.folder, "gtfs.zip")
+        with zipfile.ZipFile(archive, "w") as handle:
+            handle.write(os.path.join(self.folder, "stop_times.txt"), "feed/stop_times.txt")
+        self.assertTrue(has_table(archive, "stop_times.txt"))
+        self.assertFalse(has_table(archive, "trips.txt"))
+        self.check(read_table(archive, "stop_times.txt", ["trip_id", "stop_id", "stop_sequence"]))
+
+    def test_missing_column(self):
+        with self.assertRaises(KeyError):
+            read_table(self.folder, "stop_times.txt", ["trip_id", "shape_dist_traveled"])
+
+
+if __name__ == '__main__':
+    unittest.main()
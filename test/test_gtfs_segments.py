@@ -0,0 +1,85 @@
+# coding=utf-8
+"""Tests de la construction des segments entre arrêts (gtfs_stops_to_routes_ign.segments)."""
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from gtfs_stops_to_routes_ign.segments import (
+    SEGMENT_COLUMNS,
+    build_segments,
+    sort_stop_times,
+    stop_sequences,
+    unique_pairs,
+)
+
+
+def random_stop_times(trips, seed=0):
+    """stop_times fusionné avec stops, lignes mélangées, stop_sequence en texte."""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for t in range(trips):
+        count = int(rng.integers(1, 15))
+        stops = rng.choice(30, size=count)
+        for sequence, stop in enumerate(stops, start=1):
+            rows.append((f"T{t}", str(sequence * 10), f"S{stop}", 45 + stop / 100, 5 + stop / 100))
+    frame = pd.DataFrame(rows, columns=["trip_id", "stop_sequence", "stop_id", "stop_lat", "stop_lon"])
+    return frame.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+
+def loop_segments(sorted_df):
+    """Construction de référence, ligne par ligne."""
+    rows = []
+    for trip_id, group in sorted_df.groupby("trip_id", sort=False):
+        for i in range(len(group) - 1):
+            current, following = group.iloc[i], group.iloc[i + 1]
+            rows.append((trip_id, current["stop_sequence"], current["stop_id"], following["stop_id"],
+                         current["stop_lat"], current["stop_lon"], following["stop_lat"], following["stop_lon"]))
+    return pd.DataFrame(rows, columns=SEGMENT_COLUMNS)
+
+
+class SegmentsTest(unittest.TestCase):
+    """Décalage groupé comparé à la boucle par ligne."""
+
+    def test_numeric_sequence_order(self):
+        frame = pd.DataFrame({
+            "trip_id": ["T1", "T1", "T1"],
+            "stop_sequence": ["10", "2", "1"],
+            "stop_id": ["C", "B", "A"],
+            "stop_lat": [3.0, 2.0, 1.0],
+            "stop_lon": [3.0, 2.0, 1.0],
+        })
+        self.assertEqual(stop_sequences(sort_stop_times(frame)), {"T1": ("A", "B", "C")})
+
+    def test_matches_loop(self):
+        sorted_df = sort_stop_times(random_stop_times(200))
+        segments = build_segments(sorted_df)
+        expected = loop_segments(sorted_df)
+        self.assertEqual(list(segments.columns), SEGMENT_COLUMNS)
+        pd.testing.assert_frame_equal(segments.reset_index(drop=True), expected, check_dtype=False)
+
+    def test_single_stop_trip(self):
+        frame = pd.DataFrame({
+            "trip_id": ["T1", "T2", "T2"],
+            "stop_sequence": [1, 1, 2],
+            "stop_id": ["A", "A", "B"],
+            "stop_lat": [1.0, 1.0, 2.0],
+            "stop_lon": [1.0, 1.0, 2.0],
+        })
+        segments = build_segments(sort_stop_times(frame))
+        self.assertEqual(list(segments["trip_id"]), ["T2"])
+
+    def test_unique_pairs(self):
+        sorted_df = sort_stop_times(random_stop_times(200))
+        segments = build_segments(sorted_df)
+        pairs = unique_pairs(segments)
+        self.assertEqual(set(pairs), set(zip(segments["stop_from"], segments["stop_to"])))
+        for (stop_from, stop_to), (xy_from, xy_to) in pairs.items():
+            number_from, number_to = int(stop_from[1:]), int(stop_to[1:])
+            self.assertEqual(xy_from, (45 + number_from / 100, 5 + number_from / 100))
+            self.assertEqual(xy_to, (45 + number_to / 100, 5 + number_to / 100))
+
+
+if __name__ == "__main__":
+    unittest.main()
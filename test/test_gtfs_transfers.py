@@ -0,0 +1,72 @@
+# coding=utf-8
+"""Tests du graphe creux des correspondances à pied (TcIsoFromGtfs, prepare.prepare_stop_walk_duration)."""
+
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from TcIsoFromGtfs.gtfs_isochrone import prepare
+
+
+def random_stops(count, spread, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "stop_id": [f"S{i}" for i in range(count)],
+        "stop_lat": 48.8 + rng.random(count) * spread,
+        "stop_lon": 2.3 + rng.random(count) * spread,
+    })
+
+
+def brute_force_pairs(stops, max_distance_m):
+    pairs = stops.merge(stops, how="cross", suffixes=["_from", "_to"])
+    pairs = pairs[pairs["stop_id_from"] != pairs["stop_id_to"]]
+    distances = prepare.distance_meters(
+        pairs["stop_lat_from"], pairs["stop_lat_to"], pairs["stop_lon_from"], pairs["stop_lon_to"]
+    )
+    pairs = pairs[distances <= max_distance_m]
+    return set(zip(pairs["stop_id_from"], pairs["stop_id_to"]))
+
+
+class TransfersTest(unittest.TestCase):
+    """Recherche par grille comparée au produit cartésien."""
+
+    def test_grid_matches_brute_force(self):
+        for count, spread, distance in ((500, 0.2, 800), (200, 0.01, 300), (300, 0.5, 5000)):
+            stops = random_stops(count, spread)
+            transfers = prepare.prepare_stop_walk_duration(stops, distance)
+            frame = transfers.to_frame()
+            self.assertEqual(set(zip(frame["stop_id_from"], frame["stop_id_to"])), brute_force_pairs(stops, distance))
+
+    def test_csr_layout(self):
+        transfers = prepare.prepare_stop_walk_duration(random_stops(300, 0.05), 1000)
+        self.assertEqual(transfers.indptr.dtype, np.int32)
+        self.assertEqual(transfers.indices.dtype, np.int32)
+        self.assertEqual(transfers.seconds.dtype, np.uint16)
+        self.assertEqual(len(transfers.indptr), 301)
+        self.assertEqual(transfers.indptr[-1], len(transfers))
+        # Voisins de chaque arrêt triés par durée croissante
+        for i in range(300):
+            seconds = transfers.seconds[transfers.indptr[i]:transfers.indptr[i + 1]]
+            self.assertTrue((np.diff(seconds.astype(int)) >= 0).all())
+
+    def test_zero_distance(self):
+        transfers = prepare.prepare_stop_walk_duration(random_stops(2000, 0.01), 0)
+        self.assertEqual(len(transfers), 0)
+        self.assertEqual(len(transfers.indptr), 2001)
+
+    def test_distance_limit(self):
+        with self.assertRaises(ValueError):
+            prepare.prepare_stop_walk_duration(random_stops(10, 0.01), prepare.MAX_WALK_DISTANCE_LIMIT_M + 1)
+
+    def test_stops_without_coordinates(self):
+        stops = random_stops(50, 0.01)
+        stops.loc[[3, 7], "stop_lat"] = np.nan
+        frame = prepare.prepare_stop_walk_duration(stops, 500).to_frame()
+        used = set(frame["stop_id_from"]) | set(frame["stop_id_to"])
+        self.assertFalse({"S3", "S7"} & used)
+        self.assertTrue(used)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+# coding=utf-8
+"""Tests du décodage des polylignes encodées (routing_common.polyline)."""
+
+import random
+import unittest
+
+from routing_common.polyline import decode_polyline
+
+
+def encode_polyline(coordinates, precision=5):
+    """Encodage de référence de coordonnées [lon, lat]."""
+    factor = 10 ** precision
+    chunks = []
+    previous = [0, 0]
+    for lon, lat in coordinates:
+        current = [round(lat * factor), round(lon * factor)]
+        for value, last in zip(current, previous):
+            delta = value - last
+            delta = ~(delta << 1) if delta < 0 else delta << 1
+            while delta >= 0x20:
+                chunks.append(chr((0x20 | (delta & 0x1f)) + 63))
+                delta >>= 5
+            chunks.append(chr(delta + 63))
+        previous = current
+    return "".join(chunks)
+
+
+class PolylineTest(unittest.TestCase):
+    """Décodage comparé à des valeurs connues et à l'encodage."""
+
+    def test_reference_example(self):
+        # Exemple de la documentation du format
+        self.assertEqual(
+            decode_polyline("_p~iF~ps|U_ulLnnqC_mqNvxq`@"),
+            [[-120.2, 38.5], [-120.95, 40.7], [-126.453, 43.252]],
+        )
+
+    def test_empty(self):
+        self.assertEqual(decode_polyline(""), [])
+
+    def test_round_trip(self):
+        rng = random.Random(0)
+        for precision in (5, 6):
+            factor = 10 ** precision
+            coordinates = [
+                [round(rng.uniform(-5, 9), precision), round(rng.uniform(41, 51), precision)]
+                for _ in range(200)
+            ]
+            decoded = decode_polyline(encode_polyline(coordinates, precision), precision)
+            self.assertEqual(len(decoded), len(coordinates))
+            for (lon, lat), (expected_lon, expected_lat) in zip(decoded, coordinates):
+                self.assertAlmostEqual(lon, expected_lon, delta=0.5 / factor)
+                self.assertAlmostEqual(lat, expected_lat, delta=0.5 / factor)
+
+
+if __name__ == "__main__":
+    unittest.main()
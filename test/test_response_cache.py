@@ -0,0 +1,77 @@
+# coding=utf-8
+"""Tests du cache persistant des réponses (routing_common.cache)."""
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from routing_common.cache import ResponseCache
+
+
+class ResponseCacheTest(unittest.TestCase):
+    """Persistance, durée de vie et éviction LRU du cache SQLite."""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, "cache.sqlite")
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_round_trip(self):
+        cache = ResponseCache(self.path)
+        value = {"geometry": {"coordinates": [[2.35, 48.85], [2.36, 48.86]]}, "distance": 1520.5}
+        self.assertIsNone(cache.get("a"))
+        cache.put("a", value)
+        self.assertEqual(cache.get("a"), value)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        cache.close()
+
+        # Relu par une autre exécution
+        cache = ResponseCache(self.path)
+        self.assertEqual(cache.get("a"), value)
+        cache.close()
+
+    def test_ttl(self):
+        cache = ResponseCache(self.path, ttl_days=1)
+        cache.put("old", [1])
+        cache.put("new", [2])
+        cache._conn.execute("UPDATE responses SET created = created - 2 * 86400 WHERE key = 'old'")
+        self.assertIsNone(cache.get("old"))
+        self.assertEqual(cache.get("new"), [2])
+        self.assertEqual(cache.evict(), 1)
+        cache.close()
+
+    def test_lru_eviction(self):
+        cache = ResponseCache(self.path, max_size_mb=1000 / (1024 * 1024))
+        for i in range(10):
+            cache.put(str(i), "x" * 198)
+        # Dernière utilisation dans l'ordre des clés : 0 est la plus ancienne
+        cache._conn.execute("UPDATE responses SET accessed = CAST(key AS REAL)")
+        self.assertEqual(cache.evict(), 5)
+        self.assertIsNone(cache.get("4"))
+        for i in (5, 6, 7, 8, 9):
+            self.assertEqual(cache.get(str(i)), "x" * 198)
+        cache.close()
+
+    def test_threads(self):
+        cache = ResponseCache(self.path)
+
+        def work(start):
+            for i in range(start, start + 100):
+                cache.put(str(i), i)
+                self.assertEqual(cache.get(str(i)), i)
+
+        threads = [threading.Thread(target=work, args=(n * 100,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(cache.hits, 400)
+        cache.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
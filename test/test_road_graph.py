@@ -0,0 +1,232 @@
+# coding=utf-8
+"""Tests du graphe routier local (routing_common.road_graph)."""
+
+import unittest
+
+import numpy as np
+
+from routing_common.road_graph import RoadGraph, EdgePosition, project_on_polyline, polyline_slice
+
+
+def graph_from_edges(node_x, node_y, edges):
+    """Graphe à partir de tronçons rectilignes (tail, head, longueur, vitesse km/h, sens)."""
+    coord_ptr, coord_x, coord_y = [0], [], []
+    for tail, head, _, _, _ in edges:
+        coord_x += [node_x[tail], node_x[head]]
+        coord_y += [node_y[tail], node_y[head]]
+        coord_ptr.append(len(coord_x))
+    lengths = np.array([edge[2] for edge in edges], dtype=np.float64)
+    speeds = np.array([edge[3] for edge in edges], dtype=np.float64)
+    return RoadGraph.from_edges(
+        node_x, node_y, [edge[0] for edge in edges], [edge[1] for edge in edges],
+        lengths, lengths / (speeds / 3.6), [edge[4] for edge in edges], coord_ptr, coord_x, coord_y,
+    )
+
+
+def grid_edges(size=12, seed=0):
+    """Grille de size × size nœuds, tronçons de longueur et de vitesse aléatoires,
+    une partie en sens unique (direct ou inverse). Renvoie (node_x, node_y, edges)."""
+    rng = np.random.default_rng(seed)
+    node_x = [float(i % size * 100 + rng.random() * 20) for i in range(size * size)]
+    node_y = [float(i // size * 100 + rng.random() * 20) for i in range(size * size)]
+    edges = []
+    for node in range(size * size):
+        for other in (node + 1 if node % size < size - 1 else None, node + size if node + size < size * size else None):
+            if other is None:
+                continue
+            straight = np.hypot(node_x[node] - node_x[other], node_y[node] - node_y[other])
+            edges.append((node, other, straight * (1 + rng.random()), float(rng.choice([30, 50, 90])),
+                          int(rng.choice([0, 0, 0, 1, -1]))))
+    return node_x, node_y, edges
+
+
+def grid_graph(size=12, seed=0):
+    return graph_from_edges(*grid_edges(size, seed))
+
+
+def split_edge(node_x, node_y, edges, index, fraction):
+    """Coupe le tronçon 'index' par un nouveau nœud à 'fraction' de sa longueur (sur place)."""
+    tail, head, length, speed, direction = edges[index]
+    node_x.append(node_x[tail] + fraction * (node_x[head] - node_x[tail]))
+    node_y.append(node_y[tail] + fraction * (node_y[head] - node_y[tail]))
+    middle = len(node_x) - 1
+    edges[index] = (tail, middle, fraction * length, speed, direction)
+    edges.append((middle, head, (1 - fraction) * length, speed, direction))
+    return middle
+
+
+def position(node_x, node_y, edges, index, fraction):
+    tail, head = edges[index][:2]
+    return EdgePosition(index, fraction, node_x[tail] + fraction * (node_x[head] - node_x[tail]),
+                        node_y[tail] + fraction * (node_y[head] - node_y[tail]), 0.0)
+
+
+class RoadGraphTest(unittest.TestCase):
+    """A* comparé à Dijkstra, chemins reconstitués et sens uniques."""
+
+    def test_route_matches_tree(self):
+        graph = grid_graph()
+        for weight, key in (("length", "distance"), ("duration", "duration")):
+            for source in range(0, graph.node_count, 13):
+                cost, pred = graph.shortest_path_tree(source, weight=weight)
+                for target in range(5, graph.node_count, 17):
+                    route = graph.route(source, target, weight)
+                    if target not in cost:
+                        self.assertIsNone(route)
+                        continue
+                    self.assertAlmostEqual(route[key], cost[target], places=6)
+                    self.assertAlmostEqual(graph.path(pred, source, target)[key], cost[target], places=6)
+
+    def test_path_endpoints(self):
+        graph = grid_graph()
+        _, pred = graph.shortest_path_tree(0)
+        for target in pred:
+            path = graph.path(pred, 0, target)
+            self.assertEqual(path["coordinates"][0], (graph.node_x[0], graph.node_y[0]))
+            self.assertEqual(path["coordinates"][-1], (graph.node_x[target], graph.node_y[target]))
+            # Arcs enchaînés de l'origine à la destination
+            node, arcs = target, []
+            while node != 0:
+                arcs.append(pred[node])
+                node = int(graph.tail[pred[node]])
+            self.assertEqual(len(path["coordinates"]), len(arcs) + 1)
+
+    def test_same_node(self):
+        graph = grid_graph()
+        route = graph.route(7, 7)
+        self.assertEqual(route["distance"], 0)
+        self.assertEqual(route["coordinates"], [(graph.node_x[7], graph.node_y[7])] * 2)
+
+    def test_one_way(self):
+        # A → B direct en sens unique (100 m), détour A - C - B à double sens (300 m),
+        # B → D en sens inverse : seul D → B est autorisé
+        node_x, node_y = [0.0, 100.0, 50.0, 200.0], [0.0, 0.0, 100.0, 0.0]
+        graph = graph_from_edges(node_x, node_y, [
+            (0, 1, 100.0, 50, 1),
+            (0, 2, 150.0, 50, 0),
+            (2, 1, 150.0, 50, 0),
+            (1, 3, 100.0, 50, -1),
+        ])
+        self.assertEqual(graph.route(0, 1, "length")["distance"], 100.0)
+        back = graph.route(1, 0, "length")
+        self.assertEqual(back["distance"], 300.0)
+        self.assertEqual(back["coordinates"], [(100.0, 0.0), (50.0, 100.0), (0.0, 0.0)])
+        self.assertIsNone(graph.route(1, 3))
+        reverse = graph.route(3, 1, "length")
+        self.assertEqual(reverse["coordinates"], [(200.0, 0.0), (100.0, 0.0)])
+
+
+class BatchRoutingTest(unittest.TestCase):
+    """Un Dijkstra par origine (ItineraireParLaRoute fetch_batch, GtfsRouteIgn routeOnGraph)
+    comparé à un A* par couple."""
+
+    def setUp(self):
+        # Deux grilles disjointes : la seconde est inaccessible depuis la première.
+        # Chaque arc des grilles devient un tronçon en sens direct.
+        first, second = grid_graph(10, seed=1), grid_graph(4, seed=2)
+        offset = first.node_count
+        edges = []
+        for graph, shift in ((first, 0), (second, offset)):
+            for k in range(graph.arc_count):
+                edges.append((int(graph.tail[k]) + shift, int(graph.head[k]) + shift, float(graph.length[k]),
+                              float(graph.length[k] / graph.duration[k] * 3.6), 1))
+        node_x = first.node_x.tolist() + (second.node_x + 5000).tolist()
+        node_y = first.node_y.tolist() + second.node_y.tolist()
+        self.graph = graph_from_edges(node_x, node_y, edges)
+        self.first_count = first.node_count
+
+    def test_batch_matches_pairs(self):
+        graph = self.graph
+        targets = list(range(3, self.first_count, 7)) + [self.first_count + 5]
+        for weight, key in (("length", "distance"), ("duration", "duration")):
+            for source in (0, 44, 99):
+                _, pred = graph.shortest_path_tree(source, set(targets), weight)
+                for target in targets:
+                    batch = graph.path(pred, source, target)
+                    single = graph.route(source, target, weight)
+                    self.assertEqual(batch is None, single is None)
+                    if single is not None:
+                        self.assertAlmostEqual(batch[key], single[key], places=6)
+                        self.assertEqual(batch["coordinates"][-1], single["coordinates"][-1])
+
+    def test_unreachable_component(self):
+        graph = self.graph
+        unreachable = self.first_count + 5
+        self.assertIsNone(graph.route(0, unreachable))
+        cost, pred = graph.shortest_path_tree(0, {unreachable})
+        self.assertEqual((cost, pred), ({0: 0.0}, {}))
+        # Une cible inaccessible n'empêche pas l'arrêt anticipé sur les autres
+        cost, _ = graph.shortest_path_tree(0, {1, unreachable})
+        self.assertLess(len(cost), self.first_count)
+
+    def test_components(self):
+        component = self.graph.components()
+        self.assertEqual(len(set(component[:self.first_count])), 1)
+        self.assertEqual(len(set(component[self.first_count:])), 1)
+        self.assertNotEqual(component[0], component[self.first_count])
+
+
+class ProjectedRoutingTest(unittest.TestCase):
+    """Chemins entre points projetés sur les tronçons (GtfsRouteIgn routeOnGraph)."""
+
+    def setUp(self):
+        # Même réseau que RoadGraphTest.test_one_way : 0 → 1 en sens unique
+        self.node_x, self.node_y = [0.0, 100.0, 50.0, 200.0], [0.0, 0.0, 100.0, 0.0]
+        self.edges = [(0, 1, 100.0, 50, 1), (0, 2, 150.0, 50, 0), (2, 1, 150.0, 50, 0), (1, 3, 100.0, 50, -1)]
+        self.graph = graph_from_edges(self.node_x, self.node_y, self.edges)
+
+    def at(self, index, fraction):
+        return position(self.node_x, self.node_y, self.edges, index, fraction)
+
+    def test_projection(self):
+        distance, offset, x, y = project_on_polyline([0, 100, 100], [0, 0, 100], 120, 30)
+        self.assertEqual((distance, offset, x, y), (20.0, 130.0, 100.0, 30.0))
+        self.assertEqual(polyline_slice([0, 100, 100], [0, 0, 100], 130, 50), [(100.0, 30.0), (100.0, 0.0), (50.0, 0.0)])
+
+    def test_nearest_position(self):
+        position = self.graph.nearest_position(60.0, -10.0)
+        self.assertEqual((position.edge, position.x, position.y, position.distance), (0, 60.0, 0.0, 10.0))
+        self.assertAlmostEqual(position.fraction, 0.6)
+
+    def test_partial_edges(self):
+        route, = self.graph.routes_between(self.at(1, 0.5), [self.at(0, 0.5)], "length")
+        self.assertAlmostEqual(route["distance"], 75 + 50)
+        self.assertEqual(route["coordinates"], [(25.0, 50.0), (0.0, 0.0), (50.0, 0.0)])
+        # Retour : le sens unique oblige à sortir par le nœud 1
+        route, = self.graph.routes_between(self.at(0, 0.5), [self.at(1, 0.5)], "length")
+        self.assertAlmostEqual(route["distance"], 50 + 150 + 75)
+        self.assertEqual(route["coordinates"], [(50.0, 0.0), (100.0, 0.0), (50.0, 100.0), (25.0, 50.0)])
+
+    def test_same_edge(self):
+        forward, backward = self.graph.routes_between(self.at(0, 0.2), [self.at(0, 0.8), self.at(0, 0.1)], "length")
+        self.assertAlmostEqual(forward["distance"], 60)
+        self.assertEqual(forward["coordinates"], [(20.0, 0.0), (80.0, 0.0)])
+        self.assertAlmostEqual(backward["distance"], 80 + 150 + 150 + 10)
+        # Le tronçon 3 n'est praticable que de 3 vers 1
+        self.assertEqual(self.graph.routes_between(self.at(0, 0.5), [self.at(3, 0.5)]), [None])
+
+    def test_matches_split_graph(self):
+        # Même résultat qu'un A* sur le graphe où les tronçons sont coupés aux points projetés
+        rng = np.random.default_rng(3)
+        node_x, node_y, edges = grid_edges(8, seed=4)
+        graph = graph_from_edges(node_x, node_y, edges)
+        for _ in range(20):
+            a, b = (int(i) for i in rng.choice(len(edges), 2, replace=False))
+            f, g = rng.random(2)
+            start, end = position(node_x, node_y, edges, a, f), position(node_x, node_y, edges, b, g)
+            split_x, split_y, split = list(node_x), list(node_y), list(edges)
+            source = split_edge(split_x, split_y, split, a, f)
+            target = split_edge(split_x, split_y, split, b, g)
+            reference = graph_from_edges(split_x, split_y, split)
+            for weight, key in (("length", "distance"), ("duration", "duration")):
+                route, = graph.routes_between(start, [end], weight)
+                expected = reference.route(source, target, weight)
+                self.assertEqual(route is None, expected is None)
+                if expected is not None:
+                    self.assertAlmostEqual(route[key], expected[key], places=6)
+                    self.assertEqual(len(route["coordinates"]), len(expected["coordinates"]))
+                    np.testing.assert_allclose(route["coordinates"], expected["coordinates"], atol=1e-6)
+
+
+if __name__ == "__main__":
+    unittest.main()